@@ -0,0 +1,49 @@
+# benchmarks/bench_feedback_rollup.py
+# 列式反馈汇总基准：数百万行的分组 + 分位数 / Columnar feedback rollups over millions of rows
+#
+# 运行 / Run:  python -m benchmarks.bench_feedback_rollup [--rows 2000000] [--tasks 200] [--children 5000]
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from feedback.columnar import FeedbackColumns
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=2_000_000)
+    ap.add_argument("--tasks", type=int, default=200)
+    ap.add_argument("--children", type=int, default=5000)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(3)
+    n = args.rows
+    with tempfile.TemporaryDirectory() as root:
+        cols = FeedbackColumns(root)
+        t0 = time.perf_counter()
+        difficulty = rng.random(n).astype(np.float32)
+        difficulty[rng.random(n) < 0.2] = np.nan
+        cols.append_columns(
+            child=np.array([f"kid-{i}" for i in range(args.children)])[rng.integers(0, args.children, n)],
+            task=np.array([f"task-{i}" for i in range(args.tasks)])[rng.integers(0, args.tasks, n)],
+            rating=rng.random(n), difficulty=difficulty, time_efficiency=rng.random(n),
+            hour=rng.integers(6, 22, n).astype(np.int8),
+            ts=rng.integers(1_700_000_000, 1_730_000_000, n),
+        )
+        print(f"rows={n} load={time.perf_counter() - t0:.2f} s")
+
+        for by in ("task", "hour", "weekday", "child"):
+            timings = []
+            for _ in range(5):
+                t0 = time.perf_counter()
+                out = cols.rollup(by=by, metric="score", percentiles=(50, 90, 99))
+                timings.append((time.perf_counter() - t0) * 1000)
+            timings.sort()
+            print(f"rollup by={by:<8} groups={len(out):<5} best={timings[0]:.1f} ms  median={timings[2]:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+# benchmarks/bench_llm_endpoints.py
+# LLM 接口压测：用本地 mock 服务商（benchmarks/mock_llm_server.py）驱动 ai-suggest / llm_reason / test-llm，
+# 报告 p50/p95/p99、吞吐量、上游调用次数，以及缓存、请求合并、对冲各自的效果。
+# Load harness for the LLM endpoints against the local mock providers. Reports p50/p95/p99,
+# throughput and upstream call counts, and isolates the effect of caching, coalescing and hedging.
+#
+# 运行 / Run:
+#   进程内（默认，无需起服务）/ in-process (default, nothing to start):
+#     python -m benchmarks.bench_llm_endpoints [--requests 200] [--concurrency 20] [--app main:app]
+#   真实 HTTP / over real HTTP (streaming time-to-first-card is only meaningful here):
+#     python -m benchmarks.bench_llm_endpoints --mock-url http://127.0.0.1:8900 --app-url http://127.0.0.1:8000
+#     （应用需以 mock 的 *_BASE_URL 与任意 *_API_KEY 启动 / start the app with the mock base URLs and any API keys）
+
+import argparse
+import asyncio
+import importlib
+import os
+import tempfile
+import time
+import uuid
+from typing import Awaitable, Callable, List
+
+import httpx
+import numpy as np
+
+SCENARIOS = ["suggest_cold", "suggest_cached", "suggest_coalesced", "suggest_unhedged", "suggest_hedged",
+             "suggest_stream", "reason", "test_llm"]
+
+
+def summarize(latencies: List[float]) -> str:
+    if not latencies:
+        return "no successful requests"
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return f"p50 {p50:7.1f} ms  p95 {p95:7.1f} ms  p99 {p99:7.1f} ms"
+
+
+async def drive(n: int, concurrency: int, one: Callable[[int], Awaitable[bool]]):
+    """并发执行 n 个请求，返回 (成功延迟列表, 失败数, 墙钟秒) / Run n requests with bounded concurrency"""
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def run(i: int):
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                ok = await one(i)
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - t0)
+            else:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(run(i) for i in range(n)))
+    return latencies, errors, time.perf_counter() - t0
+
+
+class Bench:
+    def __init__(self, app: httpx.AsyncClient, mock: httpx.AsyncClient, n: int, concurrency: int):
+        self.app, self.mock, self.n, self.concurrency = app, mock, n, concurrency
+        self.run_id = uuid.uuid4().hex[:8]     # 保证“冷”请求不命中上次运行的缓存 / keeps cold prompts cold
+
+    async def upstream_calls(self) -> int:
+        stats = (await self.mock.get("/_mock/stats")).json()
+        return sum(v for k, v in stats.items() if k.endswith((".calls", ".stream")))
+
+    async def configure(self, **cfg) -> None:
+        await self.mock.post("/_mock/config", json=cfg)
+
+    async def suggest(self, q: str, hedge: bool = False) -> bool:
+        r = await self.app.get("/recommend/ai-suggest", params={"q": q, "hedge": str(hedge).lower()})
+        return r.status_code == 200 and bool(r.json())
+
+    # ---------- 场景 / Scenarios ----------
+    async def suggest_cold(self):
+        """每个请求都不同：无缓存、无合并 / every prompt unique: no cache, no coalescing"""
+        return await drive(self.n, self.concurrency, lambda i: self.suggest(f"cold {self.run_id} {i}"))
+
+    async def suggest_cached(self):
+        """同一提示词重复请求（先预热一次）/ one prompt repeated after a warm-up call"""
+        q = f"cached {self.run_id}"
+        await self.suggest(q)
+        return await drive(self.n, self.concurrency, lambda i: self.suggest(q))
+
+    async def suggest_coalesced(self):
+        """每批 concurrency 个相同的新提示词同时到达 / bursts of identical fresh prompts"""
+        return await drive(self.n, self.concurrency,
+                           lambda i: self.suggest(f"burst {self.run_id} {i // self.concurrency}"))
+
+    async def suggest_unhedged(self):
+        """首选服务商有 10% 长尾，不对冲 / preferred provider has a 10% slow tail, no hedging"""
+        await self.configure(providers={"openai": {"tail_rate": 0.1}})
+        try:
+            return await drive(self.n, self.concurrency, lambda i: self.suggest(f"tail {self.run_id} {i}"))
+        finally:
+            await self.configure(providers={})
+
+    async def suggest_hedged(self):
+        """同样的长尾，超过 p95 即对冲到备选 / same tail, hedged to a backup after p95"""
+        await self.configure(providers={"openai": {"tail_rate": 0.1}})
+        try:
+            return await drive(self.n, self.concurrency,
+                               lambda i: self.suggest(f"hedge {self.run_id} {i}", hedge=True))
+        finally:
+            await self.configure(providers={})
+
+    async def suggest_stream(self):
+        """SSE：延迟按“首张卡片到达”计 / SSE: latency is time to the first card"""
+        async def one(i: int) -> bool:
+            async with self.app.stream("GET", "/recommend/ai-suggest/stream",
+                                       params={"q": f"stream {self.run_id} {i}"}) as r:
+                async for line in r.aiter_lines():
+                    if line.startswith("event: card"):
+                        return True
+            return False
+        return await drive(self.n, self.concurrency, one)
+
+    async def reason(self):
+        async def one(i: int) -> bool:
+            profile = {"user_id": f"bench-{self.run_id}-{i}", "name": "Bench", "survey": "I like drawing and chess"}
+            r = await self.app.post("/recommend/llm_reason", json=profile, params={"provider": "openai"})
+            return r.status_code == 200
+        return await drive(self.n, self.concurrency, one)
+
+    async def test_llm(self):
+        async def one(i: int) -> bool:
+            r = await self.app.get("/test-llm", params={"prompt": f"bench {self.run_id} {i}"})
+            return r.status_code == 200 and not str(r.json().get("openai", "")).startswith("OpenAI error")
+        return await drive(self.n, self.concurrency, one)
+
+
+def in_process_mock():
+    """进程内 mock：llm_http 的连接池直接走 ASGI，不开端口 / In-process mock: provider pools talk ASGI directly"""
+    from benchmarks.mock_llm_server import app as mock_app
+    from utils import llm_http
+
+    for name in llm_http.PROVIDERS:
+        llm_http.TRANSPORTS[name] = httpx.ASGITransport(app=mock_app)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=mock_app), base_url="http://mock")
+
+
+def load_app(spec: str):
+    module, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module), attr or "app")
+
+
+async def main_async(args) -> None:
+    if args.mock_url:
+        mock = httpx.AsyncClient(base_url=args.mock_url, timeout=60)
+    else:
+        mock = in_process_mock()
+    if args.app_url:
+        app = httpx.AsyncClient(base_url=args.app_url, timeout=60)
+    else:
+        app = httpx.AsyncClient(transport=httpx.ASGITransport(app=load_app(args.app)),
+                                base_url="http://app", timeout=60)
+    await mock.post("/_mock/config", json={"latency_median": args.latency, "error_rate": args.error_rate,
+                                           "malformed_rate": args.malformed_rate})
+
+    bench = Bench(app, mock, args.requests, args.concurrency)
+    print(f"{args.requests} requests per scenario, concurrency {args.concurrency}, "
+          f"mock median latency {args.latency * 1000:.0f} ms\n")
+    try:
+        for name in args.scenarios:
+            before = await bench.upstream_calls()
+            latencies, errors, wall = await getattr(bench, name)()
+            calls = await bench.upstream_calls() - before
+            print(f"{name:18s} {summarize(latencies)}  {len(latencies) / wall:7.1f} req/s  "
+                  f"upstream {calls:4d}  errors {errors}")
+    finally:
+        await app.aclose()
+        await mock.aclose()
+        if not args.app_url:
+            from utils.llm_http import aclose_all
+            await aclose_all()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=20)
+    ap.add_argument("--latency", type=float, default=0.3, help="mock median latency (s)")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--malformed-rate", type=float, default=0.0)
+    ap.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    ap.add_argument("--mock-url", help="use a running mock server instead of the in-process one")
+    ap.add_argument("--app-url", help="drive a running app instead of importing --app")
+    ap.add_argument("--app", default="main:app", help="module:attr of the app to import in-process")
+    args = ap.parse_args()
+    if args.app_url and not args.mock_url:
+        ap.error("--app-url needs --mock-url (a remote app cannot reach the in-process mock)")
+
+    if not args.app_url:
+        # 进程内：在导入应用之前配置服务商地址、假 key 与临时缓存文件
+        # in-process: point providers at the mock, set dummy keys and a throwaway cache before importing the app
+        base = args.mock_url or "http://mock"
+        os.environ.update({"OPENAI_BASE_URL": base + "/v1", "COHERE_BASE_URL": base + "/v1", "HF_BASE_URL": base})
+        for key in ("OPENAI_API_KEY", "COHERE_API_KEY", "HF_API_KEY"):
+            os.environ.setdefault(key, "mock")
+        os.environ.setdefault("LLM_CACHE_FILE", os.path.join(tempfile.mkdtemp(), "llm_cache.sqlite"))
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
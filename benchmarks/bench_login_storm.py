@@ -0,0 +1,106 @@
+# benchmarks/bench_login_storm.py
+# 登录风暴基准：大量并发登录时事件循环的延迟（fastapi-users 原生 authenticate 同步 bcrypt vs
+# services/auth_real.py 的线程池版本），以及 token 验签缓存的效果
+# Login-storm benchmark: event-loop lag during a burst of concurrent logins through
+# UserManager.authenticate (stock fastapi-users, bcrypt inline, vs the pooled override in
+# services/auth_real.py), plus the effect of the verified-claims cache on decode_token.
+#
+# 运行 / Run:  python -m benchmarks.bench_login_storm [--logins 64] [--rounds 10] [--decodes 20000]
+
+import argparse
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+
+async def loop_lag(stop: asyncio.Event, samples: list, interval: float = 0.005) -> None:
+    """每 interval 醒一次，记录超出的时间 = 事件循环被占住的时长 / oversleep = time the loop was blocked"""
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - t0 - interval)
+
+
+class MemoryUserDB:
+    """只有一个用户的内存 user_db / In-memory user_db with a single user"""
+
+    def __init__(self, user):
+        self.user = user
+
+    async def get_by_email(self, email):
+        return self.user if email == self.user.email else None
+
+    async def update(self, user, update_dict):
+        return user
+
+
+def user_managers(rounds: int):
+    from fastapi_users import BaseUserManager
+    from fastapi_users.password import PasswordHelper
+    from pwdlib import PasswordHash
+    from pwdlib.hashers.bcrypt import BcryptHasher
+    from services.auth_real import PooledPasswordMixin
+
+    helper = PasswordHelper(PasswordHash((BcryptHasher(rounds=rounds),)))
+    db = MemoryUserDB(SimpleNamespace(email="kid@example.com", hashed_password=helper.hash("correct horse")))
+
+    class Pooled(PooledPasswordMixin, BaseUserManager):
+        pass
+
+    return BaseUserManager(db, helper), Pooled(db, helper)
+
+
+async def storm(manager, logins: int):
+    credentials = SimpleNamespace(username="kid@example.com", password="correct horse")
+
+    async def login():
+        return await manager.authenticate(credentials)
+
+    stop, samples = asyncio.Event(), []
+    ticker = asyncio.ensure_future(loop_lag(stop, samples))
+    await asyncio.sleep(0.02)
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)))
+    wall = time.perf_counter() - t0
+    stop.set()
+    await ticker
+    assert all(r is not None for r in results)
+    return wall, np.array(samples or [0.0]) * 1000
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--logins", type=int, default=64)
+    ap.add_argument("--rounds", type=int, default=10)
+    ap.add_argument("--decodes", type=int, default=20000)
+    args = ap.parse_args()
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)     # 导入前设置成本因子 / set the cost before import
+    from services import security
+
+    inline, pooled = user_managers(args.rounds)
+    print(f"{args.logins} concurrent logins, bcrypt rounds {args.rounds}, pool {security.HASH_WORKERS} threads")
+    for label, manager in (("inline bcrypt", inline), ("thread pool", pooled)):
+        wall, lag = asyncio.run(storm(manager, args.logins))
+        print(f"  {label:14s} wall {wall * 1000:7.0f} ms   loop lag p50 {np.percentile(lag, 50):6.1f} ms"
+              f"  p99 {np.percentile(lag, 99):6.1f} ms  max {lag.max():7.1f} ms")
+
+    token = security.create_access_token("user-1")
+    security.claims_cache.clear()
+    t0 = time.perf_counter()
+    for _ in range(args.decodes):
+        security.claims_cache.clear()
+        security.decode_token(token)
+    uncached = (time.perf_counter() - t0) / args.decodes
+    t0 = time.perf_counter()
+    for _ in range(args.decodes):
+        security.decode_token(token)
+    cached = (time.perf_counter() - t0) / args.decodes
+    print(f"decode_token: verify {uncached * 1e6:.1f} µs/call, cached {cached * 1e6:.1f} µs/call")
+
+
+if __name__ == "__main__":
+    main()
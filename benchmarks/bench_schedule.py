@@ -0,0 +1,86 @@
+# benchmarks/bench_schedule.py
+# 排程器基准：一个月、数百个任务 / Scheduler benchmark: hundreds of tasks over a month
+#
+# 运行 / Run:  python -m benchmarks.bench_schedule [--tasks 400] [--days 30] [--max-per-day 360] [--improve]
+
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from models.user_profile import Availability, TimeBlock, WeeklyTemplate
+from utils.schedule_optimizer import build_plan
+
+TAGS = ["skill", "reading", "sport", "social", "art"]
+
+
+def make_inputs(n_tasks: int, days: int, seed: int = 7):
+    rnd = random.Random(seed)
+    weekly = {
+        wd: [TimeBlock(start="07:00", end="08:00"), TimeBlock(start="16:00", end="20:30")]
+        for wd in ["Mon", "Tue", "Wed", "Thu", "Fri"]
+    }
+    weekly.update({wd: [TimeBlock(start="09:00", end="12:00"), TimeBlock(start="14:00", end="18:00")]
+                   for wd in ["Sat", "Sun"]})
+    availability = Availability(template=WeeklyTemplate(weekly=weekly))
+
+    tasks = [{
+        "name": f"task-{i}",
+        "duration": rnd.choice([15, 30, 45, 60]),
+        "priority": rnd.randint(0, 3),
+        "tag": rnd.choice(TAGS),
+    } for i in range(n_tasks)]
+
+    start = date(2024, 1, 1)
+    events = []
+    for d in range(days):
+        day = datetime.combine(start + timedelta(days=d), datetime.min.time())
+        for _ in range(rnd.randint(0, 2)):
+            s = day + timedelta(hours=rnd.choice([7, 16, 17, 18, 10]), minutes=rnd.choice([0, 30]))
+            events.append({"start": s, "end": s + timedelta(minutes=rnd.choice([30, 60]))})
+    return tasks, availability, events, start
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tasks", type=int, default=400)
+    ap.add_argument("--days", type=int, default=30)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--max-per-day", type=int, default=360)
+    ap.add_argument("--improve", action="store_true")
+    args = ap.parse_args()
+
+    tasks, availability, events, start = make_inputs(args.tasks, args.days)
+    timings = []
+    plan = None
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        plan = build_plan(tasks, availability=availability, events=events, start_day=start,
+                          days=args.days, max_minutes_per_day=args.max_per_day,
+                          improve=args.improve)
+        timings.append((time.perf_counter() - t0) * 1000)
+
+    timings.sort()
+    placed = len(plan.placements)
+    avg_score = sum(p.score for p in plan.placements.values()) / max(placed, 1)
+    print(f"tasks={args.tasks} days={args.days} events={len(events)} improve={args.improve}")
+    print(f"placed={placed} unplaced={args.tasks - placed} avg_suitability={avg_score:.2f}")
+    print(f"best={timings[0]:.2f} ms  median={timings[len(timings) // 2]:.2f} ms  worst={timings[-1]:.2f} ms")
+
+    # 增量修复：随机拖动一个事件 / incremental repair: drag one event around
+    rnd = random.Random(11)
+    repairs, moved = [], 0
+    for n in range(200):
+        day = datetime.combine(start + timedelta(days=rnd.randrange(args.days)), datetime.min.time())
+        s = day + timedelta(hours=rnd.choice([7, 9, 16, 17, 18]))
+        t0 = time.perf_counter()
+        report = plan.upsert_event("dragged", {"start": s, "end": s + timedelta(minutes=60)})
+        repairs.append((time.perf_counter() - t0) * 1000)
+        moved += len(report["moved"])
+    repairs.sort()
+    print(f"repair: median={repairs[len(repairs) // 2]:.3f} ms  p95={repairs[int(len(repairs) * 0.95)]:.3f} ms"
+          f"  avg_moved={moved / len(repairs):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_startup.py
+# 启动基准：在全新解释器里导入应用，统计墙钟时间并输出 -X importtime 报告（最慢的模块）
+# Startup benchmark: import the app in a fresh interpreter, time it, and print an
+# `-X importtime` report of the slowest modules. Also checks that LLM provider modules
+# stay unloaded at boot (utils/llm_providers.py loads them on first use).
+#
+# 运行 / Run:  python -m benchmarks.bench_startup [--module main] [--runs 5] [--top 20]
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# 启动时不应导入的模块 / modules that should not be imported at boot
+DEFERRED = ["utils.openai_client", "utils.cohere_client", "utils.hf_client", "httpx",
+            "openai", "cohere", "huggingface_hub", "transformers"]
+
+
+def run_import(module: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    flags = ["-X", "importtime"] if importtime else []
+    return subprocess.run([sys.executable, *flags, "-c", f"import {module}"],
+                          capture_output=True, text=True)
+
+
+def parse_importtime(stderr: str):
+    """解析 "import time: self | cumulative | name" 行 / Parse importtime lines -> [(cumulative_us, self_us, name)]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cum_us), int(self_us), name.rstrip()))
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--module", default="main")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=20)
+    args = ap.parse_args()
+
+    walls = []
+    for _ in range(args.runs):
+        t0 = time.perf_counter()
+        proc = run_import(args.module)
+        walls.append(time.perf_counter() - t0)
+        if proc.returncode != 0:
+            print(proc.stderr.strip().splitlines()[-1])
+            sys.exit(f"import {args.module} failed")
+    baseline = []
+    for _ in range(args.runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], capture_output=True)
+        baseline.append(time.perf_counter() - t0)
+
+    rows = parse_importtime(run_import(args.module, importtime=True).stderr)
+    names = {name.strip() for _, _, name in rows}
+
+    print(f"import {args.module}: median {statistics.median(walls) * 1000:.0f} ms "
+          f"(bare interpreter {statistics.median(baseline) * 1000:.0f} ms, {args.runs} runs)")
+    print(f"\nslowest imports (cumulative / self, ms):")
+    for cum, self_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"  {cum / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+
+    eager = [m for m in DEFERRED if m in names]
+    print("\ndeferred LLM modules:", "OK" if not eager else "imported at boot: " + ", ".join(eager))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# benchmarks/mock_llm_server.py
+# 本地 LLM 服务商替身：讲 OpenAI chat/completions、Cohere v1 /chat、HF Inference（TGI）三种协议，
+# 延迟分布、流式、错误率、坏 JSON 比例都可配置，用于压测而不消耗真实额度。
+# Local stand-in for the LLM providers. Speaks the OpenAI chat-completions, Cohere v1 /chat and
+# HF Inference (TGI) wire formats, with configurable latency distributions, streaming, error
+# rates and malformed-JSON outputs, so the LLM endpoints can be load-tested without API quota.
+#
+# 运行 / Run:  uvicorn benchmarks.mock_llm_server:app --port 8900
+#   或 / or:   python -m benchmarks.mock_llm_server --port 8900 --latency-median 0.4 --tail-rate 0.05
+# 让应用指向它 / point the app at it:
+#   OPENAI_BASE_URL=http://127.0.0.1:8900/v1 COHERE_BASE_URL=http://127.0.0.1:8900/v1
+#   HF_BASE_URL=http://127.0.0.1:8900  OPENAI_API_KEY=mock COHERE_API_KEY=mock HF_API_KEY=mock
+#
+# 管理接口 / admin: GET|POST /_mock/config（可按服务商覆盖 / per-provider overrides under "providers"）
+#                   GET /_mock/stats   POST /_mock/reset
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+
+class MockConfig(BaseModel):
+    latency_median: float = 0.4      # 对数正态延迟的中位数（秒）/ median of the lognormal latency (s)
+    latency_sigma: float = 0.3       # 对数正态 sigma / lognormal sigma
+    tail_rate: float = 0.0           # 长尾请求比例 / share of requests hitting the slow tail
+    tail_latency: float = 3.0        # 长尾额外延迟（秒）/ extra delay for tail requests (s)
+    error_rate: float = 0.0          # 返回 error_status 的比例 / share answered with error_status
+    error_status: int = 503
+    malformed_rate: float = 0.0      # 结构化请求返回坏 JSON 的比例 / structured requests answered with broken JSON
+    token_delay: float = 0.02        # 流式每个分片的间隔（秒）/ delay between streamed chunks (s)
+    chunk_chars: int = 12            # 每个分片的字符数 / characters per streamed chunk
+    providers: Dict[str, Dict[str, Any]] = Field(default_factory=dict)  # {"openai": {"tail_rate": 0.1}}
+
+    def for_provider(self, provider: str) -> "MockConfig":
+        override = self.providers.get(provider)
+        return self.model_copy(update=override) if override else self
+
+
+config = MockConfig()
+stats: Counter = Counter()
+app = FastAPI(title="mock-llm")
+
+TAGS = ["skill", "reading", "sport", "social", "art"]
+_BATCH_ID = re.compile(r"^(t\d+):", re.M)
+
+
+# ---------- 内容生成（按提示词确定性生成）/ Content (deterministic per prompt) ----------
+def _rng(prompt: str) -> random.Random:
+    return random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+
+
+def answer_for(prompt: str, cfg: MockConfig) -> str:
+    """按提示词的形态给出文本：建议 JSON 数组 / 批量理由 JSON 对象 / 普通文本"""
+    rnd = _rng(prompt)
+    structured = "JSON array" in prompt or "JSON object" in prompt
+    if structured and random.random() < cfg.malformed_rate:
+        stats["malformed"] += 1
+        return "Sure! Here are a few ideas: [{\"title\": \"Unfinished"
+    if "JSON array" in prompt:
+        items = [{"title": f"Mock activity {rnd.randint(1, 999)}", "duration": rnd.choice([20, 30, 45, 60]),
+                  "tag": rnd.choice(TAGS), "reason": "Generated by the mock provider."}
+                 for _ in range(rnd.randint(3, 5))]
+        return json.dumps(items)
+    if "JSON object" in prompt:
+        return json.dumps({tid: f"Mock reason for {tid}." for tid in _BATCH_ID.findall(prompt)})
+    words = ["Practice", "a", "little", "every", "day", "and", "celebrate", "small", "wins."]
+    return " ".join(rnd.choice(words) for _ in range(rnd.randint(20, 40)))
+
+
+async def _delay(cfg: MockConfig) -> None:
+    delay = random.lognormvariate(0, cfg.latency_sigma) * cfg.latency_median
+    if random.random() < cfg.tail_rate:
+        delay += cfg.tail_latency
+        stats["tail"] += 1
+    await asyncio.sleep(delay)
+
+
+def _chunks(text: str, size: int) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+async def _respond(provider: str, prompt: str, stream: bool, render, render_stream, media_type: str):
+    """公共流程：计数、错误注入、延迟、（流式）输出 / Shared path: count, inject errors, delay, respond"""
+    cfg = config.for_provider(provider)
+    stats[f"{provider}.{'stream' if stream else 'calls'}"] += 1
+    if random.random() < cfg.error_rate:
+        stats[f"{provider}.errors"] += 1
+        await asyncio.sleep(cfg.latency_median / 4)
+        return JSONResponse({"error": "mock upstream error"}, status_code=cfg.error_status)
+    await _delay(cfg)
+    text = answer_for(prompt, cfg)
+    if not stream:
+        return JSONResponse(render(text))
+
+    async def body() -> AsyncIterator[str]:
+        for piece in _chunks(text, cfg.chunk_chars):
+            yield render_stream(piece)
+            await asyncio.sleep(cfg.token_delay)
+        end = render_stream(None)
+        if end:
+            yield end
+
+    return StreamingResponse(body(), media_type=media_type)
+
+
+# ---------- OpenAI: POST /v1/chat/completions ----------
+@app.post("/v1/chat/completions")
+async def openai_chat(request: Request):
+    payload = await request.json()
+    prompt = "\n".join(str(m.get("content", "")) for m in payload.get("messages", []))
+
+    def render(text):
+        return {"id": "mock", "object": "chat.completion", "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                             "finish_reason": "stop"}]}
+
+    def render_stream(piece):
+        if piece is None:
+            return "data: [DONE]\n\n"
+        chunk = {"object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": piece}}]}
+        return "data: " + json.dumps(chunk) + "\n\n"
+
+    return await _respond("openai", prompt, bool(payload.get("stream")), render, render_stream,
+                          "text/event-stream")
+
+
+# ---------- Cohere: POST /v1/chat ----------
+@app.post("/v1/chat")
+async def cohere_chat(request: Request):
+    payload = await request.json()
+    prompt = (payload.get("preamble") or "") + "\n" + str(payload.get("message", ""))
+
+    def render(text):
+        return {"text": text, "generation_id": "mock", "finish_reason": "COMPLETE"}
+
+    def render_stream(piece):
+        if piece is None:
+            return json.dumps({"event_type": "stream-end", "finish_reason": "COMPLETE"}) + "\n"
+        return json.dumps({"event_type": "text-generation", "text": piece}) + "\n"
+
+    return await _respond("cohere", prompt, bool(payload.get("stream")), render, render_stream,
+                          "application/x-ndjson")
+
+
+# ---------- Hugging Face Inference / TGI: POST /models/{model} ----------
+@app.post("/models/{model:path}")
+async def hf_generate(model: str, request: Request):
+    payload = await request.json()
+    prompt = str(payload.get("inputs", ""))
+
+    def render(text):
+        return [{"generated_text": text}]
+
+    def render_stream(piece):
+        if piece is None:
+            return "data:" + json.dumps({"token": {"text": "</s>", "special": True}}) + "\n\n"
+        return "data:" + json.dumps({"token": {"text": piece, "special": False}}) + "\n\n"
+
+    return await _respond("hf", prompt, bool(payload.get("stream")), render, render_stream,
+                          "text/event-stream")
+
+
+# ---------- 管理接口 / Admin ----------
+@app.get("/_mock/config")
+async def get_config():
+    return config.model_dump()
+
+
+@app.post("/_mock/config")
+async def set_config(update: Dict[str, Any]):
+    """部分更新配置 / Partial config update"""
+    global config
+    config = MockConfig(**{**config.model_dump(), **update})
+    return config.model_dump()
+
+
+@app.get("/_mock/stats")
+async def get_stats():
+    return dict(stats)
+
+
+@app.post("/_mock/reset")
+async def reset_stats():
+    stats.clear()
+    return PlainTextResponse("ok")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import uvicorn
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8900)
+    for name, field in MockConfig.model_fields.items():
+        if field.annotation in (int, float):
+            ap.add_argument("--" + name.replace("_", "-"), type=field.annotation, default=field.default)
+    args = ap.parse_args(argv)
+
+    global config
+    config = MockConfig(**{k: getattr(args, k) for k in MockConfig.model_fields if hasattr(args, k)})
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
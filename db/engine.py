@@ -46,6 +46,7 @@ async def init_db() -> None:
 
         # 关键：导入 SQLModel 模型，让 metadata 收集到表
         import models.event_model  # noqa: F401
+        import models.feedback_model  # noqa: F401
         # 若还有其他 SQLModel 表，在此一起导入
         # import models.schedule_model  # noqa: F401
         # import models.user_profile   # noqa: F401
@@ -0,0 +1,145 @@
+# feedback/bandit.py
+# 在线学习器（Thompson Sampling）：每个孩子 × 任务类型 × 时段 一个 Beta 后验
+# Online learner (Thompson sampling): one Beta posterior per child × task type × time-of-day bucket
+#
+# - 状态 / state: 两个 float32 数组 alpha/beta，形状 (孩子数, MAX_TASK_TYPES, N_BUCKETS)
+# - 更新 / update: O(1) —— alpha += r, beta += 1 - r（r ∈ [0, 1] 为反馈得分）
+# - 查询 / query: 一次向量化调用给出一批 (任务类型, 小时) 的排序权重
+# - 持久化 / persistence: 有改动且距上次保存超过 PERSIST_SECONDS 时写 data/bandit_state.npz
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+STATE_FILE = os.getenv("BANDIT_STATE_FILE", os.path.join("data", "bandit_state.npz"))
+PERSIST_SECONDS = float(os.getenv("BANDIT_PERSIST_SECONDS", "30"))
+
+MAX_TASK_TYPES = 32     # 任务类型上限（超出的类型共享最后一格）/ extra types share the last slot
+BUCKET_HOURS = 3        # 每个时段桶覆盖的小时数 / hours per time-of-day bucket
+N_BUCKETS = 24 // BUCKET_HOURS
+PRIOR = 1.0             # Beta(1, 1) 均匀先验 / uniform prior
+
+
+def hour_bucket(hour):
+    """小时 -> 时段桶（支持标量或数组）/ hour -> bucket (scalar or array)"""
+    return (np.asarray(hour) % 24) // BUCKET_HOURS
+
+
+class BanditLearner:
+    def __init__(self, path: str = STATE_FILE, persist_seconds: float = PERSIST_SECONDS, seed: Optional[int] = None):
+        self.path = path
+        self.persist_seconds = persist_seconds
+        self._lock = threading.Lock()
+        self._rng = np.random.default_rng(seed)
+        self._children: Dict[str, int] = {}
+        self._types: Dict[str, int] = {}
+        self.alpha = np.full((8, MAX_TASK_TYPES, N_BUCKETS), PRIOR, dtype=np.float32)
+        self.beta = np.full((8, MAX_TASK_TYPES, N_BUCKETS), PRIOR, dtype=np.float32)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._load()
+
+    # ---------- 下标 / Indices ----------
+    def _child(self, child_id: str, create: bool) -> Optional[int]:
+        row = self._children.get(child_id)
+        if row is None and create:
+            row = self._children[child_id] = len(self._children)
+            if row >= self.alpha.shape[0]:
+                # 容量翻倍，摊还 O(1) / double capacity, amortized O(1)
+                grow = self.alpha.shape[0]
+                pad = np.full((grow, MAX_TASK_TYPES, N_BUCKETS), PRIOR, dtype=np.float32)
+                self.alpha = np.concatenate([self.alpha, pad])
+                self.beta = np.concatenate([self.beta, pad.copy()])
+        return row
+
+    def _type(self, task_type: str) -> int:
+        idx = self._types.get(task_type)
+        if idx is None:
+            idx = min(len(self._types), MAX_TASK_TYPES - 1)
+            if len(self._types) < MAX_TASK_TYPES:
+                self._types[task_type] = idx
+        return idx
+
+    # ---------- 更新 / Update ----------
+    def update(self, child_id: str, task_type: str, hour: int, reward: float) -> None:
+        """记录一次反馈，O(1) / Record one feedback event in O(1)"""
+        r = float(min(max(reward, 0.0), 1.0))
+        with self._lock:
+            c = self._child(child_id, create=True)
+            t, b = self._type(task_type), int(hour_bucket(hour))
+            self.alpha[c, t, b] += r
+            self.beta[c, t, b] += 1.0 - r
+            self._dirty = True
+        self.maybe_persist()
+
+    # ---------- 查询 / Query ----------
+    def weights(self, child_id: str, task_types: Sequence[str], hours: Sequence[int], sample: bool = True) -> np.ndarray:
+        """
+        一次向量化调用返回每个 (任务类型, 小时) 的排序权重
+        One vectorized call returning a ranking weight per (task type, hour) pair.
+          sample=True: Thompson 采样（探索）/ Thompson sample (explores)
+          sample=False: 后验均值 / posterior mean
+        """
+        with self._lock:
+            c = self._child(child_id, create=False)
+            t = np.fromiter((self._types.get(x, MAX_TASK_TYPES - 1) for x in task_types), dtype=np.int64,
+                            count=len(task_types))
+            b = hour_bucket(np.asarray(hours, dtype=np.int64))
+            if c is None:
+                a = np.full(len(t), PRIOR, dtype=np.float32)
+                z = a.copy()
+            else:
+                a, z = self.alpha[c, t, b], self.beta[c, t, b]
+            if sample:
+                # numpy Generator 不是线程安全的，采样也在锁内 / Generator is not thread-safe: sample under the lock
+                return self._rng.beta(a, z)
+        return a / (a + z)
+
+    # ---------- 持久化 / Persistence ----------
+    def maybe_persist(self) -> None:
+        if self._dirty and time.monotonic() - self._saved_at >= self.persist_seconds:
+            self.flush()
+
+    def flush(self) -> None:
+        """立即写盘（原子替换）/ Write state now (atomic replace)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            n = len(self._children)
+            children = sorted(self._children, key=self._children.get)
+            types = sorted(self._types, key=self._types.get)
+            alpha, beta = self.alpha[:n].copy(), self.beta[:n].copy()
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp.npz"
+        np.savez(tmp, alpha=alpha, beta=beta, children=np.array(children, dtype=str),
+                 types=np.array(types, dtype=str))
+        os.replace(tmp, self.path)
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                children: List[str] = [str(x) for x in data["children"]]
+                types: List[str] = [str(x) for x in data["types"]]
+                alpha, beta = data["alpha"], data["beta"]
+        except (OSError, KeyError, ValueError) as e:
+            print("bandit state load skipped:", e)
+            return
+        cap = max(8, len(children))
+        self.alpha = np.full((cap, MAX_TASK_TYPES, N_BUCKETS), PRIOR, dtype=np.float32)
+        self.beta = np.full((cap, MAX_TASK_TYPES, N_BUCKETS), PRIOR, dtype=np.float32)
+        self.alpha[:len(children)] = alpha
+        self.beta[:len(children)] = beta
+        self._children = {c: i for i, c in enumerate(children)}
+        self._types = {t: i for i, t in enumerate(types)}
+
+
+learner = BanditLearner()
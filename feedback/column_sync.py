@@ -0,0 +1,166 @@
+# feedback/column_sync.py
+# 列式副本的唯一写者：按 (created_at, id) 水位从数据库反馈表增量拉取，批量追加到列文件。
+# 请求路径只写数据库；多 worker 时用文件锁选出一个进程写列文件，其余进程只读。
+# The single writer for the columnar copy: tails the feedback table by a (created_at, id)
+# watermark and appends new rows in batches. The request path only writes the database; with
+# several workers an exclusive file lock elects one process to write the column files.
+#
+# - 回看窗口 / lookback: created_at 在提交前由 Python 赋值，晚提交的事务可能落在水位之后；
+#   每次从 水位 - LOOKBACK 重新扫描，并按 id 去重（窗口内已同步的 id 记在水位文件里）
+#   created_at is set in Python before the commit, so a late commit can land behind the
+#   watermark; every pass rescans from watermark - LOOKBACK and skips ids already synced
+#   (the ids inside the window are kept in the watermark file). LOOKBACK must exceed the
+#   longest feedback transaction.
+# - 至少一次 / at-least-once: 追加后再写水位；两者之间崩溃会在下次重复追加这一批
+#   the watermark is saved after the append; a crash in between re-appends that batch
+# - 文件 I/O 在线程池中执行，不阻塞事件循环 / file I/O runs in the threadpool, off the event loop
+#
+# 环境变量 / env: FEEDBACK_COLUMNS_SYNC_SECONDS(2) FEEDBACK_COLUMNS_LOOKBACK_SECONDS(300)
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, or_
+from sqlmodel import select
+from starlette.concurrency import run_in_threadpool
+
+from feedback.columnar import FeedbackColumns, columns
+from models.feedback_model import FeedbackRecord
+
+SYNC_SECONDS = float(os.getenv("FEEDBACK_COLUMNS_SYNC_SECONDS", "2"))
+LOOKBACK_SECONDS = float(os.getenv("FEEDBACK_COLUMNS_LOOKBACK_SECONDS", "300"))
+BATCH = 1000
+
+
+def column_row(rec: FeedbackRecord) -> Dict[str, Any]:
+    """数据库行 -> 列式行（评分归一到 0-1）/ DB row -> columnar row (rating normalized to 0-1)"""
+    created = rec.created_at if rec.created_at.tzinfo else rec.created_at.replace(tzinfo=timezone.utc)
+    return {
+        "child": rec.user_id, "task": rec.task_name,
+        "rating": min(max((rec.rating - 1) / 4, 0.0), 1.0),
+        "difficulty": rec.difficulty, "time_efficiency": rec.time_efficiency,
+        "hour": rec.hour, "ts": int(created.timestamp()),
+    }
+
+
+class ColumnSync:
+    def __init__(self, cols: FeedbackColumns = columns, interval: float = SYNC_SECONDS,
+                 lookback: float = LOOKBACK_SECONDS):
+        self.columns = cols
+        self.interval = interval
+        self.lookback = timedelta(seconds=lookback)
+        self.synced = 0
+        self._mark_path = os.path.join(cols.root, "watermark.json")
+        self._mark: Optional[Dict[str, Any]] = None
+        self._lock_file = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------- 选主 / Leader election ----------
+    def _try_lead(self) -> bool:
+        """非阻塞地拿排他文件锁；持有者即唯一写者 / Non-blocking exclusive flock; the holder is the writer"""
+        if self._lock_file is not None:
+            return True
+        try:
+            import fcntl
+        except ImportError:            # 非 POSIX：单进程部署 / non-POSIX: assume one process
+            self._lock_file = True
+            return True
+        os.makedirs(self.columns.root, exist_ok=True)
+        f = open(os.path.join(self.columns.root, "writer.lock"), "w")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._lock_file = f
+        return True
+
+    # ---------- 水位 / Watermark ----------
+    def _load_mark(self) -> Optional[Dict[str, Any]]:
+        if self._mark is None:
+            try:
+                with open(self._mark_path, "r", encoding="utf-8") as f:
+                    self._mark = json.load(f)
+            except (OSError, ValueError):
+                self._mark = None
+        return self._mark
+
+    def _append(self, rows: List[Dict[str, Any]], mark: Dict[str, Any]) -> None:
+        self.columns.append_many(rows)
+        tmp = self._mark_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(mark, f)
+        os.replace(tmp, self._mark_path)
+        self._mark = mark
+
+    # ---------- 同步 / Sync ----------
+    async def _scan(self, session_maker: Callable, since: Optional[datetime],
+                    seen: Dict[str, str]) -> List[FeedbackRecord]:
+        """从 since 起按 (created_at, id) 分页，收集未同步的行（最多 BATCH）/ page from since, collect unsynced rows"""
+        new: List[FeedbackRecord] = []
+        cursor: Optional[FeedbackRecord] = None
+        async with session_maker() as session:
+            while len(new) < BATCH:
+                stmt = select(FeedbackRecord).order_by(FeedbackRecord.created_at, FeedbackRecord.id).limit(BATCH)
+                if since is not None:
+                    stmt = stmt.where(FeedbackRecord.created_at >= since)
+                if cursor is not None:
+                    stmt = stmt.where(or_(
+                        FeedbackRecord.created_at > cursor.created_at,
+                        and_(FeedbackRecord.created_at == cursor.created_at, FeedbackRecord.id > cursor.id),
+                    ))
+                recs = list((await session.execute(stmt)).scalars())
+                new.extend(r for r in recs if str(r.id) not in seen)
+                if len(recs) < BATCH:
+                    break
+                cursor = recs[-1]
+        return new[:BATCH]
+
+    async def sync_once(self, session_maker: Callable) -> int:
+        """拉取并追加一批（最多 BATCH 行），返回行数 / Pull and append one batch; returns the row count"""
+        mark = await run_in_threadpool(self._load_mark)
+        at = datetime.fromisoformat(mark["created_at"]) if mark else None
+        seen: Dict[str, str] = dict(mark.get("recent", {})) if mark else {}
+        recs = await self._scan(session_maker, at - self.lookback if at else None, seen)
+        if not recs:
+            return 0
+        top = max(r.created_at for r in recs)
+        at = top if at is None else max(at, top)
+        seen.update((str(r.id), r.created_at.isoformat()) for r in recs)
+        # 只保留窗口内的 id / keep only the ids still inside the window
+        floor = at - self.lookback
+        recent = {i: t for i, t in seen.items() if datetime.fromisoformat(t) >= floor}
+        await run_in_threadpool(self._append, [column_row(r) for r in recs],
+                                {"created_at": at.isoformat(), "recent": recent})
+        self.synced += len(recs)
+        return len(recs)
+
+    async def run(self, session_maker: Callable) -> None:
+        while True:
+            try:
+                if await run_in_threadpool(self._try_lead):
+                    while await self.sync_once(session_maker) == BATCH:
+                        pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print("feedback column sync failed:", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self, session_maker: Callable) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run(session_maker))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+column_sync = ColumnSync()
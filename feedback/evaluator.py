@@ -1,9 +1,20 @@
 # feedback/evaluator.py
 # 任务反馈评估模块 / Feedback Evaluator
 
+import numpy as np
+
 from models.task_model import TaskFeedback
 
 # 输入任务反馈，计算任务完成度得分 / Evaluate completion quality based on feedback
 def evaluate_feedback(feedback: TaskFeedback) -> float:
     score = (feedback.rating + (1 - feedback.difficulty) + feedback.time_efficiency) / 3
     return round(score, 2)
+
+
+# 向量化版本（列式分析用）：缺少难度或效率的行只看评分
+# Vectorized version for columnar analytics; rows missing difficulty or efficiency fall back to the rating
+def evaluate_feedback_batch(rating, difficulty, time_efficiency) -> np.ndarray:
+    rating = np.asarray(rating, dtype=np.float64)
+    score = (rating + (1 - np.asarray(difficulty, dtype=np.float64))
+             + np.asarray(time_efficiency, dtype=np.float64)) / 3
+    return np.round(np.where(np.isnan(score), rating, score), 2)
@@ -0,0 +1,87 @@
+# feedback/store.py
+# 持久化反馈存储：写反馈的同时原子更新聚合表；读汇总为一次主键查找
+# Persistent feedback store: each write also upserts running aggregates atomically;
+# summary reads are a single primary-key lookup, identical on every worker.
+
+from __future__ import annotations
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from models.feedback_model import (
+    ALL_TASKS,
+    FeedbackAggregate,
+    FeedbackRecord,
+    check_task_name,
+    difficulty_bucket,
+)
+
+
+def _insert_for(session: AsyncSession):
+    """按方言选择支持 ON CONFLICT 的 insert / Pick the dialect insert that supports ON CONFLICT"""
+    if session.bind is not None and session.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+async def _bump(session: AsyncSession, user_id: str, task_name: str, rating: float,
+                difficulty: Optional[float], now: datetime) -> None:
+    """一条 upsert 语句完成自增（并发写安全）/ One upsert statement increments the row (safe under concurrent writers)"""
+    t = FeedbackAggregate.__table__
+    initial: Dict[str, Any] = {"user_id": user_id, "task_name": task_name, "count": 1,
+                               "rating_sum": rating, "updated_at": now}
+    increments: Dict[str, Any] = {"count": t.c.count + 1, "rating_sum": t.c.rating_sum + rating,
+                                  "updated_at": now}
+    if difficulty is not None:
+        col = f"diff_{difficulty_bucket(difficulty)}"
+        initial.update({"difficulty_count": 1, col: 1})
+        increments.update({"difficulty_count": t.c.difficulty_count + 1, col: t.c[col] + 1})
+
+    insert = _insert_for(session)
+    stmt = insert(t).values(**initial).on_conflict_do_update(
+        index_elements=["user_id", "task_name"], set_=increments
+    )
+    await session.execute(stmt)
+
+
+async def add_feedback(session: AsyncSession, data: Dict[str, Any]) -> FeedbackRecord:
+    """
+    写入一条反馈，并在同一事务里更新 (用户, 任务) 与 (用户, 全部) 两行聚合
+    Insert one feedback row and update the (user, task) and (user, all) aggregates in one transaction
+    (a task named "*" would collide with the total row and raises ValueError)
+    """
+    check_task_name(data.get("task_name"))
+    now = datetime.now(timezone.utc)
+    rec = FeedbackRecord(**{k: v for k, v in data.items() if k in FeedbackRecord.model_fields}, created_at=now)
+    session.add(rec)
+    for task_name in (rec.task_name, ALL_TASKS):
+        await _bump(session, rec.user_id, task_name, float(rec.rating), rec.difficulty, now)
+    await session.commit()
+    return rec
+
+
+async def list_feedback(session: AsyncSession, user_id: str, limit: int = 100, offset: int = 0) -> List[FeedbackRecord]:
+    """按 (user_id, created_at) 索引读取某用户的反馈 / Read a user's feedback via the (user_id, created_at) index"""
+    stmt = (
+        select(FeedbackRecord)
+        .where(FeedbackRecord.user_id == user_id)
+        .order_by(FeedbackRecord.created_at.desc())
+        .offset(offset)
+        .limit(limit)
+    )
+    rs = await session.execute(stmt)
+    return list(rs.scalars())
+
+
+async def get_summary(session: AsyncSession, user_id: str, task_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    聚合汇总：一次主键查找；task_name=None 为用户总计 / Aggregate summary: one primary-key lookup;
+    task_name=None is the user's total (asking for task "*" raises ValueError)
+    """
+    key = ALL_TASKS if task_name is None else check_task_name(task_name)
+    agg = await session.get(FeedbackAggregate, (user_id, key))
+    return agg.summary() if agg else None
@@ -24,9 +24,10 @@ from routers import all_routers
 # DB init + overview (see db/engine.py)
 from db.engine import init_db, log_db_overview
 
-# OpenAI 客户端（保留测试接口）
-# OpenAI client (keep the test endpoint)
-from utils.openai_client import generate_openai_reply as openai_reply
+# LLM 服务商按需加载（见 utils/llm_providers.py），启动时不导入客户端
+# LLM providers load on first use (see utils/llm_providers.py); no client imports at boot
+from utils import llm_providers
+from utils.sse import sse_event, sse_response
 
 
 # ========================================
@@ -82,6 +83,32 @@ async def on_startup():
     except Exception as e:
         print("DB overview skipped:", e)
 
+    # 3) 列式反馈副本的后台同步（文件锁选出唯一写者）
+    #    Background sync of the columnar feedback copy (a file lock elects the single writer)
+    from db.engine import async_session_maker
+    from feedback.column_sync import column_sync
+    column_sync.start(async_session_maker)
+
+    # 4) 后台任务 worker，并恢复上次未完成的持久化任务
+    #    Job workers, re-queuing durable jobs left unfinished by the last run
+    from services.jobs import jobs
+    jobs.start()
+
+
+# ========================================
+# 关闭事件：在线学习器状态落盘 + 关闭连接池 / Shutdown: persist learner state, close pools
+# ========================================
+@app.on_event("shutdown")
+async def on_shutdown():
+    from feedback.bandit import learner
+    from feedback.column_sync import column_sync
+    from services.jobs import jobs
+    from utils.llm_http import aclose_all
+    await column_sync.stop()
+    learner.flush()
+    await jobs.stop()   # 停止后台任务 worker（持久化的未完成任务下次启动重跑）/ stop job workers
+    await aclose_all()  # 关闭 LLM 连接池 / close LLM connection pools
+
 
 # ========================================
 # 静态文件挂载 / Static file mounts
@@ -112,6 +139,27 @@ def healthz():
     """K8s 风格健康检查 / K8s-style health check"""
     return {"status": "ok"}
 
+@app.get("/metrics/llm-cache", include_in_schema=False)
+def llm_cache_metrics():
+    """LLM 响应缓存命中率与容量 + 请求合并计数 / LLM cache hit rate and size, plus coalescing counters"""
+    from utils.llm_cache import cache
+    from utils.single_flight import flights
+    return {**cache.stats(), "single_flight": flights.stats()}
+
+@app.get("/metrics/llm-providers", include_in_schema=False)
+def llm_provider_metrics():
+    """各服务商熔断状态、对冲延迟、限流队列 / Per-provider breaker state, hedge delay, limiter queues"""
+    from utils.llm_dispatch import dispatcher
+    from utils.llm_limiter import limiter_stats
+    return {**dispatcher.stats(), "limits": limiter_stats(), "loaded": llm_providers.loaded()}
+
+@app.get("/metrics/auth", include_in_schema=False)
+def auth_metrics():
+    """用户缓存与 token 声明缓存命中率 / User cache and verified-claims cache hit rates"""
+    from services.security import claims_cache
+    from services.user_cache import user_cache
+    return {"users": user_cache.stats(), "claims": claims_cache.stats()}
+
 
 # ========================================
 # OpenAI 测试接口 / OpenAI test endpoint
@@ -122,11 +170,29 @@ async def test_llm(
 ):
     """使用 OpenAI 生成回答 / Generate a response using the OpenAI client"""
     try:
-        openai_output = openai_reply(prompt)
+        openai_output = await llm_providers.get("openai", "reply")(prompt)
     except Exception as e:
         openai_output = f"OpenAI error: {str(e)}"
     return {"openai": openai_output}
 
+@app.get("/test-llm/stream")
+async def test_llm_stream(
+    prompt: str = Query("Give me 3 creative ways to help kids build self-discipline.")
+):
+    """SSE 流式版本：event token {text} … event done / Streaming variant over Server-Sent Events"""
+    async def events():
+        if not llm_providers.configured("openai"):
+            yield sse_event({"detail": "OpenAI not configured: missing OPENAI_API_KEY"}, "error")
+        else:
+            try:
+                async for chunk in llm_providers.get("openai", "reply_stream")(prompt):
+                    yield sse_event({"text": chunk}, "token")
+            except Exception as e:
+                yield sse_event({"detail": f"OpenAI error: {str(e)}"}, "error")
+        yield sse_event({}, "done")
+
+    return sse_response(events())
+
 
 # ========================================
 # 注册业务功能路由（集中注册）
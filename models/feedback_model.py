@@ -0,0 +1,83 @@
+# models/feedback_model.py
+# -----------------------------------------------------------------------------
+# 反馈表 + 聚合表（数据库模型）/ Feedback rows + running aggregates (SQLModel tables)
+# -----------------------------------------------------------------------------
+# 设计要点 / Design notes
+# - 反馈按 (user_id, created_at) 与 task_name 建索引；Index feedback by user and by task
+# - 聚合表在写入时用 SQL 原子自增维护（多 worker 共享同一份结果）
+#   Aggregates are maintained on write with atomic SQL increments (identical on all workers)
+# - 每个用户有一行 task_name="*" 的总计，"*" 不能用作任务名（check_task_name）
+#   Each user has a task_name="*" total row; "*" is rejected as a real task name (check_task_name)
+# - 难度直方图固定 5 桶（0-0.2, …, 0.8-1.0）；Difficulty histogram uses 5 fixed buckets
+
+from __future__ import annotations
+from typing import Optional
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
+
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+
+ALL_TASKS = "*"          # 用户总计行的 task_name / task_name of a user's total row
+DIFFICULTY_BUCKETS = 5
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class FeedbackRecord(SQLModel, table=True):
+    __tablename__ = "feedback"
+    __table_args__ = (
+        Index("ix_feedback_user_created", "user_id", "created_at"),
+    )
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    user_id: str = Field(index=True)
+    task_name: str = Field(index=True)
+    rating: int
+    comment: Optional[str] = None
+    task_type: Optional[str] = None
+    hour: Optional[int] = None
+    difficulty: Optional[float] = None
+    time_efficiency: Optional[float] = None
+    created_at: datetime = Field(default_factory=utcnow, nullable=False)
+
+
+class FeedbackAggregate(SQLModel, table=True):
+    __tablename__ = "feedback_aggregates"
+
+    # (user_id, task_name) 复合主键：读取是一次主键查找 / composite PK: reads are one key lookup
+    user_id: str = Field(primary_key=True)
+    task_name: str = Field(primary_key=True)
+
+    count: int = 0
+    rating_sum: float = 0.0
+    difficulty_count: int = 0
+    diff_0: int = 0
+    diff_1: int = 0
+    diff_2: int = 0
+    diff_3: int = 0
+    diff_4: int = 0
+    updated_at: datetime = Field(default_factory=utcnow, nullable=False)
+
+    def summary(self) -> dict:
+        return {
+            "user_id": self.user_id,
+            "task_name": None if self.task_name == ALL_TASKS else self.task_name,
+            "count": self.count,
+            "mean_rating": round(self.rating_sum / self.count, 3) if self.count else None,
+            "difficulty_histogram": [self.diff_0, self.diff_1, self.diff_2, self.diff_3, self.diff_4],
+        }
+
+
+def check_task_name(task_name: str) -> str:
+    """"*" 保留给总计行，不能作任务名 / "*" is reserved for the total row and cannot name a task"""
+    if task_name == ALL_TASKS:
+        raise ValueError(f'task_name "{ALL_TASKS}" is reserved for the per-user total')
+    return task_name
+
+
+def difficulty_bucket(difficulty: float) -> int:
+    """难度 [0, 1] -> 直方图桶 / difficulty in [0, 1] -> histogram bucket"""
+    return min(max(int(difficulty * DIFFICULTY_BUCKETS), 0), DIFFICULTY_BUCKETS - 1)
@@ -9,6 +9,7 @@ class Task(BaseModel):
     title: str         # 任务标题 / Title of task
     description: str   # 任务描述 / Detailed instruction
     duration: int      # 持续时长（分钟） / Duration in minutes
+    reason: Optional[str] = None  # 推荐理由（规则即时给出，LLM 异步升级）/ Why it was recommended
 
 class TaskFeedback(BaseModel):
     task_id: str           # 任务 ID / Task being evaluated
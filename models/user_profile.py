@@ -8,8 +8,8 @@ from datetime import date
 
 # 一个时间段（每天可有多个）/ a daily time block
 class TimeBlock(BaseModel):
-    start: str = Field(..., regex=r"^\d{2}:\d{2}$")  # "HH:MM"
-    end: str   = Field(..., regex=r"^\d{2}:\d{2}$")  # "HH:MM"
+    start: str = Field(..., pattern=r"^\d{2}:\d{2}$")  # "HH:MM"
+    end: str   = Field(..., pattern=r"^\d{2}:\d{2}$")  # "HH:MM"
 
 # 每周模板：周一到周日任意天、每一天若干时间段
 # weekly template: weekday -> list of blocks
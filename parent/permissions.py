@@ -1,4 +1,8 @@
 # parent/permissions.py
+# 家长权限：基于内存中的家长↔孩子索引，O(1) / Parent permissions backed by the in-memory index, O(1)
+
+from services.family_index import family
+
 
 def parent_can_view(child_id: str, parent_id: str) -> bool:
-    return True
+    return family.linked(parent_id, child_id)
@@ -0,0 +1,131 @@
+# recommender/catalog.py
+# 活动目录：从 data/activity_catalog.json 加载一次，建立索引并预序列化卡片 JSON
+# Activity catalog: loaded once from data/activity_catalog.json, indexed, with card JSON
+# pre-serialized. The file is re-checked at most once per second and swapped atomically.
+#
+# 条目 / item: {"interest": "写作", "name": "写作练习", "tag": "skill", "duration": 30?, "keywords": "..."?}
+#   duration 可省略：省略时由请求决定（有可用时段 60，否则 45）
+#   duration is optional; when omitted the request decides (60 with availability, else 45)
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from utils.hot_reload import HotReloadFile
+
+CATALOG_FILE = os.getenv("ACTIVITY_CATALOG_FILE", os.path.join("data", "activity_catalog.json"))
+
+# 默认时长 / default durations (minutes)
+DURATION_WITH_AVAILABILITY = 60
+DURATION_DEFAULT = 45
+DEFAULT_DURATIONS = (DURATION_WITH_AVAILABILITY, DURATION_DEFAULT)
+
+# 未知兴趣的兜底卡片缓存上限 / cap on cached fallback cards for unknown interests
+FALLBACK_CACHE_SIZE = 1024
+
+DEFAULT_CATALOG: Dict = {
+    "fallback": [{"name": "通用学习任务", "tag": "skill"}, {"name": "通用阅读计划", "tag": "reading"}],
+    "items": [],
+}
+
+
+def card(interest: str, name: str, tag: str, duration: int) -> Dict:
+    """一张拖拽卡片（与 LiteTask 字段一致）/ One drag card (same fields as LiteTask)"""
+    return {
+        "title": f"{interest}-{name}",
+        "duration": duration,
+        "tag": tag,
+        "reason": f"结合你的兴趣「{interest}」与作息，先安排{tag}训练与阅读巩固。",
+    }
+
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class CatalogSnapshot:
+    """
+    只读快照 / Immutable snapshot
+      items: 条目列表 / catalog items
+      by_interest / by_tag / by_duration: 索引 -> 条目下标 / index -> item positions
+      fragments: (兴趣, 默认时长) -> 该兴趣全部卡片的 JSON 片段（逗号拼接，不含方括号）
+                 (interest, default duration) -> comma-joined JSON of that interest's cards
+    """
+
+    def __init__(self, data: Dict):
+        self.items: List[Dict] = [dict(x) for x in data.get("items", [])]
+        self.fallback: List[Dict] = [dict(x) for x in data.get("fallback", [])]
+
+        self.by_interest: Dict[str, List[int]] = {}
+        self.by_tag: Dict[str, List[int]] = {}
+        self.by_duration: Dict[Optional[int], List[int]] = {}
+        for i, item in enumerate(self.items):
+            self.by_interest.setdefault(item["interest"], []).append(i)
+            self.by_tag.setdefault(item["tag"], []).append(i)
+            self.by_duration.setdefault(item.get("duration"), []).append(i)
+
+        self.fragments: Dict[Tuple[str, int], bytes] = {}
+        for interest, idxs in self.by_interest.items():
+            for default in DEFAULT_DURATIONS:
+                self.fragments[(interest, default)] = b",".join(
+                    _dumps(self.card(self.items[i], default)) for i in idxs
+                )
+
+        self._fallback_cache: "OrderedDict[Tuple[str, int], bytes]" = OrderedDict()
+        self._fallback_lock = threading.Lock()
+
+    def card(self, item: Dict, default_duration: int) -> Dict:
+        return card(item["interest"], item["name"], item["tag"], item.get("duration") or default_duration)
+
+    def query(self, interest: Optional[str] = None, tag: Optional[str] = None,
+              max_duration: Optional[int] = None) -> List[Dict]:
+        """按兴趣/标签/时长筛选条目 / Filter items by interest, tag and duration"""
+        if interest is not None:
+            idxs = self.by_interest.get(interest, [])
+        elif tag is not None:
+            idxs = self.by_tag.get(tag, [])
+        else:
+            idxs = range(len(self.items))
+        out = []
+        for i in idxs:
+            item = self.items[i]
+            if tag is not None and item["tag"] != tag:
+                continue
+            if max_duration is not None and (item.get("duration") or 0) > max_duration:
+                continue
+            out.append(item)
+        return out
+
+    def fragment(self, interest: str, default_duration: int) -> bytes:
+        """
+        某兴趣的卡片 JSON 片段；目录外的兴趣走兜底并进入有上限的 LRU 缓存
+        JSON fragment of one interest's cards; unknown interests use the fallback via a bounded LRU
+        """
+        frag = self.fragments.get((interest, default_duration))
+        if frag is not None:
+            return frag
+        key = (interest, default_duration)
+        with self._fallback_lock:
+            frag = self._fallback_cache.get(key)
+            if frag is not None:
+                self._fallback_cache.move_to_end(key)
+                return frag
+        frag = b",".join(_dumps(card(interest, x["name"], x["tag"], x.get("duration") or default_duration))
+                         for x in self.fallback)
+        with self._fallback_lock:
+            self._fallback_cache[key] = frag
+            if len(self._fallback_cache) > FALLBACK_CACHE_SIZE:
+                self._fallback_cache.popitem(last=False)
+        return frag
+
+
+catalog = HotReloadFile(CATALOG_FILE, CatalogSnapshot, default=DEFAULT_CATALOG)
+
+
+def get_catalog() -> CatalogSnapshot:
+    """当前目录快照（文件变化时自动替换）/ Current catalog snapshot (swapped on file change)"""
+    return catalog.get()
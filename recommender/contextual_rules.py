@@ -1,14 +1,206 @@
 #recommender/contextual_rules
+# 情境规则引擎：把配置里的时段/星期/年龄规则编译成“每周分钟”查找表
+# Contextual rules engine: compiles hour/weekday/age rules from config into a
+# minute-of-week lookup table.
+#
+# - 规则文件 / rules file: data/contextual_rules.json（可用 CONTEXTUAL_RULES_FILE 覆盖）
+# - 优先级 / precedence: hour_rules < weekday_rules < age_rules（后者覆盖前者 / later wins）
+# - 查询 O(1)：table[weekday * 1440 + minute] -> 任务类型下标 / task-type index
+# - 热加载 / hot reload: 至多每 RELOAD_CHECK_SECONDS 秒检查一次文件 mtime，变化则重新编译并原子替换
 
-def get_optimal_task_type_by_time(time_slot: str) -> str:
+from __future__ import annotations
+
+import os
+from typing import Dict, List, Optional, Tuple
+
+from utils.hot_reload import HotReloadFile
+
+RULES_FILE = os.getenv("CONTEXTUAL_RULES_FILE", os.path.join("data", "contextual_rules.json"))
+RELOAD_CHECK_SECONDS = float(os.getenv("CONTEXTUAL_RULES_RELOAD_SECONDS", "1.0"))
+
+MINUTES_PER_DAY = 24 * 60
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+MAX_AGE = 25  # 超过此年龄按成年处理 / ages above this share the last bucket
+
+FLEXIBLE_TASK_TYPE = "灵活任务"
+
+# 配置文件缺失时的内置规则（与最初的硬编码逻辑一致）
+# Built-in rules used when the config file is missing (same as the original hard-coded logic)
+DEFAULT_RULES: Dict = {
+    "default_task_type": FLEXIBLE_TASK_TYPE,
+    "flexible_task_type": FLEXIBLE_TASK_TYPE,
+    "hour_rules": [
+        {"start": "07:00", "end": "11:00", "task_type": "学习"},
+        {"start": "12:00", "end": "15:00", "task_type": "午休或轻松阅读"},
+        {"start": "16:00", "end": "19:00", "task_type": "运动"},
+    ],
+    "weekday_rules": [],
+    "age_rules": [],
+    "tag_task_types": {
+        "skill": ["学习"],
+        "reading": ["学习", "午休或轻松阅读"],
+        "sport": ["运动"],
+        "social": [FLEXIBLE_TASK_TYPE],
+        "art": [FLEXIBLE_TASK_TYPE, "午休或轻松阅读"],
+    },
+}
+
+
+# ========== 编译 / Compilation ==========
+def _minute(value: str) -> int:
+    h, m = value.split(":")
+    return int(h) * 60 + int(m)
+
+
+def _spans(rule: Dict) -> List[Tuple[int, int]]:
+    """规则的 [start, end) 分钟区间；跨午夜拆成两段 / [start, end) minutes; wraps midnight"""
+    s, e = _minute(rule["start"]), _minute(rule["end"])
+    if e > s:
+        return [(s, e)]
+    return [(s, MINUTES_PER_DAY), (0, e)]
+
+
+class CompiledRules:
+    """
+    编译后的只读规则快照 / Immutable compiled rules snapshot.
+      types: 任务类型名称表 / task-type names
+      tables: 表下标 -> 每周分钟查找表（bytearray，长度 7*1440）/ minute-of-week tables
+      day_tables: 表下标 -> 不区分星期的每日查找表（长度 1440）/ weekday-independent tables
+      age_bucket: 年龄 -> 表下标 / age -> table index
+    """
+
+    def __init__(self, config: Dict):
+        default = config.get("default_task_type", FLEXIBLE_TASK_TYPE)
+        self.flexible = config.get("flexible_task_type", FLEXIBLE_TASK_TYPE)
+        self.types: List[str] = [default]
+        self._type_index: Dict[str, int] = {default: 0}
+        self.tag_task_types: Dict[str, Tuple[str, ...]] = {
+            tag: tuple(v) for tag, v in config.get("tag_task_types", {}).items()
+        }
+
+        hour_rules = config.get("hour_rules", [])
+        weekday_rules = config.get("weekday_rules", [])
+        age_rules = config.get("age_rules", [])
+
+        base_day = self._paint(bytearray(MINUTES_PER_DAY), hour_rules, weekday=None)
+        base_week = bytearray()
+        for wd in range(7):
+            base_week += self._paint(bytearray(base_day), weekday_rules, weekday=wd)
+
+        # 下标 0：不带年龄的表；其余为年龄段表，按规则边界切分 0..MAX_AGE
+        # Index 0: table without age rules; others are age buckets split at rule boundaries
+        self.tables: List[bytearray] = [base_week]
+        self.day_tables: List[bytearray] = [base_day]
+        self.age_bucket: List[int] = [0] * (MAX_AGE + 1)
+        if age_rules:
+            cuts = {0}
+            for r in age_rules:
+                cuts.add(max(0, int(r.get("min_age", 0))))
+                cuts.add(min(MAX_AGE + 1, int(r.get("max_age", MAX_AGE)) + 1))
+            starts = sorted(c for c in cuts if c <= MAX_AGE)
+            for n, lo in enumerate(starts):
+                hi = starts[n + 1] if n + 1 < len(starts) else MAX_AGE + 1
+                rules = [r for r in age_rules
+                         if int(r.get("min_age", 0)) <= lo <= int(r.get("max_age", MAX_AGE))]
+                self.day_tables.append(self._paint(bytearray(base_day), rules, weekday=None, day_only=True))
+                week = bytearray()
+                for wd in range(7):
+                    day = bytearray(base_week[wd * MINUTES_PER_DAY:(wd + 1) * MINUTES_PER_DAY])
+                    week += self._paint(day, rules, weekday=wd)
+                self.tables.append(week)
+                for age in range(lo, hi):
+                    self.age_bucket[age] = len(self.tables) - 1
+
+        # 每小时类型缓存（排程器按小时探测）/ per-hour types cached for the scheduler
+        self.hour_types: List[List[List[str]]] = [
+            [[self.types[t[wd * MINUTES_PER_DAY + h * 60]] for h in range(24)] for wd in range(7)]
+            for t in self.tables
+        ]
+
+    def _type(self, name: str) -> int:
+        if name not in self._type_index:
+            if len(self.types) >= 256:
+                raise ValueError("too many task types in contextual rules (max 256)")
+            self._type_index[name] = len(self.types)
+            self.types.append(name)
+        return self._type_index[name]
+
+    def _paint(self, table: bytearray, rules: List[Dict], weekday: Optional[int], day_only: bool = False) -> bytearray:
+        for r in rules:
+            days = r.get("days")
+            if days:
+                if day_only or weekday is None or WEEKDAYS[weekday] not in days:
+                    continue
+            idx = self._type(r["task_type"])
+            for s, e in _spans(r):
+                table[s:e] = bytes([idx]) * (e - s)
+        return table
+
+    def bucket(self, age: Optional[int]) -> int:
+        """年龄 -> 表下标；None 表示不套用年龄规则 / age -> table index; None skips age rules"""
+        if age is None:
+            return 0
+        return self.age_bucket[min(max(int(age), 0), MAX_AGE)]
+
+
+# ========== 引擎（热加载）/ Engine (hot reload) ==========
+class RulesEngine(HotReloadFile[CompiledRules]):
+    def __init__(self, path: str = RULES_FILE, check_seconds: float = RELOAD_CHECK_SECONDS):
+        super().__init__(path, CompiledRules, default=DEFAULT_RULES, check_seconds=check_seconds)
+
+    @property
+    def compiled(self) -> CompiledRules:
+        return self.get()
+
+
+engine = RulesEngine()
+
+
+# ========== 对外接口 / Public API ==========
+def task_type_at(weekday: int, minute: int, age: Optional[int] = None) -> str:
+    """
+    O(1) 查询：星期几（0=周一）+ 当天分钟 -> 推荐任务类型
+    O(1) lookup: weekday (0 = Monday) + minute of day -> recommended task type
+    """
+    c = engine.compiled
+    b = c.bucket(age)
+    return c.types[c.tables[b][weekday * MINUTES_PER_DAY + minute % MINUTES_PER_DAY]]
+
+
+def hour_types(weekday: int, age: Optional[int] = None) -> List[str]:
+    """某天每小时的任务类型（24 项）/ Task type for each hour of a weekday (24 entries)"""
+    c = engine.compiled
+    b = c.bucket(age)
+    return c.hour_types[b][weekday]
+
+
+def get_optimal_task_type_by_time(time_slot: str, age: Optional[int] = None) -> str:
     """
     根据时间返回推荐任务类型 / Recommend task type based on circadian rhythm
+    time_slot: "HH:MM"（不区分星期 / weekday-independent）；无法解析时返回灵活任务（与旧版一致）
+    unparseable input falls back to the flexible type, as before
+    """
+    c = engine.compiled
+    try:
+        minute = int(time_slot[:2]) * 60 + (int(time_slot[3:5]) if len(time_slot) >= 5 else 0)
+    except (TypeError, ValueError):
+        return c.flexible
+    return c.types[c.day_tables[c.bucket(age)][minute % MINUTES_PER_DAY]]
+
+
+def time_suitability(tag: str, task_type: str) -> float:
+    """
+    标签与时段类型的匹配度 / How well an activity tag fits a time-slot type
+      1.0 = 首选时段 / preferred slot
+      0.5 = 灵活时段或未知标签 / flexible slot or unknown tag
+      0.0 = 不建议 / discouraged
     """
-    if "07" <= time_slot[:2] <= "10":
-        return "学习"
-    elif "12" <= time_slot[:2] <= "14":
-        return "午休或轻松阅读"
-    elif "16" <= time_slot[:2] <= "18":
-        return "运动"
-    else:
-        return "灵活任务"
+    c = engine.compiled
+    preferred = c.tag_task_types.get(tag)
+    if preferred is None:
+        return 0.5
+    if task_type in preferred:
+        return 1.0
+    if task_type == c.flexible:
+        return 0.5
+    return 0.0
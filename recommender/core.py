@@ -1,24 +1,29 @@
 # recommender/core.py
 # Task Recommender Core Logic
 
-from utils.schedule_optimizer import generate_schedule
+from datetime import date, timedelta
+from typing import Optional
+
+from utils.schedule_optimizer import hhmm_to_minutes
 from utils.interest_extractor import extract_interest_from_survey
 from models.user_profile import UserProfile
 from models.task_model import Task
-from recommender.contextual_rules import get_optimal_task_type_by_time
+from recommender.contextual_rules import task_type_at
+from feedback.bandit import learner
 
 # Main recommendation function
-async def recommend_tasks(user_profile: UserProfile) -> list[Task]:
+async def recommend_tasks(user_profile: UserProfile, start_day: Optional[date] = None, days: int = 7) -> list[Task]:
     """
     Generate personalized growth tasks based on user's interests, goals,
     availability, and scientifically optimized time-use patterns.
 
     Steps:
     1. Extract key interests from the user's survey.
-    2. Loop through each available time slot.
-    3. Determine the optimal task type for that time (e.g., physical, creative, cognitive).
+    2. Loop through each available time block of the next `days` days.
+    3. Determine the optimal task type for that time (O(1) lookup in the compiled rules table).
     4. Combine interest and task type to generate a contextual task suggestion.
-    5. Return a list of Task objects with schedule and tags.
+    5. Rank them with the per-child online learner (one vectorized call over task type × hour).
+    6. Return a list of Task objects with schedule and tags.
 
     This method is designed to ensure that tasks:
     - Align with user's personal interests and goals,
@@ -28,24 +33,40 @@ async def recommend_tasks(user_profile: UserProfile) -> list[Task]:
 
     Args:
         user_profile (UserProfile): The input profile including interests, goals, availability.
+        start_day (date): First day to plan (defaults to today).
+        days (int): Number of days to plan.
 
     Returns:
         list[Task]: A list of personalized, time-aware tasks.
     """
     interests = extract_interest_from_survey(user_profile.survey)
     availability = user_profile.availability
+    start_day = start_day or date.today()
 
     tasks = []
+    task_types, hours = [], []
+
+    for offset in range(days):
+        day = start_day + timedelta(days=offset)
+        weekday = day.weekday()
+        for block in availability.resolve_for(day):
+            start = hhmm_to_minutes(block.start)
+            optimal_type = task_type_at(weekday, start)  # e.g., "学习", "运动"
+            duration = max(15, (hhmm_to_minutes(block.end) - start) // len(interests))
+            for interest in interests:
+                task = Task(
+                    task_id=f"{day.isoformat()}-{block.start}-{len(tasks)}",
+                    title=f"{interest} Training - {optimal_type}",
+                    description=f"{interest} · {optimal_type} · {day.isoformat()} {block.start}-{block.end}",
+                    duration=duration,
+                )
+                tasks.append(task)
+                task_types.append(optimal_type)
+                hours.append(start // 60)
 
-    for time_slot in availability:
-        optimal_type = get_optimal_task_type_by_time(time_slot)  # e.g., "creative work", "light reading"
-        for interest in interests:
-            task_name = f"{interest} Training - {optimal_type}"
-            task = Task(
-                name=task_name,
-                tags=[interest, optimal_type, "growth_task"],
-                scheduled_time=time_slot
-            )
-            tasks.append(task)
+    # 按孩子的反馈学习结果排序 / rank by what this child's feedback has taught the learner
+    if tasks:
+        weights = learner.weights(user_profile.user_id, task_types, hours)
+        tasks = [tasks[i] for i in (-weights).argsort(kind="stable")]
 
     return tasks
@@ -0,0 +1,165 @@
+# recommender/embedding_index.py
+# 本地检索：字符 n-gram 哈希向量 + 预计算的目录矩阵 + NumPy 暴力 top-k（无需 LLM、离线可用）
+# Local retrieval: hashed char n-gram vectors + a precomputed catalog matrix + NumPy brute-force
+# top-k. Runs offline, no LLM call.
+#
+# - 向量化 / vectorize: NFKC + 小写；拉丁词取（两端加空格的）2~4 字符 n-gram，中文取单字 + 双字；
+#   crc32 带符号哈希到 DIM 维，L2 归一化
+#   NFKC + lowercase; Latin tokens give char 2..4-grams (space-padded, stopwords dropped), CJK runs
+#   give character uni+bigrams; signed crc32 hashing into DIM buckets, L2-normalized
+# - 检索 / search: scores = M[:n] @ q，argpartition 取 top-k —— 10k 条 × 256 维整次检索 < 1 ms
+# - 增量 / incremental: add() 追加行，容量翻倍（摊还 O(1)）；目录热加载只新增条目时不重建
+
+from __future__ import annotations
+
+import re
+import threading
+import unicodedata
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from recommender.catalog import CatalogSnapshot, get_catalog
+
+DIM = 256
+NGRAM_RANGE = (2, 4)
+MIN_SCORE = 0.18  # 低于此分视为不相关 / below this a match is treated as unrelated
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_CJK = re.compile(r"[\u2e80-\u9fff\uac00-\ud7af]")
+# 问卷里常见但无区分度的英文词 / common survey words that carry no signal
+STOPWORDS = frozenset("i me my we a an the and or to of in on at for with like likes love loves enjoy "
+                      "want really very much do doing play playing is am are be".split())
+# 中文虚字/常见动词（不参与单字和双字）/ CJK filler characters, skipped in uni- and bigrams
+CJK_STOPCHARS = frozenset("我你他她的了和与也很都想要去喜欢爱在是有个们")
+
+
+def vectorize(text: str, dim: int = DIM) -> np.ndarray:
+    """
+    文本 -> L2 归一化的哈希向量；中文与拉丁文部分各自归一化后相加，避免长英文关键词稀释中文匹配
+    text -> L2-normalized hashed vector. CJK and Latin parts are normalized separately and then
+    summed, so long English keyword lists do not drown out Chinese matches.
+    """
+    parts = [np.zeros(dim, dtype=np.float32), np.zeros(dim, dtype=np.float32)]
+    norm = unicodedata.normalize("NFKC", text or "").lower()
+    lo, hi = NGRAM_RANGE
+    for token in _TOKEN.findall(norm):
+        if token in STOPWORDS:
+            continue
+        if _CJK.search(token):
+            # 中文：单字 + 双字 / CJK: character unigrams and bigrams
+            chars = [c if c not in CJK_STOPCHARS else "" for c in token]
+            grams = [c for c in chars if c] + [a + b for a, b in zip(chars, chars[1:]) if a and b]
+            vec = parts[0]
+        else:
+            padded = f" {token} "
+            grams = [padded[i:i + n] for n in range(lo, hi + 1) for i in range(len(padded) - n + 1)]
+            vec = parts[1]
+        for g in grams:
+            h = zlib.crc32(g.encode("utf-8"))
+            vec[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    out = np.zeros(dim, dtype=np.float32)
+    for vec in parts:
+        length = float(np.linalg.norm(vec))
+        if length > 0:
+            out += vec / length
+    length = float(np.linalg.norm(out))
+    if length > 0:
+        out /= length
+    return out
+
+
+def item_text(item: Dict) -> str:
+    """目录条目用于检索的文本 / Searchable text of a catalog item"""
+    return " ".join(str(item.get(k, "")) for k in ("interest", "name", "tag", "keywords"))
+
+
+class EmbeddingIndex:
+    def __init__(self, dim: int = DIM, capacity: int = 64):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._mat = np.zeros((capacity, dim), dtype=np.float32)
+        self.items: List[Dict] = []
+        self._keys: Dict[Tuple[str, str], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def add(self, items: Iterable[Dict]) -> int:
+        """增量加入条目（已存在的跳过）；返回新增数量 / Add items incrementally; returns how many were new"""
+        new = [x for x in items if (x.get("interest", ""), x.get("name", "")) not in self._keys]
+        if not new:
+            return 0
+        rows = np.stack([vectorize(item_text(x), self.dim) for x in new])
+        with self._lock:
+            n = len(self.items)
+            if n + len(new) > self._mat.shape[0]:
+                cap = max(self._mat.shape[0] * 2, n + len(new))
+                grown = np.zeros((cap, self.dim), dtype=np.float32)
+                grown[:n] = self._mat[:n]
+                self._mat = grown
+            self._mat[n:n + len(new)] = rows
+            for x in new:
+                self._keys[(x.get("interest", ""), x.get("name", ""))] = len(self.items)
+                self.items.append(x)
+        return len(new)
+
+    def search(self, query: str, k: int = 5, min_score: float = MIN_SCORE) -> List[Tuple[Dict, float]]:
+        """余弦相似度 top-k / Cosine-similarity top-k"""
+        q = vectorize(query, self.dim)
+        with self._lock:
+            n = len(self.items)
+            if n == 0:
+                return []
+            scores = self._mat[:n] @ q
+            items = self.items
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(items[i], float(scores[i])) for i in top if scores[i] >= min_score]
+
+
+# ========== 目录索引（跟随目录热加载）/ Catalog index (follows catalog hot reload) ==========
+_index = EmbeddingIndex()
+_indexed_snapshot: Optional[CatalogSnapshot] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> EmbeddingIndex:
+    """
+    当前目录的索引：目录只新增条目时增量加入，有删改时重建
+    Index of the current catalog: new items are added incrementally; removals or edits rebuild it
+    """
+    global _index, _indexed_snapshot
+    snapshot = get_catalog()
+    if snapshot is _indexed_snapshot:
+        return _index
+    with _index_lock:
+        if snapshot is not _indexed_snapshot:
+            # 按 (interest, name) 建字典比对，O(n)；已索引条目都原样存在才走增量
+            # diff through a (interest, name) -> item dict, O(n); incremental only if every indexed item is unchanged
+            current = {(x.get("interest", ""), x.get("name", "")): x for x in snapshot.items}
+            unchanged = all(current.get(key) == _index.items[i] for key, i in _index._keys.items())
+            if not unchanged:
+                _index = EmbeddingIndex()
+            _index.add([x for key, x in current.items() if key not in _index._keys])
+            _indexed_snapshot = snapshot
+    return _index
+
+
+def match_interests(text: str, k: int = 2, relative: float = 0.75) -> List[str]:
+    """
+    自由文本 -> 目录中最相近的兴趣（去重；分数需达到最高分的 relative 倍）
+    free text -> closest catalog interests (deduplicated; must score >= relative × best)
+    """
+    out: List[str] = []
+    hits = get_index().search(text, k=k * 4)
+    for item, score in hits:
+        if score < hits[0][1] * relative:
+            break
+        if item["interest"] not in out:
+            out.append(item["interest"])
+        if len(out) >= k:
+            break
+    return out
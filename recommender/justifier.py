@@ -2,96 +2,105 @@
 # Module: Task Explanation Generator using Rule-Based and LLM Approaches
 # Description: Provides both rule-based and LLM-based reasoning for task recommendations
 
-import os
-import requests
+import json
+import re
+
 from models.user_profile import UserProfile
 from models.task_model import Task
-from recommender.core import build_prompt  # Prompt construction logic for LLM
+from utils.prompt_builder import build_prompt, build_batch_reason_prompt  # Precompiled prompt templates
+from utils.llm_http import PROVIDERS, post_json, stream_text  # Shared async connection pools per provider
+from utils.llm_cache import cached_llm  # Disk-backed response cache (utils/llm_cache.py)
+from utils.llm_dispatch import hedged_call  # Hedged multi-provider dispatch (utils/llm_dispatch.py)
 
 # Function: Generate rule-based explanation without LLM
 def generate_rule_based_reason(task):
     """
     Generate a simple explanation based on task tags.
-    This is used when LLM is not available or not preferred.
+    This is used when LLM is not available or not preferred, and as the instant
+    first answer before the batched LLM reasons arrive.
+    Works with Task (title / description "interest · task type · ...") and with
+    objects that carry name / tags.
     """
-    return f"The task '{task.name}' is recommended based on your interests: {task.tags}."
+    name = getattr(task, "name", None) or task.title
+    tags = getattr(task, "tags", None) or task.description.split(" · ")[:2]
+    if isinstance(tags, (list, tuple)):
+        tags = ", ".join(str(t) for t in tags)
+    return f"The task '{name}' is recommended based on your interests: {tags}."
+
+# Async LLM calls below share one keep-alive connection pool per provider (utils/llm_http.py),
+# so concurrent requests scale with connections rather than threadpool workers.
+# Responses are cached by provider/model/prompt; placeholder answers are never cached.
+
+def is_llm_answer(text):
+    return bool(text) and not text.startswith(("No response from", "Invalid response format"))
 
 # Function: Use OpenAI GPT to generate explanation
-def llm_openai(user_profile):
+async def llm_openai(user_profile):
     """
     Generate explanation using OpenAI GPT (gpt-3.5-turbo).
     Requires OPENAI_API_KEY in environment variables.
     """
     prompt = build_prompt(user_profile)
-    api_key = os.getenv("OPENAI_API_KEY")
 
-    if not api_key:
+    if not PROVIDERS["openai"].api_key:
         return "OpenAI API key not found."
 
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    return await _openai_reason(prompt)
 
+@cached_llm("openai", "gpt-3.5-turbo", {"kind": "reason", "temperature": 0.7}, cacheable=is_llm_answer)
+async def _openai_reason(prompt):
     data = {
         "model": "gpt-3.5-turbo",
         "messages": [{"role": "user", "content": prompt}],
         "temperature": 0.7
     }
 
-    response = requests.post(url, headers=headers, json=data)
-    result = response.json()
+    result = await post_json("openai", "/chat/completions", data)
 
     return result.get("choices", [{}])[0].get("message", {}).get("content", "No response from OpenAI")
 
 # Function: Use Cohere API to generate explanation
-def llm_cohere(user_profile):
+async def llm_cohere(user_profile):
     """
     Generate explanation using Cohere API (command-r model).
     Requires COHERE_API_KEY in environment variables.
     """
     prompt = build_prompt(user_profile)
-    api_key = os.getenv("COHERE_API_KEY")
 
-    if not api_key:
+    if not PROVIDERS["cohere"].api_key:
         return "Cohere API key not found."
 
-    url = "https://api.cohere.ai/v1/chat"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    return await _cohere_reason(prompt)
 
+@cached_llm("cohere", "command-r", {"kind": "reason", "temperature": 0.3}, cacheable=is_llm_answer)
+async def _cohere_reason(prompt):
     data = {
         "model": "command-r",
         "message": prompt,
         "temperature": 0.3
     }
 
-    response = requests.post(url, headers=headers, json=data)
-    result = response.json()
+    result = await post_json("cohere", "/chat", data)
 
     return result.get("text", "No response from Cohere")
 
 # Function: Use DeepSeek via Hugging Face API to generate explanation
-def llm_deepseek(user_profile):
+DEEPSEEK_MODEL = "deepseek-ai/deepseek-coder-6.7b-instruct"
+
+async def llm_deepseek(user_profile):
     """
     Generate explanation using DeepSeek (hosted on Hugging Face).
     Requires HF_API_KEY (Hugging Face Token) in environment variables.
     """
     prompt = build_prompt(user_profile)
-    api_key = os.getenv("HF_API_KEY")
 
-    if not api_key:
+    if not PROVIDERS["hf"].api_key:
         return "Hugging Face API key not found."
 
-    url = "https://api-inference.huggingface.co/models/deepseek-ai/deepseek-coder-6.7b-instruct"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    return await _deepseek_reason(prompt)
 
+@cached_llm("hf", DEEPSEEK_MODEL, {"kind": "reason", "max_new_tokens": 150}, cacheable=is_llm_answer)
+async def _deepseek_reason(prompt):
     data = {
         "inputs": prompt,
         "parameters": {
@@ -99,10 +108,127 @@ def llm_deepseek(user_profile):
         }
     }
 
-    response = requests.post(url, headers=headers, json=data)
-    result = response.json()
+    result = await post_json("hf", f"/models/{DEEPSEEK_MODEL}", data)
 
     if isinstance(result, list) and len(result) > 0:
         return result[0].get("generated_text", "No response from DeepSeek")
     else:
         return "Invalid response format from DeepSeek"
+
+# Reason provider -> llm_http / suggestion provider key; the single map shared by the routers
+PROVIDER_KEYS = {"openai": "openai", "cohere": "cohere", "deepseek": "hf"}  # DeepSeek runs on HF
+REASONERS = {"openai": llm_openai, "cohere": llm_cohere, "deepseek": llm_deepseek}
+
+# Function: Hedged explanation shared by the /recommend/llm_reason route and the llm_reason job
+async def llm_reason(user_profile, provider="openai", hedge=True):
+    """
+    Explain a profile with the preferred provider, backed up by the other configured ones.
+    Returns {"reason", "provider"}; raises ValueError for an unknown provider and
+    NoProviderAvailable when no provider gives a usable answer.
+    """
+    if provider not in REASONERS:
+        raise ValueError(f"Unsupported provider: {provider}")
+    winner, reason = await hedged_call(
+        provider,
+        {name: (lambda fn=fn: fn(user_profile)) for name, fn in REASONERS.items()},
+        configured=lambda name: bool(PROVIDERS[PROVIDER_KEYS[name]].api_key),
+        valid=is_llm_answer,
+        hedge=hedge,
+    )
+    return {"reason": reason, "provider": winner}
+
+# Function: Stream an explanation chunk by chunk (used by the SSE endpoint)
+def stream_llm_reason(user_profile, provider):
+    """
+    Stream an explanation from one provider as text chunks.
+    provider: openai / cohere / deepseek (the caller checks the API key first).
+    """
+    prompt = build_prompt(user_profile)
+
+    if provider == "openai":
+        return stream_text("openai", "/chat/completions", {
+            "model": "gpt-3.5-turbo",
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.7,
+            "stream": True
+        })
+    if provider == "cohere":
+        return stream_text("cohere", "/chat", {
+            "model": "command-r",
+            "message": prompt,
+            "temperature": 0.3,
+            "stream": True
+        })
+    return stream_text("hf", f"/models/{DEEPSEEK_MODEL}", {
+        "inputs": prompt,
+        "parameters": {"max_new_tokens": 150},
+        "stream": True
+    })
+
+
+# Function: One LLM call explaining a whole plan (instead of one call per task)
+BATCH_MAX_TASKS = 30  # distinct tasks per prompt; the rest keep their rule-based reason
+
+def build_batch_prompt(user_profile, tasks):
+    """
+    Pack many tasks into one structured prompt.
+    Tasks with the same title share one entry; returns (prompt, {short id: [task_id, ...]}).
+    """
+    groups = {}
+    for task in tasks:
+        groups.setdefault(task.title, []).append(task)
+    ids, lines = {}, []
+    for n, (title, same) in enumerate(list(groups.items())[:BATCH_MAX_TASKS], start=1):
+        short = f"t{n}"
+        ids[short] = [t.task_id for t in same]
+        lines.append(f"{short}: {title} ({same[0].duration} min; {same[0].description})")
+
+    return build_batch_reason_prompt(user_profile, lines), ids
+
+_BATCH_LINE = re.compile(r'^\W*(t\d+)\W+(.+?)\W*$')
+
+def parse_batch_reasons(text, ids):
+    """
+    Parse per-task answers: a JSON object first, then "t1: sentence" lines as a fallback.
+    Returns {task_id: reason} for every task whose id was answered.
+    """
+    answers = {}
+    start, end = (text or "").find("{"), (text or "").rfind("}")
+    if start != -1 and end > start:
+        try:
+            data = json.loads(text[start:end + 1])
+            if isinstance(data, dict):
+                answers = {str(k).strip(): str(v).strip() for k, v in data.items() if v}
+        except ValueError:
+            answers = {}
+    if not answers:
+        for line in (text or "").splitlines():
+            m = _BATCH_LINE.match(line.strip())
+            if m:
+                answers[m.group(1)] = m.group(2).strip().strip('"')
+
+    out = {}
+    for short, task_ids in ids.items():
+        if answers.get(short):
+            for task_id in task_ids:
+                out[task_id] = answers[short]
+    return out
+
+BATCH_CALLS = {"openai": _openai_reason, "cohere": _cohere_reason, "deepseek": _deepseek_reason}
+
+async def llm_batch_reasons(user_profile, tasks, provider="openai", hedge=True):
+    """
+    Explain a whole plan with a single LLM call (hedged across configured providers).
+    Returns {task_id: reason}; tasks missing from the answer are left out.
+    """
+    prompt, ids = build_batch_prompt(user_profile, tasks)
+    if not any(PROVIDERS[key].api_key for key in PROVIDER_KEYS.values()):
+        return {}
+    calls = {name: (lambda fn=fn: fn(prompt)) for name, fn in BATCH_CALLS.items()}
+    _, text = await hedged_call(
+        provider, calls,
+        configured=lambda name: bool(PROVIDERS[PROVIDER_KEYS[name]].api_key),
+        valid=lambda text: bool(parse_batch_reasons(text, ids)),
+        hedge=hedge,
+    )
+    return parse_batch_reasons(text, ids)
@@ -0,0 +1,106 @@
+# recommender/reason_pipeline.py
+# 推荐理由流水线：先立即返回规则理由，再用一次 LLM 调用为整份计划生成理由并异步推送升级
+# Justification pipeline: rule-based reasons are returned at once; one LLM call then explains
+# the whole plan and the upgraded reasons are pushed asynchronously (poll or SSE).
+#
+# - 调用次数 / calls: 每份计划 1 次（而不是每个任务 1 次）/ one provider call per plan instead of one per task
+# - 存储 / storage: 进程内，按 TTL 过期，数量有上限 / in-process, expires after a TTL, capped in size
+#
+# 环境变量 / env: REASON_UPGRADE_TTL(600 s) REASON_UPGRADE_MAX(1000)
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from models.task_model import Task
+from recommender.justifier import generate_rule_based_reason, llm_batch_reasons
+
+UPGRADE_TTL = float(os.getenv("REASON_UPGRADE_TTL", "600"))
+UPGRADE_MAX = int(os.getenv("REASON_UPGRADE_MAX", "1000"))
+
+
+@dataclass
+class ReasonUpgrade:
+    created: float
+    status: str = "pending"                       # pending | done | failed
+    reasons: Dict[str, str] = field(default_factory=dict)
+    provider: Optional[str] = None
+    error: Optional[str] = None
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def public(self) -> Dict[str, Any]:
+        return {"status": self.status, "reasons": self.reasons, "error": self.error}
+
+
+class ReasonUpgrades:
+    """升级任务的进程内存储 / In-process store of pending and finished upgrades"""
+
+    def __init__(self, ttl: float = UPGRADE_TTL, max_items: int = UPGRADE_MAX):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._items: "OrderedDict[str, ReasonUpgrade]" = OrderedDict()
+
+    def create(self) -> str:
+        self._prune()
+        upgrade_id = uuid.uuid4().hex
+        self._items[upgrade_id] = ReasonUpgrade(created=time.monotonic())
+        return upgrade_id
+
+    def get(self, upgrade_id: str) -> Optional[ReasonUpgrade]:
+        item = self._items.get(upgrade_id)
+        if item is not None and time.monotonic() - item.created > self.ttl:
+            self._items.pop(upgrade_id, None)
+            return None
+        return item
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        while self._items:
+            oldest = next(iter(self._items.values()))
+            if len(self._items) < self.max_items and now - oldest.created <= self.ttl:
+                break
+            self._items.popitem(last=False)
+
+
+upgrades = ReasonUpgrades()
+_background: set = set()   # 持有后台任务的引用，防止被回收 / keep references so tasks are not collected
+
+
+def rule_based_reasons(tasks: List[Task]) -> List[Task]:
+    """给每个任务补上规则理由（不调用 LLM）/ Fill every task's reason from the rules (no LLM)"""
+    return [t if t.reason else t.model_copy(update={"reason": generate_rule_based_reason(t)}) for t in tasks]
+
+
+async def _upgrade(upgrade_id: str, user_profile, tasks: List[Task], provider: str, hedge: bool) -> None:
+    item = upgrades.get(upgrade_id)
+    if item is None:
+        return
+    try:
+        item.reasons = await llm_batch_reasons(user_profile, tasks, provider=provider, hedge=hedge)
+        item.status = "done"
+    except Exception as e:  # 失败时前端保留规则理由 / on failure the client keeps the rule-based reasons
+        item.status, item.error = "failed", str(e)
+    finally:
+        item.ready.set()
+
+
+def justify_plan(user_profile, tasks: List[Task], provider: str = "openai", hedge: bool = True) -> Dict[str, Any]:
+    """
+    立即返回带规则理由的任务 + upgrade_id；LLM 升级在后台进行（需在事件循环内调用）
+    Returns the tasks with rule-based reasons plus an upgrade_id right away; the LLM upgrade
+    runs in the background (call from inside the event loop).
+    """
+    tasks = rule_based_reasons(tasks)
+    if not tasks:
+        return {"tasks": tasks, "upgrade_id": None}
+    upgrade_id = upgrades.create()
+    job = asyncio.get_running_loop().create_task(_upgrade(upgrade_id, user_profile, tasks, provider, hedge))
+    _background.add(job)
+    job.add_done_callback(_background.discard)
+    return {"tasks": tasks, "upgrade_id": upgrade_id}
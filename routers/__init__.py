@@ -7,14 +7,20 @@ from .recommender import router as recommender_router
 from .feedback import router as feedback_router
 from .parent import router as parent_router
 from .calendar_sync import router as calendar_sync_router
+from .events import router as events_router
+from .llm_reason import router as llm_reason_router
+from .jobs import router as jobs_router
 
-# for main.py 
+# for main.py：(router, prefix, tags)，与 main.py 的注册循环一致 / matches the loop in main.py
 all_routers = [
-    user_router,
-    schedule_router,
-    recommender_router,
-    feedback_router,
-    parent_router,
-    calendar_sync_router,
+    (user_router, "", ["user"]),
+    (schedule_router, "", ["schedule"]),
+    (events_router, "/schedule/events", ["events"]),
+    (recommender_router, "/recommend", ["recommend"]),
+    (llm_reason_router, "", ["recommend"]),
+    (feedback_router, "", ["feedback"]),
+    (parent_router, "", ["parent"]),
+    (calendar_sync_router, "/calendar", ["calendar"]),
+    (jobs_router, "/jobs", ["jobs"]),
 ]
 
@@ -11,13 +11,13 @@ from typing import List, Optional
 import os
 import json
 
+from services.child_tasks import task_store  # 孩子任务仓库（变更会通知物化视图）/ task store, notifies views
 
 router = APIRouter()
 
 # ========== 路径与文件 / Paths & files ==========
 DATA_DIR = "data"
 EXTERNAL_FILE = os.path.join(DATA_DIR, "external_calendar.json")       # 外部日历日志 / external calendar log
-TASK_FILE = os.path.join(DATA_DIR, "child_task_store.json")            # 孩子任务仓库 / child task store
 SAVED_FILE = os.path.join(DATA_DIR, "saved_calendar_events.json")      # FullCalendar 事件快照 / saved fullcalendar events
 
 # 确保 data 目录存在 / ensure data dir exists
@@ -63,7 +63,6 @@ def import_calendar_event(event: CalendarEvent):
     Import external calendar event and sync into child's task list.
     """
     external_calendar = load_json(EXTERNAL_FILE)  # dict: child_id -> [ {title, duration}, ... ]
-    child_task_store = load_json(TASK_FILE)       # dict: child_id -> [ {name, duration, ...}, ... ]
 
     # 1) 记录一条外部日历事件 / append one external calendar event
     external_calendar.setdefault(event.child_id, []).append({
@@ -73,13 +72,12 @@ def import_calendar_event(event: CalendarEvent):
     save_json(EXTERNAL_FILE, external_calendar)
 
     # 2) 同步为一个孩子任务（来源标记为 calendar）/ sync into child's task store
-    child_task_store.setdefault(event.child_id, []).append({
+    task_store.add(event.child_id, {
         "name": event.event_title,
         "duration": event.duration_minutes,
         "source": "calendar",
         "status": "pending"
     })
-    save_json(TASK_FILE, child_task_store)
 
     return {"message": "Event imported and synced to child task list."}
 
@@ -106,7 +104,6 @@ def update_calendar_event(
     Update an imported event and its synced child task.
     """
     external_calendar = load_json(EXTERNAL_FILE)
-    child_task_store = load_json(TASK_FILE)
 
     found = False
 
@@ -118,18 +115,12 @@ def update_calendar_event(
             found = True
             break
 
-    # 更新孩子任务仓库（同名匹配）/ update task store
-    for task in child_task_store.get(child_id, []):
-        if task.get("name") == old_title:
-            task["name"] = new_title
-            task["duration"] = new_duration
-            break
-
     if not found:
         raise HTTPException(status_code=404, detail="Event not found.")
 
     save_json(EXTERNAL_FILE, external_calendar)
-    save_json(TASK_FILE, child_task_store)
+    # 更新孩子任务仓库（同名匹配）/ update task store (first task with the old name)
+    task_store.update(child_id, old_title, {"name": new_title, "duration": new_duration})
 
     return {"message": "Event updated successfully."}
 
@@ -17,6 +17,8 @@ from sqlmodel import select
 from db.session import get_session                         # ✅ 统一使用项目级异步会话依赖
 from services.auth import current_active_user, User        # 鉴权依赖
 from models.event_model import Event                       # 事件 ORM 模型
+from services.child_summaries import summaries             # 家长面板摘要随事件增量更新
+from services.schedule_plans import repair_for_event       # 排程计划随事件增量修复（每用户锁）
 
 # 由外部聚合器统一加前缀 prefix="/events"
 router = APIRouter(prefix="")
@@ -111,6 +113,8 @@ async def create_event(
     session.add(ev)
     await session.commit()
     await session.refresh(ev)
+    summaries.apply_event(str(ev.owner_id), None, (ev.start, ev.end))
+    await repair_for_event(str(user.id), str(ev.id), to_fc(ev))
     return to_fc(ev)
 
 # -------------------- 批量创建 --------------------
@@ -139,6 +143,8 @@ async def create_events_bulk(
     await session.commit()
     for ev in created:
         await session.refresh(ev)
+        summaries.apply_event(str(ev.owner_id), None, (ev.start, ev.end))
+        await repair_for_event(str(user.id), str(ev.id), to_fc(ev))
     return [to_fc(ev) for ev in created]
 
 # -------------------- 查询单条 --------------------
@@ -174,6 +180,8 @@ async def update_event(
     if new_end <= new_start:
         raise HTTPException(status_code=422, detail="end must be after start")
 
+    before = (ev.start, ev.end)
+
     # 逐字段更新（只更新存在的字段）
     for k, v in data.items():
         if v is None:
@@ -184,6 +192,8 @@ async def update_event(
     session.add(ev)
     await session.commit()
     await session.refresh(ev)
+    summaries.apply_event(str(ev.owner_id), before, (ev.start, ev.end))
+    await repair_for_event(str(user.id), str(ev.id), to_fc(ev))
     return to_fc(ev)
 
 # -------------------- 删除单条 --------------------
@@ -197,6 +207,9 @@ async def delete_event(
     ev = rs.scalar_one_or_none()
     if not ev:
         raise HTTPException(status_code=404, detail="Event not found")
+    before = (ev.start, ev.end)
     await session.delete(ev)
     await session.commit()
+    summaries.apply_event(str(ev.owner_id), before, None)
+    await repair_for_event(str(user.id), str(event_id), None)
     return {"deleted": str(event_id)}
@@ -1,9 +1,20 @@
 # routers/feedback.py
 # User feedback collection API
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, field_validator
 from typing import Optional
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from db.session import get_session
+from models.task_model import TaskFeedback
+from feedback.evaluator import evaluate_feedback
+from feedback.bandit import learner
+from feedback import store
+from feedback.columnar import GROUP_KEYS, METRICS, columns
+from models.feedback_model import check_task_name
 
 router = APIRouter()
 
@@ -13,12 +24,35 @@ class Feedback(BaseModel):
     task_name: str             # 反馈对应的任务名
     rating: int                # 任务评分（例如1-5）
     comment: Optional[str] = None  # 可选文字评价
+    task_type: Optional[str] = None        # 任务类型（如 学习/运动），用于在线学习 / task type for the online learner
+    hour: Optional[int] = None             # 任务开始的小时（0-23），缺省为提交时间 / start hour, defaults to now
+    difficulty: Optional[float] = None     # 感知难度（0-1）/ perceived difficulty (0-1)
+    time_efficiency: Optional[float] = None  # 时间效率（0-1）/ time efficiency (0-1)
+
+    @field_validator("task_name")
+    @classmethod
+    def _not_the_total(cls, v: str) -> str:
+        return check_task_name(v)   # "*" 保留给总计行 / "*" is reserved for the per-user total row
 
-# 临时存储用户反馈（生产环境请改为数据库）/ In-memory feedback store
-feedback_db = []
+
+def feedback_reward(feedback: Feedback) -> float:
+    """
+    把反馈换算成 [0, 1] 的奖励：有难度/效率时用 evaluate_feedback，否则只看评分
+    Map feedback to a reward in [0, 1]: evaluate_feedback when difficulty/efficiency are given,
+    otherwise the normalized 1-5 rating.
+    """
+    rating = min(max((feedback.rating - 1) / 4, 0.0), 1.0)
+    if feedback.difficulty is None or feedback.time_efficiency is None:
+        return rating
+    return evaluate_feedback(TaskFeedback(
+        task_id=feedback.task_name,
+        rating=rating,
+        difficulty=feedback.difficulty,
+        time_efficiency=feedback.time_efficiency,
+    ))
 
 @router.post("/feedback/submit")
-def submit_feedback(feedback: Feedback):
+async def submit_feedback(feedback: Feedback, session: AsyncSession = Depends(get_session)):
     """
     Submit user feedback for a specific task.
 
@@ -27,19 +61,78 @@ def submit_feedback(feedback: Feedback):
     - task_name: the task being reviewed
     - rating: numeric score (e.g. 1–5)
     - comment: optional additional comment
+    - task_type / hour: optional; when task_type is given the online learner is updated
 
     Returns:
     - message: confirmation
     """
-    feedback_db.append(feedback)
+    # 持久化 + 聚合（数据库，所有 worker 一致）/ persist + aggregate (DB, same on every worker)
+    # 列式分析副本由唯一写者从数据库同步（feedback/column_sync.py）
+    # the columnar analytics copy is synced from the DB by a single writer (feedback/column_sync.py)
+    await store.add_feedback(session, feedback.model_dump())
+    if feedback.task_type:
+        hour = feedback.hour if feedback.hour is not None else datetime.now().hour
+        # 可能触发落盘，放到线程池 / may flush to disk, so run it in the threadpool
+        await run_in_threadpool(learner.update, feedback.user_id, feedback.task_type, hour,
+                                feedback_reward(feedback))
     return {"message": "Feedback submitted successfully."}
 
 @router.get("/feedback/user/{user_id}")
-def get_feedback_by_user(user_id: str):
+async def get_feedback_by_user(
+    user_id: str,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    session: AsyncSession = Depends(get_session),
+):
     """
-    Retrieve all feedback submitted by a specific user.
+    Retrieve feedback submitted by a specific user (newest first, paginated).
     """
-    user_feedback = [f for f in feedback_db if f.user_id == user_id]
-    if not user_feedback:
+    user_feedback = await store.list_feedback(session, user_id, limit=limit, offset=offset)
+    if not user_feedback and offset == 0:
         raise HTTPException(status_code=404, detail="No feedback found for this user.")
     return user_feedback
+
+@router.get("/feedback/user/{user_id}/summary")
+async def get_feedback_summary(user_id: str, session: AsyncSession = Depends(get_session)):
+    """
+    Summary stats for a user: count, mean rating and difficulty histogram (one key lookup).
+    """
+    summary = await store.get_summary(session, user_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No feedback found for this user.")
+    return summary
+
+@router.get("/feedback/user/{user_id}/task/{task_name}/summary")
+async def get_task_feedback_summary(user_id: str, task_name: str, session: AsyncSession = Depends(get_session)):
+    """
+    Summary stats for one user's feedback on one task (one key lookup).
+    """
+    try:
+        summary = await store.get_summary(session, user_id, task_name)
+    except ValueError as e:                      # task_name="*"：总计行不按任务暴露 / the total is not a task
+        raise HTTPException(status_code=422, detail=str(e))
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No feedback found for this task.")
+    return summary
+
+@router.get("/feedback/analytics")
+def feedback_analytics(
+    by: str = Query("task", description="task | child | hour | weekday"),
+    metric: str = Query("score", description="score | rating | difficulty | time_efficiency"),
+    percentiles: str = Query("50,90", description="comma-separated, e.g. 50,90,99"),
+    since: Optional[float] = Query(None, description="UTC epoch seconds"),
+    until: Optional[float] = Query(None, description="UTC epoch seconds"),
+):
+    """
+    Cross-child feedback rollup (vectorized over the columnar store).
+    Returns one row per group: count, mean and the requested percentiles.
+    """
+    if by not in GROUP_KEYS or metric not in METRICS:
+        raise HTTPException(status_code=400, detail=f"by must be one of {GROUP_KEYS}, metric one of {METRICS}")
+    try:
+        qs = [float(q) for q in percentiles.split(",") if q.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="percentiles must be numbers")
+    if any(q < 0 or q > 100 for q in qs):
+        raise HTTPException(status_code=400, detail="percentiles must be within 0-100")
+    return columns.rollup(by=by, metric=metric, percentiles=qs, since=since, until=until)
@@ -0,0 +1,83 @@
+# routers/jobs.py
+# 后台任务接口 / Background job API (services/jobs.py)
+#   POST /jobs                  提交，立即返回 job_id / submit, returns a job_id at once
+#   GET  /jobs/{job_id}         轮询状态与结果 / poll status and result
+#   GET  /jobs/{job_id}/stream  SSE：status … result|error … done
+#   GET  /jobs/stats            队列统计 / queue counters
+
+from typing import Any, Dict
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field, ValidationError
+
+from services.jobs import HANDLERS, JobQueueFull, jobs
+from utils.sse import sse_event, sse_response
+
+router = APIRouter()
+
+HEARTBEAT_SECONDS = 15  # SSE 保活间隔 / SSE keep-alive interval
+
+
+class JobSubmit(BaseModel):
+    kind: str = Field(..., description="plan | ai_suggest | llm_reason")
+    payload: Dict[str, Any] = Field(default_factory=dict)
+    priority: int = Field(0, description="越大越先执行 / higher runs first")
+
+
+@router.post("", status_code=202)
+async def submit_job(req: JobSubmit):
+    if req.kind not in HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind: {req.kind}")
+    try:
+        job, deduplicated = jobs.submit(req.kind, req.payload, req.priority)
+    except ValidationError as e:   # payload 不合法：不入队 / bad payload: never queued
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"job_id": job.id, "status": job.status, "deduplicated": deduplicated}
+
+
+@router.get("/stats")
+async def job_stats():
+    return jobs.stats()
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.public()
+
+
+@router.get("/{job_id}/stream")
+async def stream_job(job_id: str):
+    """
+    事件 / events:
+      status {status}       每次状态变化 / on every status change
+      result {result}       完成 / finished
+      error  {detail}       失败 / failed
+      done   {status}
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        last = None
+        while True:
+            if job.status != last:
+                last = job.status
+                yield sse_event({"status": last}, "status")
+            if job.terminal:
+                break
+            await jobs.wait_change(job, HEARTBEAT_SECONDS)   # 他人的任务会重读存储 / re-polls foreign jobs
+            if job.status == last:
+                yield ": keep-alive\n\n"
+        if job.status == "done":
+            yield sse_event({"result": job.result}, "result")
+        else:
+            yield sse_event({"detail": job.error}, "error")
+        yield sse_event({"status": job.status}, "done")
+
+    return sse_response(events())
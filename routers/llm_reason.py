@@ -1,32 +1,82 @@
 # routers/llm_reason.py
 # Explainable AI reasoning via different LLMs (OpenAI, Cohere, DeepSeek)
 
+from typing import Literal
+
 from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
 from models.user_profile import UserProfile
-from recommender.justifier import llm_openai, llm_cohere, llm_deepseek
+from recommender.justifier import PROVIDER_KEYS, REASONERS, llm_reason, stream_llm_reason
+from utils.llm_dispatch import NoProviderAvailable, stream_with_failover
+from utils.llm_http import PROVIDERS
+from utils.sse import sse_event, sse_response
+from services.jobs import register_job
+
 
 router = APIRouter()
 
 @router.post("/recommend/llm_reason")
-def get_llm_reason(user_profile: UserProfile, provider: str = Query("openai")):
+async def get_llm_reason(user_profile: UserProfile, provider: str = Query("openai"), hedge: bool = Query(True)):
     """
     Generate human-style explanation for recommended tasks using selected LLM.
 
     Parameters:
     - user_profile (UserProfile): user information, including survey and availability
-    - provider (str): LLM provider, choose from: openai / cohere / deepseek
+    - provider (str): preferred LLM provider, choose from: openai / cohere / deepseek
+      (other configured providers back it up via hedged requests, see utils/llm_dispatch.py)
+    - hedge (bool): fire a backup request once the preferred provider exceeds its p95 latency
 
     Returns:
     - reason (str): natural language explanation of why these tasks are suitable
     """
+    if provider not in REASONERS:
+        raise HTTPException(status_code=400, detail="Unsupported provider")
     try:
-        if provider == "openai":
-            return {"reason": llm_openai(user_profile)}
-        elif provider == "cohere":
-            return {"reason": llm_cohere(user_profile)}
-        elif provider == "deepseek":
-            return {"reason": llm_deepseek(user_profile)}
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported provider")
+        return await llm_reason(user_profile, provider=provider, hedge=hedge)
+    except NoProviderAvailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"LLM reasoning failed: {str(e)}")
+
+
+@router.post("/recommend/llm_reason/stream")
+async def stream_llm_reason_route(user_profile: UserProfile, provider: str = Query("openai")):
+    """
+    Streaming variant (Server-Sent Events). Events:
+    - token: {"text": "..."} as the provider generates it
+    - error: {"detail": "..."} if no provider could answer
+    - done:  {"provider": "..."}
+    A provider that fails before its first token is replaced by the next configured one.
+    """
+    if provider not in REASONERS:
+        raise HTTPException(status_code=400, detail="Unsupported provider")
+
+    async def events():
+        winner = provider
+        try:
+            async for winner, chunk in stream_with_failover(
+                provider,
+                {name: (lambda name=name: stream_llm_reason(user_profile, name)) for name in REASONERS},
+                configured=lambda name: bool(PROVIDERS[PROVIDER_KEYS[name]].api_key),
+            ):
+                yield sse_event({"text": chunk}, "token")
+        except Exception as e:
+            yield sse_event({"detail": f"LLM reasoning failed: {str(e)}"}, "error")
+        yield sse_event({"provider": winner}, "done")
+
+    return sse_response(events())
+
+
+# 后台任务 / background job (POST /jobs, kind="llm_reason"): {user_profile, provider?, hedge?}
+class LLMReasonJob(BaseModel):
+    user_profile: UserProfile
+    provider: Literal["openai", "cohere", "deepseek"] = "openai"
+    hedge: bool = True
+
+
+@register_job("llm_reason", LLMReasonJob)
+async def llm_reason_job(payload: dict):
+    # 直接调用服务函数：错误以原始信息记入任务，而不是 HTTPException
+    # call the service function, so failures reach the job as plain errors, not HTTPExceptions
+    job = LLMReasonJob.model_validate(payload)
+    return await llm_reason(job.user_profile, provider=job.provider, hedge=job.hedge)
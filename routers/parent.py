@@ -1,49 +1,58 @@
 # routers/parent.py
 # 家长模式模块 / Parent Mode: View child tasks and provide suggestions
 
-from fastapi import APIRouter, HTTPException  # 引入 FastAPI 工具 / Import FastAPI router and error handling
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, WebSocket, WebSocketDisconnect, status  # 引入 FastAPI 工具 / Import FastAPI router and error handling
 from pydantic import BaseModel  # 用于数据模型校验 / For request body validation
-from typing import List, Dict
-import json
-import os
+from typing import List, Dict, Optional
+
+from parent.permissions import parent_can_view   # O(1) 权限检查 / O(1) access check
+from services.auth import current_active_user, current_websocket_user  # 登录用户 / signed-in user
+from services.child_plans import plans           # 孩子计划物化视图 / materialized child plans
+from services.child_summaries import summaries   # 家长面板物化摘要 / materialized dashboard summaries
+from services.child_tasks import task_store       # 孩子任务仓库 / child task store
+from services.family_index import family          # 家长↔孩子索引 / parent <-> child index
+from services.suggestions import broker, suggestion_store  # 建议存储与推送 / suggestion store and push
+from utils.sse import sse_event, sse_response
 
 router = APIRouter()
 
-# =====================
-#  文件路径配置 / File-based mock DB
-# =====================
-DATA_DIR = "data"
-BIND_FILE = os.path.join(DATA_DIR, "parent_child_map.json")
-TASK_FILE = os.path.join(DATA_DIR, "child_task_store.json")
-SUGGEST_FILE = os.path.join(DATA_DIR, "parent_suggestions.json")
+# 数据都在 services/ 下的内存存储中（JSON 文件持久化）
+# Data lives in the in-memory stores under services/ (persisted to data/*.json)
 
-# 初始化数据文件夹 / Ensure data directory exists
-os.makedirs(DATA_DIR, exist_ok=True)
+HEARTBEAT_SECONDS = 15  # 推送连接保活间隔 / keep-alive interval for push connections
 
-# 加载JSON文件 / Load or initialize empty JSON data
+# 身份一律取自登录用户（current_active_user），不信任请求里的 parent_id；
+# 未绑定该孩子的家长 403，孩子本人可以读取自己的建议与计划
+# Identity always comes from the signed-in user (current_active_user), never from a parent_id in
+# the request; parents not bound to the child get 403, and the child may read their own data
 
-def load_json(filepath):
-    if os.path.exists(filepath):
-        with open(filepath, "r") as f:
-            return json.load(f)
-    return {}
+def require_parent_of(parent_id: str, child_id: str) -> None:
+    if not parent_can_view(child_id, parent_id):
+        raise HTTPException(status_code=403, detail="Parent is not linked to this child.")
 
-# 保存JSON数据 / Save JSON data to file
+def can_read_child(user_id: str, child_id: str) -> bool:
+    return user_id == child_id or parent_can_view(child_id, user_id)
 
-def save_json(filepath, data):
-    with open(filepath, "w") as f:
-        json.dump(data, f, indent=2)
+def require_reader_of(user, child_id: str) -> None:
+    if not can_read_child(str(user.id), child_id):
+        raise HTTPException(status_code=403, detail="Not allowed to read this child's data.")
+
+def require_self(user, parent_id: Optional[str]) -> str:
+    """请求里的 parent_id（可省略）必须是登录用户本人 / A given parent_id must be the signed-in user"""
+    if parent_id is not None and parent_id != str(user.id):
+        raise HTTPException(status_code=403, detail="parent_id does not match the signed-in user.")
+    return str(user.id)
 
 # =====================
 #   模型定义 / Models
 # =====================
 
 class ParentLinkRequest(BaseModel):
-    parent_id: str  # 家长ID / Parent ID
+    parent_id: Optional[str] = None  # 家长ID，可省略，须为登录用户 / Parent ID, optional, must be the signed-in user
     child_id: str   # 孩子ID / Child ID
 
 class Suggestion(BaseModel):
-    parent_id: str  # 家长ID / Parent ID
+    parent_id: Optional[str] = None  # 家长ID，可省略，须为登录用户 / Parent ID, optional, must be the signed-in user
     child_id: str   # 孩子ID / Child ID
     text: str       # 建议内容 / Suggestion or encouragement
 
@@ -52,17 +61,12 @@ class Suggestion(BaseModel):
 # ========================
 
 @router.post("/parent/bind")
-def bind_child(parent_link: ParentLinkRequest):
+def bind_child(parent_link: ParentLinkRequest, user=Depends(current_active_user)):
     """
-    家长绑定孩子账户 / Bind a parent to a child account
+    登录的家长绑定孩子账户 / Bind the signed-in parent to a child account
     """
-    parent_child_map = load_json(BIND_FILE)
-    if parent_link.parent_id not in parent_child_map:
-        parent_child_map[parent_link.parent_id] = []
-
-    if parent_link.child_id not in parent_child_map[parent_link.parent_id]:
-        parent_child_map[parent_link.parent_id].append(parent_link.child_id)
-        save_json(BIND_FILE, parent_child_map)
+    parent_id = require_self(user, parent_link.parent_id)
+    if family.bind(parent_id, parent_link.child_id):
         return {"message": "Parent successfully linked to child."}
     else:
         return {"message": "Parent already linked to child."}
@@ -72,74 +76,118 @@ def bind_child(parent_link: ParentLinkRequest):
 # ========================
 
 @router.get("/parent/{parent_id}/child-tasks")
-def view_children_tasks(parent_id: str) -> Dict[str, List[Dict]]:
+def view_children_tasks(parent_id: str, user=Depends(current_active_user)) -> Dict[str, List[Dict]]:
     """
     获取家长绑定孩子的所有任务 / Get all tasks of children linked to this parent
     """
-    parent_child_map = load_json(BIND_FILE)
-    child_task_store = load_json(TASK_FILE)
-
-    children = parent_child_map.get(parent_id, [])
-    tasks = {child_id: child_task_store.get(child_id, []) for child_id in children}
+    require_self(user, parent_id)
+    children = family.children(parent_id)
+    tasks = {child_id: task_store.tasks(child_id) for child_id in children}
     return tasks
 
 # ========================
-#     家长提交建议接口
+#      家长面板接口
 # ========================
 
-@router.post("/parent/suggest")
-def submit_suggestion(suggestion: Suggestion):
+@router.get("/parent/{parent_id}/dashboard")
+async def parent_dashboard(parent_id: str, user=Depends(current_active_user)):
     """
-    家长提交建议或鼓励语 / Submit a suggestion or encouragement from parent to child
+    家长面板：每个孩子的预计算摘要（待办/已完成、本周计划分钟、最新建议），并发读取
+    Parent dashboard: precomputed per-child summaries (pending/done, planned minutes this week,
+    latest suggestion), read concurrently; cost does not grow with task history.
     """
-    parent_suggestions = load_json(SUGGEST_FILE)
+    require_self(user, parent_id)
+    return {"parent_id": parent_id, "children": await summaries.many(family.children(parent_id))}
 
-    if suggestion.child_id not in parent_suggestions:
-        parent_suggestions[suggestion.child_id] = []
+# ========================
+#     家长提交建议接口
+# ========================
 
-    parent_suggestions[suggestion.child_id].append({
-        "from": suggestion.parent_id,
+@router.post("/parent/suggest")
+async def submit_suggestion(suggestion: Suggestion, user=Depends(current_active_user)):
+    """
+    家长提交建议或鼓励语，并推送给已连接的孩子端 / Submit a suggestion and push it to connected clients
+    """
+    parent_id = require_self(user, suggestion.parent_id)
+    require_parent_of(parent_id, suggestion.child_id)
+    entry = await broker.publish(suggestion.child_id, {
+        "from": parent_id,
         "text": suggestion.text
     })
-
-    save_json(SUGGEST_FILE, parent_suggestions)
-    return {"message": "Suggestion submitted successfully."}
+    return {"message": "Suggestion submitted successfully.", "id": entry["id"]}
 
 # ========================
 #     查看建议列表接口
 # ========================
 
 @router.get("/parent/{child_id}/suggestions")
-def get_suggestions(child_id: str):
+def get_suggestions(
+    child_id: str,
+    after: int = Query(0, description="游标：只返回 id 更大的 / cursor: only newer ids"),
+    user=Depends(current_active_user),
+):
+    """
+    查看对某个孩子的建议（内存读取；已绑定的家长或孩子本人）/ Get parent suggestions for a child,
+    served from memory (a linked parent or the child themselves)
+    """
+    require_reader_of(user, child_id)
+    return suggestion_store.entries(child_id, after)
+
+@router.get("/parent/{child_id}/suggestions/stream")
+async def stream_suggestions(
+    child_id: str,
+    after: int = Query(0, description="游标 / cursor"),
+    last_event_id: Optional[str] = Header(None),
+    user=Depends(current_active_user),
+):
     """
-    查看对某个孩子的所有建议 / Get all parent suggestions for a specific child
+    SSE 推送：先补发游标之后的建议，再实时推送；浏览器重连时自动带 Last-Event-ID
+    SSE push: catch up from the cursor, then stream live; browsers resend Last-Event-ID on reconnect
+      suggestion {id, from, text, at}   (SSE id = 建议 id / the suggestion id)
     """
-    parent_suggestions = load_json(SUGGEST_FILE)
-    return parent_suggestions.get(child_id, [])
+    require_reader_of(user, child_id)
+    if last_event_id and last_event_id.isdigit():
+        after = max(after, int(last_event_id))
+
+    async def events():
+        async for entry in broker.follow(child_id, after, HEARTBEAT_SECONDS):
+            if entry is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield sse_event(entry, "suggestion", str(entry["id"]))
+
+    return sse_response(events())
+
+@router.websocket("/parent/{child_id}/suggestions/ws")
+async def suggestions_ws(websocket: WebSocket, child_id: str, after: int = 0,
+                         user=Depends(current_websocket_user)):
+    """
+    WebSocket 推送：每条建议一个 JSON 消息，重连时带上最后的 id 作为 ?after=
+    WebSocket push: one JSON message per suggestion; reconnect with the last id as ?after=
+    未登录或无权读取的用户在握手阶段被拒（1008）/ anonymous or unauthorized users are refused at the handshake (1008)
+    """
+    if user is None or not can_read_child(str(user.id), child_id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    try:
+        async for entry in broker.follow(child_id, after, HEARTBEAT_SECONDS):
+            await websocket.send_json(entry if entry is not None else {"type": "keep-alive"})
+    except WebSocketDisconnect:
+        pass
 
 # ========================
 #  推荐计划接口（模拟推荐引擎）
 # ========================
 
 @router.get("/parent/{child_id}/view_child_plan")
-def view_child_plan(child_id: str):
+def view_child_plan(
+    child_id: str,
+    user=Depends(current_active_user),
+):
     """
-    模拟返回推荐计划 / Simulate a child plan based on survey or tasks
+    推荐计划（物化视图，任务变更时才重算，带版本号）/ Child plan served from a materialized view,
+    recomputed only when the child's tasks change; includes a version
     """
-    child_task_store = load_json(TASK_FILE)
-    past_tasks = child_task_store.get(child_id, [])
-
-    # 简单推荐逻辑：如果有阅读任务就推荐写作 / Recommend writing if reading was done
-    suggestions = []
-    for task in past_tasks:
-        if "reading" in task.get("name", "").lower():
-            suggestions.append("Try writing a summary of what you read!")
-
-    # 如果没有任务历史就推荐开始学习计划 / Recommend general study plan if empty
-    if not suggestions:
-        suggestions.append("Start with 15 minutes of focused reading each day.")
-
-    return {
-        "child_id": child_id,
-        "recommendations": suggestions
-    }
+    require_reader_of(user, child_id)
+    return plans.get(child_id)
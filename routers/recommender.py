@@ -1,19 +1,32 @@
 # routers/recommender.py
 # 推荐系统路由 / Recommender API Router
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 from models.user_profile import UserProfile          # 用户画像 / user profile schema
 from models.task_model import Task                 # 任务模型 / task schema
 from recommender.core import recommend_tasks       # 核心推荐逻辑 / core recommender
+from recommender.catalog import get_catalog, DURATION_WITH_AVAILABILITY, DURATION_DEFAULT  # 活动目录 / activity catalog
+from recommender.embedding_index import match_interests  # 本地检索 / local retrieval
+from recommender.reason_pipeline import justify_plan, rule_based_reasons, upgrades  # 理由流水线 / justification pipeline
+from recommender.justifier import PROVIDER_KEYS, llm_batch_reasons  # 理由服务商 -> 建议服务商 / reason provider -> suggest provider
+from services.jobs import register_job  # 后台任务 / background jobs
 
 from typing import Literal
 from fastapi import Query
-from utils.openai_client import suggest_activities_with_openai
-from utils.cohere_client import suggest_activities_with_cohere
-from utils.hf_client import suggest_activities_with_hf
+from utils import llm_providers  # 服务商插件，首次调用时才导入 / provider plugins, imported on first use
+from utils.json_stream import IncrementalArrayParser
+from utils.llm_cache import cacheable_suggestions
+from utils.llm_dispatch import NoProviderAvailable, hedged_call, stream_with_failover
+from utils.sse import sse_event, sse_response
+
+
+def _calls(capability: str, q: str) -> dict:
+    """{服务商: 惰性调用} / {provider: call that resolves the plugin lazily}"""
+    return {name: (lambda name=name: llm_providers.get(name, capability)(q))
+            for name in llm_providers.providers(capability)}
 
 # 只创建一个路由器实例；不要重复定义，否则会覆盖之前注册的接口
 # Create a single APIRouter instance. Do NOT redefine it later in the file.
@@ -42,6 +55,62 @@ async def get_recommended_tasks(user_profile: UserProfile):
         raise HTTPException(status_code=500, detail=f"Failed to generate recommendations: {str(e)}")
 
 
+# POST /recommend/tasks/justified?provider=openai|cohere|deepseek
+# 说明：返回带规则理由的任务 + upgrade_id（立即返回）；整份计划的 LLM 理由只调用一次，在后台生成
+# Desc: Tasks with rule-based reasons plus an upgrade_id, returned at once; the LLM reasons for
+#       the whole plan come from one background call (poll /reasons/{id} or stream it)
+class JustifiedPlan(BaseModel):
+    tasks: List[Task]
+    upgrade_id: Optional[str] = None
+
+@router.post("/tasks/justified", response_model=JustifiedPlan)
+async def get_justified_tasks(
+    user_profile: UserProfile,
+    provider: Literal["openai", "cohere", "deepseek"] = Query("openai"),
+    hedge: bool = Query(True),
+):
+    try:
+        tasks = await recommend_tasks(user_profile)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to generate recommendations: {str(e)}")
+    return justify_plan(user_profile, tasks, provider=provider, hedge=hedge)
+
+
+# GET /recommend/reasons/{upgrade_id}
+# 说明：轮询升级结果 / Poll an upgrade: {status: pending|done|failed, reasons: {task_id: reason}}
+@router.get("/reasons/{upgrade_id}")
+async def get_reason_upgrade(upgrade_id: str):
+    item = upgrades.get(upgrade_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired upgrade_id")
+    return item.public()
+
+
+# GET /recommend/reasons/{upgrade_id}/stream
+# 说明：SSE 推送升级后的理由 / Push the upgraded reasons over SSE
+@router.get("/reasons/{upgrade_id}/stream")
+async def stream_reason_upgrade(upgrade_id: str):
+    """
+    事件 / events:
+      reason {task_id, reason}     每个升级的任务一条 / one per upgraded task
+      error  {detail}              LLM 失败，保留规则理由 / LLM failed, keep the rule-based reasons
+      done   {count, status}
+    """
+    item = upgrades.get(upgrade_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired upgrade_id")
+
+    async def events():
+        await item.ready.wait()
+        for task_id, reason in item.reasons.items():
+            yield sse_event({"task_id": task_id, "reason": reason}, "reason")
+        if item.status == "failed":
+            yield sse_event({"detail": f"LLM reasoning failed: {item.error}"}, "error")
+        yield sse_event({"count": len(item.reasons), "status": item.status}, "done")
+
+    return sse_response(events())
+
+
 # ============= 接口二：轻量推荐（给前端拖拽用） =============
 # POST /recommend/tasks-lite
 # 说明：根据兴趣与可用时段，生成简化任务卡片，便于前端渲染和拖拽
@@ -66,70 +135,158 @@ class LiteTask(BaseModel):
 async def tasks_lite(req: LiteReq):
     """
     规则（简版）/ Simple rules:
-      1) 每个兴趣映射两条活动：技能训练 + 阅读巩固
+      1) 每个兴趣映射目录里的活动（data/activity_catalog.json）；目录外的自由文本兴趣先做本地检索
+         （如 "I like drawing comics" -> 美术），检索不到再走兜底活动
       2) 若提供可用时段，则默认给更长时长（60 分钟），否则 45 分钟
       3) 前端将这些项渲染为“可拖拽卡片”，拖入 FullCalendar
 
+    性能 / Performance:
+      目录只加载一次并按兴趣预序列化，这里只做字节拼接，不逐条构造 LiteTask
+      The catalog is loaded once and pre-serialized per interest; this only joins bytes.
+
     输入示例 / Example input:
       {
         "interests": ["写作", "编程"],
         "availability": ["周一 16:00-17:00", "周六 09:00-11:00"]
       }
     """
-    out: List[LiteTask] = []
-
-    # 基础映射 / basic mapping for demo
-    base_map = {
-        "写作": [("写作练习", "skill"), ("阅读名家短篇", "reading")],
-        "篮球": [("运球与投篮训练", "skill"), ("战术视频学习", "reading")],
-        "编程": [("刷题与小练习", "skill"), ("阅读项目源码", "reading")],
-    }
-
-    # 兜底映射 / fallback when no known interests
-    fallback = [("通用学习任务", "skill"), ("通用阅读计划", "reading")]
+    snapshot = get_catalog()
 
     # 根据是否有可用时段调整时长 / adjust duration by availability
-    default_duration = 60 if req.availability else 45
-
-    interests = req.interests or ["通用"]
-    for interest in interests:
-        pairs = base_map.get(interest, fallback)
-        for name, tag in pairs:
-            out.append(LiteTask(
-                title=f"{interest}-{name}",
-                duration=default_duration,
-                tag=tag,
-                reason=f"结合你的兴趣「{interest}」与作息，先安排{tag}训练与阅读巩固。"
-            ))
-    return out
+    default_duration = DURATION_WITH_AVAILABILITY if req.availability else DURATION_DEFAULT
+
+    interests = []
+    for interest in req.interests or ["通用"]:
+        if interest in snapshot.by_interest:
+            interests.append(interest)
+        else:
+            interests.extend(match_interests(interest, k=1) or [interest])
+    parts = [snapshot.fragment(interest, default_duration) for interest in dict.fromkeys(interests)]
+    body = b"[" + b",".join(p for p in parts if p) + b"]"
+    return Response(content=body, media_type="application/json")
 
 # ============= 接口三：AI 直产活动条（统一结构，前端直接拖拽） =============
 # GET /recommend/ai-suggest?q=...&provider=openai|cohere|hf
 # 说明：调用指定大模型，返回 [{title, duration, tag, reason}] 统一结构
 @router.get("/ai-suggest")
-def ai_suggest(
+async def ai_suggest(
     q: str = Query(..., description="用户自然语言需求 / user prompt"),
-    provider: Literal["openai", "cohere", "hf"] = Query("openai")
+    provider: Literal["openai", "cohere", "hf"] = Query("openai"),
+    hedge: bool = Query(True, description="首选慢于其 p95 时并发请求备选 / hedge to a backup after the preferred provider's p95"),
 ):
     """
     返回统一结构的活动条：
     [{title, duration(分钟), tag(skill|reading|sport|social|art), reason}]
+    provider 为首选服务商；其余已配置的服务商作为备选（对冲 + 熔断，见 utils/llm_dispatch.py）
+    `provider` is the preferred one; other configured providers back it up (hedging + breakers)
     """
-    if provider == "openai":
-        data = suggest_activities_with_openai(q)
-    elif provider == "cohere":
-        data = suggest_activities_with_cohere(q)
-    else:
-        data = suggest_activities_with_hf(q)
+    try:
+        _, data = await hedged_call(
+            provider,
+            _calls("suggest", q),
+            configured=llm_providers.configured,
+            valid=cacheable_suggestions,
+            hedge=hedge,
+        )
+    except NoProviderAvailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
     # 兜底，确保字段完整，避免前端渲染报错
-    out = []
-    for x in (data or []):
-        out.append({
-            "title": str(x.get("title", "Untitled"))[:60],
-            "duration": int(x.get("duration", 45)),
-            "tag": x.get("tag", "skill"),
-            "reason": str(x.get("reason", ""))
-        })
-    return out
+    return [_suggestion_card(x) for x in (data or [])]
+
+
+def _suggestion_card(x: dict) -> dict:
+    """统一卡片字段 / Normalize one suggestion card"""
+    return {
+        "title": str(x.get("title", "Untitled"))[:60],
+        "duration": int(x.get("duration", 45)),
+        "tag": x.get("tag", "skill"),
+        "reason": str(x.get("reason", ""))
+    }
+
+
+# GET /recommend/ai-suggest/stream?q=...&provider=openai|cohere|hf
+# 说明：SSE 流式版本；模型每输出完一个 JSON 对象就推送一张卡片（event: card），结束发 event: done
+# Desc: SSE variant; each activity card is pushed as soon as its JSON object is complete
+@router.get("/ai-suggest/stream")
+async def ai_suggest_stream(
+    q: str = Query(..., description="用户自然语言需求 / user prompt"),
+    provider: Literal["openai", "cohere", "hf"] = Query("openai"),
+):
+    """
+    事件 / events:
+      card  {title, duration, tag, reason}   每张卡片一条 / one per card
+      error {detail}                          服务商不可用 / no provider available
+      done  {count, provider, cached}
+    """
+    async def events():
+        cached = await llm_providers.get(provider, "suggest").alookup(q)
+        if cached:
+            for x in cached:
+                yield sse_event(_suggestion_card(x), "card")
+            yield sse_event({"count": len(cached), "provider": provider, "cached": True}, "done")
+            return
+
+        parser, cards, winner, failed = IncrementalArrayParser(), [], provider, False
+        try:
+            async for winner, chunk in stream_with_failover(
+                provider,
+                _calls("suggest_stream", q),
+                configured=llm_providers.configured,
+            ):
+                for x in parser.feed(chunk):
+                    if isinstance(x, dict):
+                        cards.append(x)
+                        yield sse_event(_suggestion_card(x), "card")
+        except Exception as e:
+            failed = True
+            yield sse_event({"detail": f"AI suggest stream failed: {e}"}, "error")
+        # 只缓存完整闭合的数组；中途失败或被截断的部分结果不写回
+        # cache only a fully closed array; partial results from a failure or truncation are not stored
+        if cards and parser.finished and not failed:
+            await llm_providers.get(winner, "suggest").aremember(cards, q)
+        yield sse_event({"count": len(cards), "provider": winner, "cached": False}, "done")
+
+    return sse_response(events())
+
+
+
+# ============= 后台任务 / Background jobs（POST /jobs，见 services/jobs.py） =============
+# kind="ai_suggest": {q, provider?, hedge?}
+# kind="plan":       {user_profile, provider?, hedge?, q?}  整周计划 + 一次调用的 LLM 理由（+ 可选 AI 建议）
+#                    weekly plan + one-call LLM reasons (+ optional AI suggestions)
+class AISuggestJob(BaseModel):
+    q: str
+    provider: Literal["openai", "cohere", "hf"] = "openai"
+    hedge: bool = True
+
+
+class PlanJob(BaseModel):
+    user_profile: UserProfile
+    provider: Literal["openai", "cohere", "deepseek"] = "openai"   # PROVIDER_KEYS 的键 / keys of PROVIDER_KEYS
+    hedge: bool = True
+    q: Optional[str] = None
+
+
+@register_job("ai_suggest", AISuggestJob)
+async def ai_suggest_job(payload: dict):
+    job = AISuggestJob.model_validate(payload)
+    return await ai_suggest(q=job.q, provider=job.provider, hedge=job.hedge)
+
+
+@register_job("plan", PlanJob)
+async def plan_job(payload: dict):
+    job = PlanJob.model_validate(payload)
+    user_profile, provider, hedge = job.user_profile, job.provider, job.hedge
+    tasks = rule_based_reasons(await recommend_tasks(user_profile))
+    try:
+        reasons = await llm_batch_reasons(user_profile, tasks, provider=provider, hedge=hedge)
+    except Exception as e:  # LLM 不可用时保留规则理由 / keep the rule-based reasons when no LLM answers
+        print("plan job: LLM reasons skipped:", e)
+        reasons = {}
+    tasks = [t.model_copy(update={"reason": reasons[t.task_id]}) if t.task_id in reasons else t for t in tasks]
 
+    suggestions = []
+    if job.q:
+        suggestions = await ai_suggest(q=job.q, provider=PROVIDER_KEYS[provider], hedge=hedge)
+    return {"tasks": [t.model_dump() for t in tasks], "llm_reasons": len(reasons), "suggestions": suggestions}
@@ -5,6 +5,8 @@
 # ===========================================================
 
 # -------- 导入依赖 / Import dependencies --------
+from datetime import date
+
 from fastapi import APIRouter, HTTPException, Depends
 # APIRouter: 用于创建路由分组 / For grouping endpoints
 # HTTPException: 用于抛出 HTTP 错误响应 / For returning HTTP errors
@@ -13,8 +15,11 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 # BaseModel: 用于定义请求体数据结构 / For request body schema definition
 
-from typing import Dict
-# Dict: 用于类型注解，表示字典类型 / Type hint for dictionary
+from typing import Any, Dict, List, Optional
+# Dict/List/Optional/Any: 类型注解 / type hints
+
+from starlette.concurrency import run_in_threadpool
+# run_in_threadpool: 排程修复在线程池中执行 / plan repairs run in the threadpool
 
 from services.auth import current_active_user
 # current_active_user: 登录鉴权依赖函数，会根据用户 token 返回用户信息 / Auth dependency to get user from token
@@ -22,6 +27,12 @@ from services.auth import current_active_user
 from models.auth_user import User
 # User: 用户数据模型（auth_user.py 中定义）/ User model defined in auth_user.py
 
+from models.user_profile import Availability
+from services.schedule_plans import plan_lock, plans
+# 计划状态与每用户锁，日历事件路由共用 / plan state and per-user locks, shared with the event routes
+from utils.schedule_optimizer import DEFAULT_MAX_MINUTES_PER_DAY, SchedulePlan, build_plan
+# 排程器：放置状态 + 增量修复 / scheduler: placement state + incremental repair
+
 # -------- 创建路由器 / Create APIRouter instance --------
 router = APIRouter()
 
@@ -85,3 +96,80 @@ def get_schedule(
         "user_id": str(user.id),   # 用户 ID / User ID
         "availability": data       # 日程安排 / Schedule data
     }
+
+
+# ===========================================================
+# 排程计划（保留放置状态，拖拽事件后只做增量修复）
+# Schedule plan (keeps placement state; dragging an event only repairs affected days)
+# ===========================================================
+
+# key: 用户ID，value: 排程状态（services/schedule_plans.py）/ key: user ID, value: plan state
+fake_plan_db = plans
+
+# 同一用户的修改串行执行（含日历事件路由触发的修复；SchedulePlan 本身不是线程安全的）
+# Changes to one user's plan run one at a time, including repairs triggered by the calendar
+# event routes (SchedulePlan itself is not thread-safe)
+def _plan_lock(user: User):
+    return plan_lock(str(user.id))
+
+
+class PlanRequest(BaseModel):
+    tasks: List[Dict[str, Any]]                   # [{name, duration, priority?, tag?}]
+    availability: Optional[Availability] = None   # None = 默认每日窗口 / default daily window
+    events: List[Dict[str, Any]] = []             # 已有事件 [{id, start, end, allDay?}]
+    start_day: Optional[date] = None
+    days: int = 7
+    max_minutes_per_day: int = DEFAULT_MAX_MINUTES_PER_DAY
+    improve: bool = False
+
+
+class PlanEventIn(BaseModel):
+    start: str                 # ISO 字符串 / ISO string
+    end: Optional[str] = None
+    allDay: bool = False
+
+
+@router.post("/schedule/plan")
+async def create_plan(req: PlanRequest, user: User = Depends(current_active_user)):
+    """
+    生成排程并保存放置状态 / Build a plan and keep its placement state for later repairs
+    """
+    async with _plan_lock(user):
+        plan = await run_in_threadpool(
+            build_plan,
+            req.tasks,
+            availability=req.availability,
+            events=req.events,
+            start_day=req.start_day,
+            days=req.days,
+            max_minutes_per_day=req.max_minutes_per_day,
+            improve=req.improve,
+        )
+        fake_plan_db[str(user.id)] = plan
+        return {"user_id": str(user.id), "schedule": plan.to_list()}
+
+
+def _get_plan(user: User) -> SchedulePlan:
+    plan = fake_plan_db.get(str(user.id))
+    if plan is None:
+        raise HTTPException(404, "Plan not found.")
+    return plan
+
+
+@router.put("/schedule/plan/events/{event_id}")
+async def upsert_plan_event(event_id: str, ev: PlanEventIn, user: User = Depends(current_active_user)):
+    """
+    新增或拖动一个事件：只修复受影响的天，返回被移动的任务
+    Insert or move one event: repair only the affected days and report moved tasks
+    """
+    async with _plan_lock(user):
+        return await run_in_threadpool(_get_plan(user).upsert_event, event_id, ev.model_dump())
+
+
+@router.delete("/schedule/plan/events/{event_id}")
+async def delete_plan_event(event_id: str, user: User = Depends(current_active_user)):
+    """
+    删除一个事件并修复排程 / Delete one event and repair the plan
+    """
+    async with _plan_lock(user):
+        return await run_in_threadpool(_get_plan(user).remove_event, event_id)
@@ -1,10 +1,17 @@
 # services/auth.py
 # CN: 双模鉴权。开发(AUTH_STUB=1)返回 demo 用户；生产(AUTH_STUB=0)走 fastapi-users。
 # EN: Dual-mode auth. Dev (AUTH_STUB=1) returns a demo user; Prod (AUTH_STUB=0) uses fastapi-users.
+# CN: 真实模式下 token 对应的用户走短 TTL 缓存（services/user_cache.py），UserManager 钩子负责失效。
+# EN: In real mode the token's user is served from a short-TTL cache (services/user_cache.py);
+#     the UserManager hooks invalidate it.
+# CN: 注意：真实模式依赖的 models.auth_user_real / models.auth_schemas 在仓库中不存在，基线上即无法导入；
+#     可独立测试的部分在 services/auth_real.py。
+# EN: Note: real mode imports models.auth_user_real / models.auth_schemas, which are not in the
+#     repo, so it does not import (already at baseline); the testable parts live in services/auth_real.py.
 
 import os
 from typing import Optional
-from fastapi import Depends
+from fastapi import Depends, WebSocket
 
 USE_STUB = os.getenv("AUTH_STUB", "1") == "1"  # CN: 环境开关；EN: env switch
 
@@ -22,12 +29,16 @@ if USE_STUB:
         # CN: 直接返回固定用户；EN: always return a fixed user
         return User()
 
+    async def current_websocket_user() -> Optional[User]:
+        # CN: WebSocket 同样返回固定用户；EN: websockets get the same fixed user
+        return User()
+
 else:
     # ---------- 真实模式：fastapi-users 栈 ----------
     # ---------- Real mode: fastapi-users stack ----------
     import uuid
     from typing import AsyncGenerator
-    from fastapi_users import FastAPIUsers
+    from fastapi_users import BaseUserManager, FastAPIUsers, UUIDIDMixin
     from fastapi_users.authentication import AuthenticationBackend, BearerTransport, JWTStrategy
     from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
     from sqlalchemy.ext.asyncio import AsyncSession
@@ -35,19 +46,33 @@ else:
     from db.engine import async_session_maker          # CN: 异步会话工厂 / EN: async session factory
     from models.auth_user_real import UserTable        # CN: 真实用户表 / EN: real user table
     from models.auth_schemas import UserRead, UserCreate, UserUpdate  # Pydantic schemas
+    # CN: 用户缓存、缓存失效钩子、登录哈希进线程池 / EN: user cache, invalidation hooks, pooled login hashing
+    from services.auth_real import CachedJWTStrategy, PooledPasswordMixin, UserCacheHooks
 
     async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
         async with async_session_maker() as session:
             yield session
 
+    JWT_SECRET = os.getenv("JWT_SECRET", "change-me")
+
     async def get_user_db(session: AsyncSession = Depends(get_async_session)):
         yield SQLAlchemyUserDatabase(session, UserTable)
 
+    class UserManager(UserCacheHooks, PooledPasswordMixin, UUIDIDMixin, BaseUserManager[UserTable, uuid.UUID]):
+        # CN: 更新/改密/删除时让用户缓存失效；登录校验在 bcrypt 线程池中执行（services/auth_real.py）
+        # EN: updates, resets and deletes invalidate the user cache; login checks run in the
+        #     bcrypt pool (services/auth_real.py)
+        reset_password_token_secret = JWT_SECRET
+        verification_token_secret = JWT_SECRET
+
+    async def get_user_manager(user_db=Depends(get_user_db)):
+        yield UserManager(user_db)
+
     bearer_transport = BearerTransport(tokenUrl="/auth/jwt/login")
 
     def get_jwt_strategy() -> JWTStrategy:
-        return JWTStrategy(
-            secret=os.getenv("JWT_SECRET", "change-me"),
+        return CachedJWTStrategy(
+            secret=JWT_SECRET,
             lifetime_seconds=60 * 60 * 24
         )
 
@@ -57,5 +82,16 @@ else:
         get_strategy=get_jwt_strategy
     )
 
-    fastapi_users = FastAPIUsers[UserTable, uuid.UUID](get_user_db, [auth_backend])
+    fastapi_users = FastAPIUsers[UserTable, uuid.UUID](get_user_manager, [auth_backend])
     current_active_user = fastapi_users.current_user(active=True)
+
+    async def current_websocket_user(websocket: WebSocket, user_manager=Depends(get_user_manager)):
+        # CN: 浏览器的 WebSocket 不能带 Authorization 头，token 走 ?token=；无效或停用返回 None，由路由关闭连接
+        # EN: browser websockets cannot send an Authorization header, so the token comes as ?token=;
+        #     returns None for a bad token or inactive user and the route closes the socket
+        token = websocket.query_params.get("token")
+        if token is None:
+            scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+            token = token if scheme.lower() == "bearer" else None
+        user = await get_jwt_strategy().read_token(token, user_manager)
+        return user if user is not None and user.is_active else None
@@ -0,0 +1,91 @@
+# services/auth_real.py
+# CN: 真实鉴权模式（fastapi-users）里与用户表无关的部分，单独成模块以便直接导入和测试
+#     （services/auth.py 的真实模式依赖缺失的 models.auth_user_real，基线上就无法导入）。
+#     token -> 用户走短 TTL 缓存（services/user_cache.py），UserManager 钩子负责失效；
+#     登录时的密码校验（以及用户不存在时的防计时哈希）放进 services/security.py 的有界线程池，
+#     不占用事件循环。
+# EN: The parts of real auth mode (fastapi-users) that do not depend on the user table, kept in
+#     their own module so they can be imported and tested directly (real mode in services/auth.py
+#     needs the missing models.auth_user_real and does not import, already at baseline). Token
+#     users are served from a short-TTL cache (services/user_cache.py) that the UserManager hooks
+#     invalidate. Login password checks (and the anti-timing hash for unknown emails) run in the
+#     bounded pool from services/security.py, off the event loop.
+#
+# CN: 注册、改密仍由 fastapi-users 同步哈希（频率远低于登录）
+# EN: registration and password changes still hash inline in fastapi-users (far rarer than logins)
+
+from typing import Any, Optional
+
+import jwt
+from fastapi_users import exceptions
+from fastapi_users.authentication import JWTStrategy
+from fastapi_users.jwt import decode_jwt
+
+from services.security import run_in_hash_pool
+from services.user_cache import user_cache
+
+
+class UserCacheHooks:
+    """
+    CN: 用户被修改（含停用 is_active=False）、改密或删除时，立即让缓存失效
+    EN: drop the cached user whenever it is updated (incl. deactivation), reset or deleted
+    """
+
+    async def on_after_update(self, user, update_dict, request=None):
+        user_cache.invalidate(user.id)
+
+    async def on_after_reset_password(self, user, request=None):
+        user_cache.invalidate(user.id)
+
+    async def on_after_delete(self, user, request=None):
+        user_cache.invalidate(user.id)
+
+
+class CachedJWTStrategy(JWTStrategy):
+    """
+    CN: 验签后先查用户缓存，未命中才读用户表（is_active 仍由 current_user(active=True) 检查）
+    EN: after verifying the JWT, look the user up in the cache and only load the row on a miss
+        (is_active is still checked by current_user(active=True))
+    """
+
+    async def read_token(self, token, user_manager):
+        if token is None:
+            return None
+        try:
+            data = decode_jwt(token, self.decode_key, self.token_audience, algorithms=[self.algorithm])
+        except jwt.PyJWTError:
+            return None
+        sub = data.get("sub")
+        if sub is None:
+            return None
+        user = user_cache.get(sub)
+        if user is not None:
+            return user
+        try:
+            user = await user_manager.get(user_manager.parse_id(sub))
+        except (exceptions.UserNotExists, exceptions.InvalidID):
+            return None
+        user_cache.put(sub, user)
+        return user
+
+
+class PooledPasswordMixin:
+    """
+    CN: 覆盖 BaseUserManager.authenticate，流程相同，只是哈希/校验在线程池中执行
+    EN: overrides BaseUserManager.authenticate with the same flow, but hashing runs in the pool
+    """
+
+    async def authenticate(self, credentials: Any) -> Optional[Any]:
+        try:
+            user = await self.get_by_email(credentials.username)
+        except exceptions.UserNotExists:
+            # CN: 仍然算一次哈希，避免按耗时判断邮箱是否存在；EN: hash anyway to mitigate timing attacks
+            await run_in_hash_pool(self.password_helper.hash, credentials.password)
+            return None
+        verified, updated_hash = await run_in_hash_pool(
+            self.password_helper.verify_and_update, credentials.password, user.hashed_password)
+        if not verified:
+            return None
+        if updated_hash is not None:       # CN: 哈希算法升级；EN: upgrade to a stronger hash
+            await self.user_db.update(user, {"hashed_password": updated_hash})
+        return user
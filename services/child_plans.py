@@ -0,0 +1,87 @@
+# services/child_plans.py
+# CN: 孩子计划的物化视图（家长端 view_child_plan）。推荐规则编译成一个正则；每个孩子保存
+#     “各规则命中的任务数”，任务仓库变更时只对变动的那条任务做匹配并更新计数，随后重建计划；
+#     读取直接返回已构建好的结果（带版本号），为常数时间。
+# EN: Materialized child plans for the parent view_child_plan route. The recommendation rules are
+#     compiled into one regex; each child keeps a per-rule count of matching tasks, and a task-store
+#     change only matches the task that changed before rebuilding the plan. Reads return the stored,
+#     versioned result in constant time.
+
+from __future__ import annotations
+
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from services.child_tasks import ChildTaskStore, task_store
+
+# (任务名关键词, 推荐) / (task-name keywords, recommendation)
+PLAN_RULES: List[Tuple[Sequence[str], str]] = [
+    (("reading",), "Try writing a summary of what you read!"),
+]
+# 没有命中任何规则时 / when no rule matches
+DEFAULT_PLAN = ["Start with 15 minutes of focused reading each day."]
+
+
+class RuleMatcher:
+    """CN: 所有规则合成一个不区分大小写的正则，一次扫描得到命中的规则；EN: all rules in one case-insensitive regex"""
+
+    def __init__(self, rules: List[Tuple[Sequence[str], str]]):
+        self.recommendations = [text for _, text in rules]
+        self._pattern = re.compile(
+            "|".join(f"(?P<r{i}>{'|'.join(map(re.escape, words))})" for i, (words, _) in enumerate(rules)),
+            re.IGNORECASE,
+        )
+
+    def match(self, name: str) -> Set[int]:
+        return {int(m.lastgroup[1:]) for m in self._pattern.finditer(name or "")}
+
+
+class ChildPlans:
+    def __init__(self, store: ChildTaskStore = task_store, rules: List[Tuple[Sequence[str], str]] = PLAN_RULES):
+        self.store = store
+        self.matcher = RuleMatcher(rules)
+        self.rebuilds = 0
+        self._lock = threading.Lock()
+        self._counts: Dict[str, List[int]] = {}          # 每条规则命中的任务数 / matching tasks per rule
+        self._plans: Dict[str, Dict[str, Any]] = {}
+        store.subscribe(self.apply_task)
+
+    def _materialize(self, child_id: str) -> None:
+        counts = self._counts[child_id]
+        recommendations = [self.matcher.recommendations[i] for i, n in enumerate(counts) if n > 0]
+        self._plans[child_id] = {
+            "child_id": child_id,
+            "recommendations": recommendations or list(DEFAULT_PLAN),
+            "version": self.store.version(child_id),
+        }
+        self.rebuilds += 1
+
+    def apply_task(self, child_id: str, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+        """CN: 只匹配变动的任务；EN: match only the task that changed"""
+        with self._lock:
+            counts = self._counts.get(child_id)
+            if counts is None:
+                return                                   # 还没人读过：首次读取时再构建 / built on first read
+            for task, sign in ((before, -1), (after, +1)):
+                if task is not None:
+                    for i in self.matcher.match(task.get("name", "")):
+                        counts[i] += sign
+            self._materialize(child_id)
+
+    def get(self, child_id: str) -> Dict[str, Any]:
+        plan = self._plans.get(child_id)
+        if plan is None:
+            with self.store.lock, self._lock:        # 与变更通知串行 / serialized with change notifications
+                if child_id not in self._plans:
+                    counts = [0] * len(self.matcher.recommendations)
+                    for task in self.store.tasks(child_id):
+                        for i in self.matcher.match(task.get("name", "")):
+                            counts[i] += 1
+                    self._counts[child_id] = counts
+                    self._materialize(child_id)
+                plan = self._plans[child_id]
+        return plan
+
+
+plans = ChildPlans()
@@ -0,0 +1,210 @@
+# services/child_summaries.py
+# CN: 家长面板的每个孩子摘要（物化视图）：待办/已完成数、本周计划分钟数、最新一条家长建议。
+#     首次使用时从任务仓库和建议存储构建一次，之后只随任务、日历事件、建议的变更增量更新；
+#     读取与任务历史长度无关。
+# EN: Materialized per-child summaries for the parent dashboard: pending/done counts, planned
+#     minutes this week and the latest parent suggestion. Built once from the task store and the
+#     suggestion store, then maintained incrementally as tasks, calendar events and suggestions
+#     change, so a read does not depend on the length of a child's history.
+#
+# 本周分钟 = 未完成任务时长 + 本周日历事件时长（按 ISO 周切分，UTC）
+# planned minutes = pending task durations + this ISO week's calendar-event minutes (UTC)
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from services.child_tasks import ChildTaskStore, task_store
+from services.suggestions import SuggestionStore, suggestion_store
+
+Span = Tuple[datetime, datetime]
+
+
+def week_key(t: datetime) -> str:
+    year, week, _ = t.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _utc(t: datetime) -> datetime:
+    """CN: 统一成 naive UTC（与 SQLite 存储一致）；EN: normalize to naive UTC, as SQLite stores it"""
+    return t.astimezone(timezone.utc).replace(tzinfo=None) if t.tzinfo else t
+
+
+def week_bounds(now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    now = _utc(now or datetime.now(timezone.utc))
+    monday = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    return monday, monday + timedelta(days=7)
+
+
+def week_minutes(start: datetime, end: datetime) -> Dict[str, int]:
+    """CN: 把一个时间段按 ISO 周切开计分钟；EN: split a span into minutes per ISO week"""
+    start, end = _utc(start), _utc(end)
+    out: Dict[str, int] = {}
+    while start < end:
+        _, week_end = week_bounds(start)
+        cut = min(end, week_end)
+        out[week_key(start)] = out.get(week_key(start), 0) + int((cut - start).total_seconds() // 60)
+        start = cut
+    return out
+
+
+@dataclass
+class ChildSummary:
+    child_id: str
+    pending: int = 0
+    done: int = 0
+    task_minutes: int = 0                                           # 未完成任务时长 / pending task minutes
+    event_minutes: Dict[str, int] = field(default_factory=dict)     # ISO 周 -> 分钟 / ISO week -> minutes
+    latest_suggestion: Optional[Dict[str, Any]] = None
+    updated_at: float = field(default_factory=time.time)
+
+    def public(self, week: str) -> Dict[str, Any]:
+        events = self.event_minutes.get(week, 0)
+        return {
+            "child_id": self.child_id,
+            "pending": self.pending,
+            "done": self.done,
+            "planned_minutes_week": self.task_minutes + events,
+            "task_minutes": self.task_minutes,
+            "event_minutes_week": events,
+            "latest_suggestion": self.latest_suggestion,
+            "updated_at": self.updated_at,
+        }
+
+
+class ChildSummaries:
+    def __init__(self, store: ChildTaskStore = task_store, suggestions: SuggestionStore = suggestion_store):
+        self.store = store
+        self.suggestions = suggestions
+        self._lock = threading.RLock()
+        self._items: Optional[Dict[str, ChildSummary]] = None
+        self._seeded: Set[Tuple[str, str]] = set()     # (child, week) 的事件分钟已从数据库加载 / loaded from the DB
+        self._dirty: Set[Tuple[str, str]] = set()      # 加载期间有事件变更 / changed while loading
+        store.subscribe(self.apply_task)
+        suggestions.subscribe(self.apply_suggestion)
+
+    # ---------- 构建 / Build ----------
+    def _built(self) -> Dict[str, ChildSummary]:
+        if self._items is None:
+            # 先 store.lock：构建期间不会有任务变更插进来 / store.lock first: no task change can interleave
+            with self.store.lock, self._lock:
+                if self._items is None:
+                    items: Dict[str, ChildSummary] = {}
+                    for child_id, tasks in self.store.all().items():
+                        summary = items.setdefault(child_id, ChildSummary(child_id))
+                        for task in tasks:
+                            self._count(summary, task, +1)
+                    for child_id, entry in self.suggestions.latest().items():
+                        items.setdefault(child_id, ChildSummary(child_id)).latest_suggestion = entry
+                    self._items = items
+        return self._items
+
+    def _summary(self, child_id: str) -> ChildSummary:
+        items = self._built()
+        summary = items.get(child_id)
+        if summary is None:
+            summary = items[child_id] = ChildSummary(child_id)
+        return summary
+
+    @staticmethod
+    def _count(summary: ChildSummary, task: Dict[str, Any], sign: int) -> None:
+        if task.get("status") == "done":
+            summary.done += sign
+        else:
+            summary.pending += sign
+            summary.task_minutes += sign * int(task.get("duration") or 0)
+
+    # ---------- 增量更新 / Incremental updates ----------
+    def apply_task(self, child_id: str, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+        if self._items is None:
+            return                                   # 尚未构建：构建时会读到新数据 / the build will see it
+        with self._lock:
+            summary = self._summary(child_id)
+            if before is not None:
+                self._count(summary, before, -1)
+            if after is not None:
+                self._count(summary, after, +1)
+            summary.updated_at = time.time()
+
+    def apply_event(self, child_id: str, before: Optional[Span], after: Optional[Span]) -> None:
+        """CN: 日历事件新增/移动/删除；EN: a calendar event was created, moved or deleted"""
+        if self._items is None:
+            return
+        delta: Dict[str, int] = {}
+        for span, sign in ((before, -1), (after, +1)):
+            if span is not None:
+                for week, minutes in week_minutes(*span).items():
+                    delta[week] = delta.get(week, 0) + sign * minutes
+        with self._lock:
+            summary = self._summary(child_id)
+            for week, minutes in delta.items():
+                key = (child_id, week)
+                if key in self._seeded:
+                    summary.event_minutes[week] = summary.event_minutes.get(week, 0) + minutes
+                else:
+                    self._dirty.add(key)             # 正在/尚未从数据库加载 / not loaded yet
+            summary.updated_at = time.time()
+
+    def apply_suggestion(self, child_id: str, entry: Dict[str, Any]) -> None:
+        if self._items is None:
+            return
+        with self._lock:
+            summary = self._summary(child_id)
+            summary.latest_suggestion = entry
+            summary.updated_at = time.time()
+
+    # ---------- 读 / Read ----------
+    async def _seed_events(self, child_id: str, week: str) -> None:
+        """
+        CN: 某孩子某周的事件分钟只查询一次数据库（范围限定在本周），之后靠 apply_event 维护
+        EN: query the DB once per (child, week), bounded to that week; apply_event keeps it current
+        """
+        key = (child_id, week)
+        try:
+            owner = UUID(child_id)
+        except ValueError:
+            self._seeded.add(key)                    # 非用户 ID，不会有数据库事件 / not a user id: no DB events
+            return
+        from sqlalchemy.exc import SQLAlchemyError
+        from sqlmodel import select
+        from db.engine import async_session_maker
+        from models.event_model import Event
+
+        start, end = week_bounds()
+        self._dirty.discard(key)
+        try:
+            async with async_session_maker() as session:
+                rs = await session.execute(
+                    select(Event.start, Event.end).where(
+                        Event.owner_id == owner, Event.end > start, Event.start < end))
+                spans = rs.all()
+        except SQLAlchemyError as e:
+            print("dashboard event seed failed:", e)
+            return
+        minutes = sum(week_minutes(max(_utc(a), start), min(_utc(b), end)).get(week, 0) for a, b in spans)
+        with self._lock:
+            if key in self._dirty:                   # 查询期间有变更：下次重查 / changed meanwhile: re-query next time
+                self._dirty.discard(key)
+                return
+            self._summary(child_id).event_minutes[week] = minutes
+            self._seeded.add(key)
+
+    async def get(self, child_id: str) -> Dict[str, Any]:
+        week = week_key(week_bounds()[0])
+        self._built()                                # 在拿视图锁之前构建 / build before taking the view lock
+        if (child_id, week) not in self._seeded:
+            await self._seed_events(child_id, week)
+        return self._summary(child_id).public(week)
+
+    async def many(self, child_ids: List[str]) -> List[Dict[str, Any]]:
+        """CN: 并发读取多个孩子；EN: read several children concurrently"""
+        return list(await asyncio.gather(*(self.get(c) for c in child_ids)))
+
+
+summaries = ChildSummaries()
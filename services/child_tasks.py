@@ -0,0 +1,89 @@
+# services/child_tasks.py
+# CN: 孩子任务仓库（data/child_task_store.json）。进程内只加载一次，写入走 utils/storage（原子替换），
+#     每次变更按孩子递增版本号并通知订阅者，物化视图（家长面板摘要、孩子计划）据此增量更新。
+# EN: The child task store (data/child_task_store.json), loaded once per process. Writes go through
+#     utils/storage (atomic replace); each change bumps the child's version and notifies subscribers,
+#     which keep the materialized views (parent dashboard summaries, child plans) up to date.
+#
+# CN: 订阅者在持有 store.lock 时被调用；视图构建也须持有 store.lock（先 store.lock 再视图自己的锁），
+#     这样快照和后续变更通知严格串行，不会重复计数。
+# EN: Listeners run while store.lock is held. Views must build under store.lock too (store.lock
+#     first, then their own lock) so the snapshot and the change stream are serialized.
+# 限制 / limitation: 每个进程只加载一次并整体覆盖写文件，多 worker 同时写会互相覆盖；
+#     需要多 worker 时应换成数据库。 / each process loads the file once and rewrites it whole,
+#     so with several workers one worker's writes overwrite another's — use a database for that.
+
+from __future__ import annotations
+
+import copy
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.storage import load_json, save_json
+
+TASK_FILE = os.path.join("data", "child_task_store.json")
+
+# listener(child_id, before, after)：新增时 before=None，删除时 after=None
+# listener(child_id, before, after): before is None for an insert, after is None for a delete
+TaskListener = Callable[[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]], None]
+
+
+class ChildTaskStore:
+    def __init__(self, path: str = TASK_FILE):
+        self.path = path
+        self.lock = threading.RLock()
+        self._data: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._versions: Dict[str, int] = {}
+        self._listeners: List[TaskListener] = []
+
+    def _loaded(self) -> Dict[str, List[Dict[str, Any]]]:
+        if self._data is None:
+            with self.lock:
+                if self._data is None:
+                    data = load_json(self.path)
+                    self._data = {k: v for k, v in data.items() if isinstance(v, list)}
+        return self._data
+
+    # ---------- 读 / Read ----------
+    def tasks(self, child_id: str) -> List[Dict[str, Any]]:
+        """CN: 某个孩子的任务（副本）；EN: a copy of one child's tasks"""
+        with self.lock:
+            return copy.deepcopy(self._loaded().get(child_id, []))
+
+    def all(self) -> Dict[str, List[Dict[str, Any]]]:
+        with self.lock:
+            return copy.deepcopy(self._loaded())
+
+    def version(self, child_id: str) -> int:
+        """CN: 进程内每次变更 +1；EN: bumped on every change within this process"""
+        return self._versions.get(child_id, 0)
+
+    # ---------- 写 / Write ----------
+    def add(self, child_id: str, task: Dict[str, Any]) -> None:
+        with self.lock:
+            self._loaded().setdefault(child_id, []).append(dict(task))
+            self._commit(child_id, None, dict(task))
+
+    def update(self, child_id: str, name: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """CN: 改第一个同名任务，返回修改后的任务；EN: update the first task with this name"""
+        with self.lock:
+            for task in self._loaded().get(child_id, []):
+                if task.get("name") == name:
+                    before = dict(task)
+                    task.update(changes)
+                    self._commit(child_id, before, dict(task))
+                    return dict(task)
+        return None
+
+    def _commit(self, child_id: str, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+        save_json(self.path, self._data)
+        self._versions[child_id] = self._versions.get(child_id, 0) + 1
+        for listener in list(self._listeners):
+            listener(child_id, before, after)
+
+    def subscribe(self, listener: TaskListener) -> None:
+        self._listeners.append(listener)
+
+
+task_store = ChildTaskStore()
@@ -0,0 +1,62 @@
+# services/family_index.py
+# CN: 家长↔孩子双向索引（data/parent_child_map.json）。进程内只加载一次，绑定时增量更新并通过
+#     utils/storage 原子写回；成员判断 O(1)，家长接口可以几乎零成本地做权限检查。
+# EN: Bidirectional parent <-> child index over data/parent_child_map.json. Loaded once per process,
+#     updated on bind and written back atomically through utils/storage. Membership checks are O(1),
+#     so every parent-facing route can enforce access at effectively no cost.
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Dict, List, Optional
+
+from utils.storage import load_json, save_json
+
+BIND_FILE = os.path.join("data", "parent_child_map.json")
+
+
+class ParentChildIndex:
+    def __init__(self, path: str = BIND_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        # CN: dict 当作有序集合（保留绑定顺序）；EN: dicts as insertion-ordered sets
+        self._children: Optional[Dict[str, Dict[str, None]]] = None
+        self._parents: Dict[str, Dict[str, None]] = {}
+
+    def _loaded(self) -> Dict[str, Dict[str, None]]:
+        if self._children is None:
+            with self._lock:
+                if self._children is None:
+                    children: Dict[str, Dict[str, None]] = {}
+                    for parent_id, kids in load_json(self.path).items():
+                        for child_id in kids if isinstance(kids, list) else []:
+                            children.setdefault(parent_id, {})[child_id] = None
+                            self._parents.setdefault(child_id, {})[parent_id] = None
+                    self._children = children
+        return self._children
+
+    def children(self, parent_id: str) -> List[str]:
+        return list(self._loaded().get(parent_id, ()))
+
+    def parents(self, child_id: str) -> List[str]:
+        self._loaded()
+        return list(self._parents.get(child_id, ()))
+
+    def linked(self, parent_id: str, child_id: str) -> bool:
+        """CN: 家长是否已绑定该孩子，O(1)；EN: whether the parent is bound to the child, O(1)"""
+        return child_id in self._loaded().get(parent_id, ())
+
+    def bind(self, parent_id: str, child_id: str) -> bool:
+        """CN: 绑定，已存在返回 False；EN: bind; returns False if already linked"""
+        children = self._loaded()
+        with self._lock:
+            if child_id in children.get(parent_id, ()):
+                return False
+            children.setdefault(parent_id, {})[child_id] = None
+            self._parents.setdefault(child_id, {})[parent_id] = None
+            save_json(self.path, {p: list(kids) for p, kids in children.items()})
+        return True
+
+
+family = ParentChildIndex()
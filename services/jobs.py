@@ -0,0 +1,340 @@
+# services/jobs.py
+# 后台任务队列：长时间的 AI 生成（整周计划 + 理由、AI 建议）不再占着 HTTP 连接。
+# 提交立即返回 job_id；进程内 asyncio worker 池按优先级执行；结果可轮询或 SSE 订阅。
+# Background job queue for long-running AI generation. Submitting returns a job_id at once;
+# an in-process asyncio worker pool runs jobs by priority; results are polled or streamed (SSE).
+#
+# - 去重 / dedup: 相同 kind + 输入（规范化 JSON 的哈希）在排队、运行中或结果未过期时复用同一个 job
+#   identical kind + input (hash of canonical JSON) reuses the queued, running or fresh job
+# - 持久化（可选）/ durable (optional): 设置 JOB_STORE_FILE 后任务写入 SQLite，重启时未完成的任务重新入队
+#   with JOB_STORE_FILE set, jobs are written to SQLite and unfinished ones are re-queued on restart
+#   (main.py 启动时调用 jobs.start() / main.py calls jobs.start() on startup)
+# - 他人的任务 / foreign jobs: 按 id 从共享存储读到的未完成任务由别的进程执行，等待时定期重读存储
+#   an unfinished job loaded by id from the shared store runs in another process; waiters re-poll the store
+# - 任务类型 / kinds: 由业务模块用 @register_job("kind") 登记 / registered by feature modules via @register_job
+# - 校验 / validation: 登记时可带 pydantic schema，提交时校验 payload，坏输入不会入队
+#   a kind may register a pydantic schema; payloads are validated at submit time, never queued when invalid
+#
+# 环境变量 / env: JOB_WORKERS(4) JOB_QUEUE_MAX(1000) JOB_RESULT_TTL(3600 s) JOB_POLL_SECONDS(1) JOB_STORE_FILE(如 data/jobs.sqlite；空 = 仅内存 / e.g. data/jobs.sqlite; empty = memory only)
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "1000"))
+RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+STORE_FILE = os.getenv("JOB_STORE_FILE", "")
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+HANDLERS: Dict[str, JobHandler] = {}
+SCHEMAS: Dict[str, Type[BaseModel]] = {}
+
+
+class JobQueueFull(RuntimeError):
+    """队列已满 / The job queue is full"""
+
+
+def register_job(kind: str, schema: Optional[Type[BaseModel]] = None):
+    """
+    登记任务类型：handler(payload) -> 可 JSON 序列化的结果；schema 用于提交时校验 payload
+    Register a job kind; `schema`, if given, validates the payload at submit time
+    """
+    def decorate(fn: JobHandler) -> JobHandler:
+        HANDLERS[kind] = fn
+        if schema is not None:
+            SCHEMAS[kind] = schema
+        return fn
+    return decorate
+
+
+def validate_payload(kind: str, payload: Dict[str, Any]) -> None:
+    """不合法时抛 pydantic.ValidationError / Raises pydantic.ValidationError on a bad payload"""
+    schema = SCHEMAS.get(kind)
+    if schema is not None:
+        schema.model_validate(payload)
+
+
+def input_hash(kind: str, payload: Dict[str, Any]) -> str:
+    raw = json.dumps({"k": kind, "p": payload}, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    payload: Dict[str, Any]
+    priority: int
+    hash: str
+    status: str = "queued"                    # queued | running | done | failed
+    result: Any = None
+    error: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    _changed: Optional[asyncio.Event] = field(default=None, repr=False)
+
+    @property
+    def terminal(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def public(self) -> Dict[str, Any]:
+        return {"job_id": self.id, "kind": self.kind, "status": self.status, "priority": self.priority,
+                "result": self.result, "error": self.error, "created": self.created,
+                "started": self.started, "finished": self.finished}
+
+    def _notify(self) -> None:
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+
+    async def wait_change(self, timeout: Optional[float] = None) -> None:
+        """等到下一次状态变化（或超时）/ Wait for the next status change (or the timeout)"""
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class JobStore:
+    """SQLite 持久化（同步短操作，加锁）/ SQLite persistence (short synchronous statements under a lock)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, priority INTEGER NOT NULL,"
+            " hash TEXT NOT NULL, status TEXT NOT NULL, result TEXT, error TEXT,"
+            " created REAL NOT NULL, started REAL, finished REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs(status)")
+
+    def save(self, job: Job) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.kind, json.dumps(job.payload, ensure_ascii=False), job.priority, job.hash,
+                 job.status, json.dumps(job.result, ensure_ascii=False), job.error,
+                 job.created, job.started, job.finished),
+            )
+
+    def load(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def unfinished(self) -> List[Job]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY created").fetchall()
+        return [self._job(r) for r in rows]
+
+    def prune(self, before: float) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?", (before,))
+
+    @staticmethod
+    def _job(row: Tuple) -> Job:
+        return Job(id=row[0], kind=row[1], payload=json.loads(row[2]), priority=row[3], hash=row[4],
+                   status=row[5], result=json.loads(row[6]) if row[6] else None, error=row[7],
+                   created=row[8], started=row[9], finished=row[10])
+
+
+class JobQueue:
+    def __init__(self, workers: int = WORKERS, max_queued: int = QUEUE_MAX, ttl: float = RESULT_TTL,
+                 store: Optional[JobStore] = None):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.store = store
+        self.metrics: Counter = Counter()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._by_hash: Dict[str, str] = {}
+        self._foreign: set = set()                 # 别的进程在执行的任务 / jobs run by another process
+        self._seq = itertools.count()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ---------- 提交 / Submit ----------
+    def submit(self, kind: str, payload: Dict[str, Any], priority: int = 0) -> Tuple[Job, bool]:
+        """
+        提交任务（需在事件循环内调用），返回 (job, 是否复用了已有任务)；priority 越大越先执行
+        Submit a job from inside the event loop; returns (job, deduplicated). Higher priority runs first.
+        """
+        if kind not in HANDLERS:
+            raise KeyError(f"unknown job kind: {kind}")
+        validate_payload(kind, payload)
+        self._ensure_workers()
+        self._prune()
+        digest = input_hash(kind, payload)
+        existing = self._jobs.get(self._by_hash.get(digest, ""))
+        if existing is not None and existing.status != "failed":
+            self.metrics["deduplicated"] += 1
+            return existing, True
+        if self._queue.qsize() >= self.max_queued:
+            self.metrics["rejected"] += 1
+            raise JobQueueFull(f"job queue full ({self.max_queued})")
+
+        job = Job(id=uuid.uuid4().hex, kind=kind, payload=payload, priority=priority, hash=digest)
+        self._remember(job)
+        if self.store is not None:
+            self.store.save(job)
+        self._enqueue(job)
+        self.metrics["submitted"] += 1
+        return job, False
+
+    def start(self) -> None:
+        """启动 worker 并恢复未完成的任务（在事件循环内调用）/ Start workers and recover unfinished jobs"""
+        self._ensure_workers()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = self.store.load(job_id)        # 之前或别的进程留下的任务 / left by an earlier or another process
+            if job is not None:
+                self._remember(job)
+                if not job.terminal:
+                    self._foreign.add(job.id)
+        elif job is not None and job.id in self._foreign:
+            self._refresh(job)
+        return job
+
+    async def wait_change(self, job: Job, timeout: float) -> None:
+        """
+        等到任务状态变化（或超时）；别的进程的任务定期重读存储
+        Wait for a status change (or the timeout); jobs run by another process re-poll the store
+        """
+        if job.id not in self._foreign:
+            await job.wait_change(timeout)
+            return
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(min(POLL_SECONDS, max(0.0, deadline - time.monotonic())))
+            if self._refresh(job):
+                return
+
+    def _refresh(self, job: Job) -> bool:
+        """从存储重读他人的任务，返回状态是否变化 / Reload a foreign job from the store; True if it changed"""
+        stored = self.store.load(job.id)
+        if stored is None:                        # 已被清理 / pruned by its owner
+            stored = Job(id=job.id, kind=job.kind, payload=job.payload, priority=job.priority, hash=job.hash,
+                         status="failed", error="job expired", finished=time.time())
+        changed = stored.status != job.status
+        for name in ("status", "result", "error", "started", "finished"):
+            setattr(job, name, getattr(stored, name))
+        if job.terminal:
+            self._foreign.discard(job.id)
+        if changed:
+            job._notify()
+        return changed
+
+    def _remember(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        self._by_hash[job.hash] = job.id
+
+    def _enqueue(self, job: Job) -> None:
+        self._queue.put_nowait((-job.priority, next(self._seq), job.id))
+
+    # ---------- 执行 / Workers ----------
+    def _ensure_workers(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        self._loop, self._queue = loop, asyncio.PriorityQueue()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        for job in [j for j in self._jobs.values() if not j.terminal and j.id not in self._foreign]:
+            job.status = "queued"                 # 换了事件循环：重新排队 / new event loop: re-queue
+            self._enqueue(job)
+        if self.store is not None:
+            for job in self.store.unfinished():   # 崩溃/重启恢复 / crash or restart recovery
+                if job.id not in self._jobs:
+                    job.status = "queued"
+                    self._remember(job)
+                    self._enqueue(job)
+                    self.metrics["recovered"] += 1
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None or job.status != "queued":
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Job) -> None:
+        job.status, job.started = "running", time.time()
+        self._save(job)
+        try:
+            job.result = await HANDLERS[job.kind](job.payload)
+            job.status = "done"
+            self.metrics["done"] += 1
+        except asyncio.CancelledError:
+            job.status = "queued"                 # 关闭时被中断：持久化后下次重跑 / interrupted by shutdown
+            self._save(job)
+            raise
+        except Exception as e:
+            job.status, job.error = "failed", getattr(e, "detail", None) or str(e)
+            self.metrics["failed"] += 1
+        job.finished = time.time()
+        self._save(job)
+
+    def _save(self, job: Job) -> None:
+        if self.store is not None:
+            try:
+                self.store.save(job)
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                print("job store write failed:", e)
+        job._notify()
+
+    def _prune(self) -> None:
+        """结果超过 TTL 的任务移出内存 / Drop jobs whose results are older than the TTL"""
+        cutoff = time.time() - self.ttl
+        for job_id in [i for i, j in self._jobs.items() if j.finished and j.finished < cutoff]:
+            job = self._jobs.pop(job_id)
+            self._foreign.discard(job_id)
+            if self._by_hash.get(job.hash) == job_id:
+                del self._by_hash[job.hash]
+        if self.store is not None:
+            self.store.prune(cutoff)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        status = Counter(j.status for j in self._jobs.values())
+        return {
+            "workers": len(self._tasks),
+            "queued": status["queued"],
+            "running": status["running"],
+            "durable": self.store is not None,
+            **{k: self.metrics[k] for k in ("submitted", "deduplicated", "done", "failed", "rejected", "recovered")},
+        }
+
+
+jobs = JobQueue(store=JobStore(STORE_FILE) if STORE_FILE else None)
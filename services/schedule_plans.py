@@ -0,0 +1,43 @@
+# services/schedule_plans.py
+# CN: 用户排程计划的内存状态（SchedulePlan 保留放置状态）与每用户一把锁。排程路由生成/修改计划，
+#     日历事件路由在事件增删改后调用 repair_for_event 做增量修复；两边都在同一把锁下执行，
+#     SchedulePlan 本身不是线程安全的。
+# EN: In-memory plan state per user (SchedulePlan keeps the placements) plus one lock per user.
+#     The schedule routes build and edit plans; the calendar event routes call repair_for_event
+#     after an event is created, moved or deleted. Both run under the same lock, because
+#     SchedulePlan itself is not thread-safe.
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from utils.schedule_optimizer import SchedulePlan
+
+# key: 用户ID，value: 排程状态 / key: user ID, value: plan state
+plans: Dict[str, SchedulePlan] = {}
+_locks: Dict[str, asyncio.Lock] = {}
+
+
+def plan_lock(user_id: str) -> asyncio.Lock:
+    return _locks.setdefault(str(user_id), asyncio.Lock())
+
+
+async def repair_for_event(user_id: str, event_id: str, event: Optional[Any]) -> Optional[Dict[str, Any]]:
+    """
+    事件新增/移动（event 为事件）或删除（event 为 None）后修复该用户的计划；没有计划时返回 None
+    Repair the user's plan after an event is upserted (event given) or deleted (event None);
+    returns None when the user has no plan
+    """
+    user_id = str(user_id)
+    if user_id not in plans:
+        return None
+    async with plan_lock(user_id):
+        plan = plans.get(user_id)
+        if plan is None:
+            return None
+        if event is None:
+            return await run_in_threadpool(plan.remove_event, str(event_id))
+        return await run_in_threadpool(plan.upsert_event, str(event_id), event)
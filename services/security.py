@@ -1,12 +1,31 @@
 #services/security.py
+# CN: 密码哈希与 JWT。已验证的 token 声明放进 LRU 缓存（到各自 exp 失效）；bcrypt 在有界线程池里执行，不阻塞事件循环。
+# EN: Password hashing and JWTs. Verified token claims are kept in an LRU cache until each token's
+#     exp; bcrypt runs in a bounded thread pool so logins don't block the event loop.
+#
+# env: BCRYPT_ROUNDS(12) PASSWORD_HASH_WORKERS(min(4, CPUs)) TOKEN_CACHE_SIZE(10000)
 
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Callable, Dict, Optional, Tuple
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from utils.config import settings
 
-pwd = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # CN: 成本因子，每 +1 耗时翻倍；EN: cost factor, +1 doubles the work
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+pwd = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# CN: bcrypt 释放 GIL，线程池可并行；池大小即并发上限，其余排队
+# EN: bcrypt releases the GIL, so the pool runs in parallel; its size caps concurrency, the rest queue
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
 
 def hash_password(raw: str) -> str:
     return pwd.hash(raw)
@@ -14,13 +33,79 @@ def hash_password(raw: str) -> str:
 def verify_password(raw: str, hashed: str) -> bool:
     return pwd.verify(raw, hashed)
 
+async def run_in_hash_pool(fn: Callable[..., Any], *args: Any) -> Any:
+    """CN: 任意密码哈希函数放进有界线程池；EN: run any password-hashing call in the bounded pool"""
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, fn, *args)
+
+async def hash_password_async(raw: str) -> str:
+    """CN: 在线程池里哈希；EN: hash in the bcrypt pool (use from async code)"""
+    return await run_in_hash_pool(hash_password, raw)
+
+async def verify_password_async(raw: str, hashed: str) -> bool:
+    """CN: 在线程池里校验；EN: verify in the bcrypt pool (use from async code)"""
+    return await run_in_hash_pool(verify_password, raw, hashed)
+
 def create_access_token(sub: str, expires_minutes: Optional[int] = None) -> str:
     expire = datetime.utcnow() + timedelta(minutes=expires_minutes or settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     payload = {"sub": sub, "exp": expire}
     return jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
 
-def decode_token(token: str) -> Optional[str]:
+
+# ---------- 已验证 token 的声明缓存 / Verified-claims cache ----------
+class ClaimsCache:
+    """CN: LRU，条目在 token 的 exp 时刻过期；EN: LRU whose entries expire at the token's own exp"""
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._items.get(token)
+            if item is None or item[1] <= time.time():
+                if item is not None:
+                    del self._items[token]
+                self.misses += 1
+                return None
+            self._items.move_to_end(token)
+            self.hits += 1
+            return item[0]
+
+    def put(self, token: str, claims: Dict[str, Any]) -> None:
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)):
+            return                       # CN: 没有 exp 的 token 不缓存；EN: never cache tokens without exp
+        with self._lock:
+            self._items[token] = (claims, float(exp))
+            self._items.move_to_end(token)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+claims_cache = ClaimsCache()
+
+def decode_claims(token: str) -> Optional[Dict[str, Any]]:
+    """CN: 验证签名与 exp（命中缓存时跳过验签）；EN: verify signature and exp, skipped on a cache hit"""
+    claims = claims_cache.get(token)
+    if claims is not None:
+        return claims
     try:
-        return jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]).get("sub")
+        claims = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
     except JWTError:
         return None
+    claims_cache.put(token, claims)
+    return claims
+
+def decode_token(token: str) -> Optional[str]:
+    claims = decode_claims(token)
+    return claims.get("sub") if claims else None
@@ -0,0 +1,333 @@
+# services/suggestions.py
+# CN: 家长建议的存储与推送。建议在进程内只加载一次（data/parent_suggestions.json），每条带递增 id
+#     作为游标；提交后发布到按孩子划分的频道，已连接的客户端（SSE / WebSocket）立即收到，
+#     断线重连时按游标补发，不再需要轮询。
+# EN: Storage and push delivery for parent suggestions. Suggestions are loaded once per process
+#     (data/parent_suggestions.json) and each carries an increasing id used as a cursor. Submitting
+#     publishes to a per-child channel; connected clients (SSE / WebSocket) get it at once and
+#     reconnecting clients catch up from their cursor, so polling is no longer needed.
+#
+# 后端 / backends (env SUGGESTION_BROKER_URL):
+#   空 = 进程内 / empty = in-process (one worker)
+#   redis://host:6379/0 = 多 worker 共享（需 `pip install redis`），收到的消息合并进本进程缓存
+#   redis://... = shared across workers (needs `pip install redis`); received entries are merged locally
+#
+# id / ids:
+#   进程内：微秒时间戳（单调递增）/ in-process: microsecond timestamps (monotonic)
+#   Redis：一个 Lua 脚本里 INCR 共享序列并 PUBLISH，发布顺序即 id 顺序；各 worker 只在订阅收到时写入，
+#   所以本地 id 总是递增到达，游标不会跳过晚到的小 id。
+#   Redis: one Lua script INCRs a shared sequence and PUBLISHes, so publish order is id order; every
+#   worker (the publisher included) inserts only when its subscription delivers, so ids arrive in
+#   increasing order locally and a cursor never skips a late, lower id.
+#
+# Redis 断线 / Redis outages:
+#   订阅任务被监督：断开后指数退避重连；每次（重新）订阅后，从持久日志 suggestions:log（按 id 排序的
+#   有序集合，脚本里与 PUBLISH 一起写入，保留最近 SUGGESTION_LOG_MAX 条）补齐本地 last_id 之后的建议，
+#   再处理订阅消息，所以宕机或断线期间的建议不会丢，且仍按 id 顺序到达
+#   the subscriber task is supervised and reconnects with exponential backoff. After every
+#   (re)subscribe it backfills everything after the local last_id from the durable log
+#   suggestions:log (a sorted set by id, written by the same script as the PUBLISH and capped at
+#   SUGGESTION_LOG_MAX entries) before handling live messages, so entries published while a
+#   worker was down or disconnected are not lost and still arrive in id order
+# 写盘在线程中执行，不阻塞事件循环 / the JSON file is written from a thread, off the event loop
+#
+# 环境变量 / env: SUGGESTION_BROKER_URL SUGGESTION_LOG_MAX(10000) SUGGESTION_RECONNECT_MAX_SECONDS(30)
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from utils.storage import load_json, save_json
+
+SUGGEST_FILE = os.path.join("data", "parent_suggestions.json")
+BROKER_URL = os.getenv("SUGGESTION_BROKER_URL", "")
+CHANNEL_PREFIX = "suggestions:"
+SEQUENCE_KEY = "suggestions:seq"
+LOG_KEY = "suggestions:log"
+LOG_MAX = int(os.getenv("SUGGESTION_LOG_MAX", "10000"))
+RECONNECT_MIN_SECONDS = 0.5
+RECONNECT_MAX_SECONDS = float(os.getenv("SUGGESTION_RECONNECT_MAX_SECONDS", "30"))
+
+Entry = Dict[str, Any]
+SuggestionListener = Callable[[str, Entry], None]
+
+
+class SuggestionStore:
+    def __init__(self, path: str = SUGGEST_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._data: Optional[Dict[str, List[Entry]]] = None
+        self._ids: Dict[str, List[int]] = {}          # 每个孩子的有序 id，用于二分 / sorted ids for bisect
+        self._last_id = 0
+        self._listeners: List[SuggestionListener] = []
+
+    def _loaded(self) -> Dict[str, List[Entry]]:
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    data: Dict[str, List[Entry]] = {}
+                    for child_id, entries in load_json(self.path).items():
+                        if not isinstance(entries, list):
+                            continue
+                        # CN: 旧数据没有 id，按顺序补 1..n；EN: legacy entries get ids 1..n in order
+                        rows = [{**e, "id": e.get("id", i)} for i, e in enumerate(entries, 1)]
+                        rows.sort(key=lambda e: e["id"])
+                        data[child_id] = rows
+                        self._ids[child_id] = [e["id"] for e in rows]
+                    self._last_id = max((ids[-1] for ids in self._ids.values() if ids), default=0)
+                    self._data = data
+        return self._data
+
+    # ---------- 读 / Read ----------
+    def entries(self, child_id: str, after: int = 0) -> List[Entry]:
+        """CN: id 大于游标的建议；EN: entries with id greater than the cursor"""
+        data = self._loaded()
+        ids = self._ids.get(child_id, [])
+        return [dict(e) for e in data.get(child_id, [])[bisect.bisect_right(ids, after):]]
+
+    def latest(self) -> Dict[str, Entry]:
+        """CN: 每个孩子的最新一条；EN: the latest entry per child"""
+        return {c: dict(rows[-1]) for c, rows in self._loaded().items() if rows}
+
+    @property
+    def last_id(self) -> int:
+        self._loaded()
+        return self._last_id
+
+    # ---------- 写 / Write ----------
+    def append(self, child_id: str, entry: Entry) -> Entry:
+        """CN: 分配 id 与时间戳并持久化；EN: assign an id and timestamp, then persist"""
+        with self._lock:
+            self._loaded()
+            now = time.time()
+            self._last_id = max(self._last_id + 1, int(now * 1_000_000))
+            entry = {**entry, "id": self._last_id, "at": now}
+            self._insert(child_id, entry)
+        return entry
+
+    def merge(self, child_id: str, entry: Entry) -> bool:
+        """CN: 合并经后端送达的建议（已存在则忽略）；EN: merge an entry delivered by the backend"""
+        with self._lock:
+            self._loaded()
+            ids = self._ids.get(child_id, [])
+            i = bisect.bisect_left(ids, entry["id"])
+            if i < len(ids) and ids[i] == entry["id"]:
+                return False
+            self._last_id = max(self._last_id, entry["id"])
+            self._insert(child_id, entry, persist=False)   # 由 flush 写盘 / persisted by flush()
+        return True
+
+    def flush(self) -> None:
+        """CN: 整体写盘；EN: write the whole file"""
+        with self._lock:
+            save_json(self.path, self._loaded())
+
+    def _insert(self, child_id: str, entry: Entry, persist: bool = True) -> None:
+        rows = self._data.setdefault(child_id, [])
+        ids = self._ids.setdefault(child_id, [])
+        i = bisect.bisect_right(ids, entry["id"])
+        rows.insert(i, entry)
+        ids.insert(i, entry["id"])
+        if persist:
+            save_json(self.path, self._data)
+        for listener in list(self._listeners):
+            listener(child_id, dict(entry))
+
+    def subscribe(self, listener: SuggestionListener) -> None:
+        self._listeners.append(listener)
+
+
+# ---------- 发布/订阅后端 / Pub/sub backends ----------
+# deliver(child_id, entry, own)：own = 本地已含所有更小的 id，可以写盘（本进程发布的，或一批补发的最后一条）
+# own = every lower id is here too, so the store may be persisted (our own entry, or the last of a backfill)
+Deliver = Callable[[str, Entry, bool], Awaitable[None]]
+LastId = Callable[[], int]
+
+
+class MemoryBackend:
+    """CN: 进程内：store 分配 id 并写盘（线程中），随后直接投递；EN: in-process: the store assigns the id"""
+
+    async def start(self, deliver: Deliver, last_id: LastId) -> None:
+        self._deliver = deliver
+
+    async def publish(self, child_id: str, entry: Entry, store: SuggestionStore) -> Entry:
+        entry = await asyncio.to_thread(store.append, child_id, entry)
+        await self._deliver(child_id, entry, False)    # 已写入并写盘 / already stored and persisted
+        return entry
+
+
+# KEYS: 序列, 频道, 日志 / sequence, channel, log
+# ARGV: 不含 id 的 JSON 对象, 下限, 日志上限 / JSON object without id, floor, log cap
+# CN: 下限保证新 id 大于本地已有的 id（如旧的微秒时间戳）；EN: the floor keeps new ids above existing ones
+PUBLISH_SCRIPT = """
+local id = redis.call('INCR', KEYS[1])
+local floor = tonumber(ARGV[2])
+if id <= floor then id = redis.call('INCRBY', KEYS[1], floor - id + 1) end
+local message = '{"id":' .. string.format('%d', id) .. ',' .. string.sub(ARGV[1], 2)
+redis.call('ZADD', KEYS[3], id, message)
+redis.call('ZREMRANGEBYRANK', KEYS[3], 0, -(tonumber(ARGV[3]) + 1))
+redis.call('PUBLISH', KEYS[2], message)
+return id
+"""
+
+
+class RedisBackend:
+    """
+    CN: Redis 频道 suggestions:{child_id}，每个 worker 订阅 suggestions:*；id 与发布在同一脚本里原子完成
+    EN: one Redis channel per child, every worker subscribes to suggestions:*; the id is allocated
+        and published atomically in one script
+    """
+
+    def __init__(self, url: str, client=None):
+        self.url = url
+        self._redis = client
+        self._origin = uuid.uuid4().hex                # 识别自己发布的消息 / recognizes our own messages
+        self._task: Optional[asyncio.Task] = None
+        self.reconnects = 0
+
+    async def start(self, deliver: Deliver, last_id: LastId) -> None:
+        if self._redis is None:
+            try:
+                import redis.asyncio as aioredis
+            except ImportError as e:
+                raise RuntimeError("SUGGESTION_BROKER_URL needs the 'redis' package (pip install redis)") from e
+            self._redis = aioredis.from_url(self.url)
+        self._deliver, self._last_id = deliver, last_id
+        pubsub = await self._subscribe()            # 首次失败直接抛出 / the first attempt raises
+        self._task = asyncio.get_running_loop().create_task(self._supervise(pubsub))
+
+    async def _subscribe(self):
+        """CN: 先订阅，再从日志补发，订阅期间到达的消息留在连接里随后去重；EN: subscribe, then backfill"""
+        pubsub = self._redis.pubsub()
+        await pubsub.psubscribe(CHANNEL_PREFIX + "*")
+        rows = await self._redis.zrangebyscore(LOG_KEY, "(%d" % self._last_id(), "+inf")
+        for i, raw in enumerate(rows):
+            await self._handle(raw, last=i == len(rows) - 1)
+        return pubsub
+
+    async def _handle(self, raw, last: bool = False) -> None:
+        entry = json.loads(raw)
+        child_id = entry.pop("child_id")
+        own = entry.pop("origin", None) == self._origin
+        await self._deliver(child_id, entry, own or last)
+
+    async def _supervise(self, pubsub) -> None:
+        """CN: 断线后指数退避重连并补发；EN: reconnect with exponential backoff and backfill"""
+        delay = RECONNECT_MIN_SECONDS
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub = await self._subscribe()
+                    self.reconnects += 1
+                delay = RECONNECT_MIN_SECONDS
+                async for message in pubsub.listen():
+                    if message.get("type") == "pmessage":
+                        await self._handle(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print("suggestion subscriber lost redis, reconnecting:", e)
+            pubsub = await self._close(pubsub)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+
+    @staticmethod
+    async def _close(pubsub) -> None:
+        close = getattr(pubsub, "aclose", None) or getattr(pubsub, "close", None)
+        if close is not None:
+            try:
+                await close()
+            except Exception:
+                pass
+        return None
+
+    async def publish(self, child_id: str, entry: Entry, store: SuggestionStore) -> Entry:
+        """CN: 只分配 id 并发布；本进程在订阅收到时写入；EN: allocate and publish; stored on delivery"""
+        entry = {**entry, "at": time.time()}
+        data = json.dumps({**entry, "child_id": child_id, "origin": self._origin}, ensure_ascii=False)
+        entry_id = await self._redis.eval(PUBLISH_SCRIPT, 3, SEQUENCE_KEY, CHANNEL_PREFIX + child_id, LOG_KEY,
+                                          data, store.last_id, LOG_MAX)
+        return {**entry, "id": int(entry_id)}
+
+
+def make_backend(url: str = BROKER_URL):
+    return RedisBackend(url) if url.startswith(("redis://", "rediss://")) else MemoryBackend()
+
+
+class SuggestionBroker:
+    """
+    CN: 订阅者只拿到“有新建议”的信号，再按自己的游标从 store 读取——补发与实时推送走同一条路径，
+        慢客户端不会丢消息也不会撑爆队列
+    EN: subscribers only receive a wake-up and then read the store from their own cursor, so
+        catch-up and live delivery share one path and a slow client can neither lose entries
+        nor grow a queue
+    """
+
+    def __init__(self, store: SuggestionStore, backend=None):
+        self.store = store
+        self.backend = backend or MemoryBackend()
+        self.published = 0
+        self._watchers: Dict[str, Set[asyncio.Event]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            await self.backend.start(self._deliver, lambda: self.store.last_id)
+
+    async def _deliver(self, child_id: str, entry: Entry, own: bool) -> None:
+        self.store.merge(child_id, entry)
+        for wake in self._watchers.get(child_id, ()):
+            wake.set()
+        if own:
+            # CN: 此时本地已含所有更小的 id，由发布方写盘；EN: all lower ids are here too, so the publisher persists
+            await asyncio.to_thread(self.store.flush)
+
+    async def publish(self, child_id: str, entry: Entry) -> Entry:
+        """CN: 保存并推送；EN: store the entry and push it to subscribers"""
+        await self._ensure_started()
+        entry = await self.backend.publish(child_id, entry, self.store)
+        self.published += 1
+        return entry
+
+    async def follow(self, child_id: str, after: int = 0, heartbeat: Optional[float] = None):
+        """
+        CN: 先补发游标之后的建议，再持续推送新的；超时没有新建议时产出 None（用于保活）
+        EN: yield entries after the cursor, then new ones as they arrive; yields None on a quiet
+            heartbeat interval so callers can send a keep-alive
+        """
+        await self._ensure_started()
+        wake = asyncio.Event()
+        self._watchers.setdefault(child_id, set()).add(wake)
+        try:
+            while True:
+                wake.clear()
+                for entry in self.store.entries(child_id, after):
+                    after = entry["id"]
+                    yield entry
+                try:
+                    await asyncio.wait_for(wake.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            watchers = self._watchers.get(child_id)
+            if watchers is not None:
+                watchers.discard(wake)
+                if not watchers:
+                    del self._watchers[child_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self.backend).__name__, "published": self.published,
+                "subscribers": sum(len(w) for w in self._watchers.values())}
+
+
+suggestion_store = SuggestionStore()
+broker = SuggestionBroker(suggestion_store, make_backend())
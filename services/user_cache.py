@@ -0,0 +1,70 @@
+# services/user_cache.py
+# CN: 已登录用户的短 TTL 缓存（按 token 的 sub 为键，LRU 限制大小）。真实鉴权模式下，
+#     current_active_user 命中缓存时不再每个请求查一次用户表；用户更新/停用/删除时由
+#     UserManager 的钩子立即失效（services/auth.py）。多进程部署时其他进程最多滞后一个 TTL。
+# EN: Short-TTL, size-bounded cache of authenticated users keyed by the token subject. In real
+#     auth mode current_active_user skips the per-request user-row load on a hit; the UserManager
+#     hooks (services/auth.py) invalidate an entry on update, deactivation or delete. With several
+#     workers, the others lag by at most one TTL.
+#
+# env: USER_CACHE_TTL(30 s; 0 = 关闭 / off) USER_CACHE_SIZE(10000)
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+
+class UserCache:
+    """CN: sub -> 用户对象，TTL + LRU；EN: sub -> user object, TTL + LRU"""
+
+    def __init__(self, ttl: float = USER_CACHE_TTL, max_size: int = USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._items: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sub: str) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(sub)
+            if item is None or item[1] <= time.monotonic():
+                if item is not None:
+                    del self._items[sub]
+                self.misses += 1
+                return None
+            self._items.move_to_end(sub)
+            self.hits += 1
+            return item[0]
+
+    def put(self, sub: str, user: Any) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._items[sub] = (user, time.monotonic() + self.ttl)
+            self._items.move_to_end(sub)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, sub: Any) -> None:
+        """CN: 用户被修改/停用/删除时调用；EN: call when the user is updated, deactivated or deleted"""
+        with self._lock:
+            if self._items.pop(str(sub), None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._items), "ttl": self.ttl, "hits": self.hits,
+                "misses": self.misses, "invalidations": self.invalidations}
+
+
+user_cache = UserCache()
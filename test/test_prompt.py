@@ -1,20 +1,24 @@
 # test/test_prompt.py
 
-from models.user_profile import UserProfile
+from models.user_profile import UserProfile, Availability, WeeklyTemplate, TimeBlock
 from utils.prompt_builder import build_prompt
 
 def test_prompt_generation():
     dummy_user = UserProfile(
+        user_id="alice",
         name="Alice",
-        age=14,
-        goals=["Improve creativity", "Build confidence"],
-        survey={"interests": ["drawing", "storytelling"]},
-        availability=["Monday afternoon", "Saturday morning"]
+        survey="I like drawing and storytelling",
+        availability=Availability(template=WeeklyTemplate(weekly={
+            "Mon": [TimeBlock(start="16:00", end="17:00")],
+            "Sat": [TimeBlock(start="09:00", end="11:00")],
+        })),
     )
 
     prompt = build_prompt(dummy_user)
     print("Generated prompt:\n")
     print(prompt)
+    assert "Name: Alice" in prompt
+    assert "Available time: Mon 16:00-17:00; Sat 09:00-11:00" in prompt
 
 # manually run
 if __name__ == "__main__":
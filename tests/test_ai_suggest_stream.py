@@ -0,0 +1,69 @@
+# tests/test_ai_suggest_stream.py
+# 流式 AI 建议：只有完整的数组才写回缓存 / Streaming AI suggestions cache only a complete array
+
+import sys
+import types
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def recommender(monkeypatch):
+    # routers/__init__ 会导入全部路由，这里只让子模块按路径加载 / skip routers/__init__, load submodules by path
+    pkg = types.ModuleType("routers")
+    pkg.__path__ = ["routers"]
+    monkeypatch.setitem(sys.modules, "routers", pkg)
+    for name in ("routers.recommender", "routers.llm_reason"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    import routers.recommender as module
+    return module
+
+
+def _client(module, monkeypatch, chunks, fail_after=None):
+    remembered = []
+
+    async def stream(q):
+        for i, chunk in enumerate(chunks):
+            if i == fail_after:
+                raise RuntimeError("connection reset")
+            yield chunk
+
+    async def alookup(q):
+        return None
+
+    async def aremember(cards, q):
+        remembered.append(cards)
+
+    suggest = types.SimpleNamespace(alookup=alookup, aremember=aremember)
+    fake = types.SimpleNamespace(
+        providers=lambda capability: ["openai"],
+        configured=lambda name: True,
+        get=lambda name, capability: suggest if capability == "suggest" else stream,
+    )
+    monkeypatch.setattr(module, "llm_providers", fake)
+    app = FastAPI()
+    app.include_router(module.router, prefix="/recommend")
+    return TestClient(app), remembered
+
+
+CARD = '{"title": "跑步", "duration": 20, "tag": "sport", "reason": "r"}'
+
+
+def test_complete_array_is_cached(recommender, monkeypatch):
+    client, remembered = _client(recommender, monkeypatch, ["[" + CARD + ",", CARD + "]"])
+    body = client.get("/recommend/ai-suggest/stream", params={"q": "运动"}).text
+    assert body.count("event: card") == 2
+    assert len(remembered) == 1 and len(remembered[0]) == 2
+
+
+@pytest.mark.parametrize("chunks, fail_after", [
+    (["[" + CARD + ",", CARD + "]"], 1),      # 第一张卡后服务商出错 / provider fails after the first card
+    (["[" + CARD + ",", CARD], None),          # 数组被截断 / truncated array
+])
+def test_partial_result_is_not_cached(recommender, monkeypatch, chunks, fail_after):
+    client, remembered = _client(recommender, monkeypatch, chunks, fail_after)
+    body = client.get("/recommend/ai-suggest/stream", params={"q": "运动"}).text
+    assert "event: card" in body and "event: done" in body
+    assert remembered == []
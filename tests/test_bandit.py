@@ -0,0 +1,43 @@
+# tests/test_bandit.py
+# 在线学习器测试 / Online learner tests
+
+from feedback.bandit import BanditLearner
+
+
+def test_feedback_shifts_ranking_and_state_persists(tmp_path):
+    path = str(tmp_path / "bandit.npz")
+    learner = BanditLearner(path=path, persist_seconds=3600, seed=1)
+    for _ in range(30):
+        learner.update("kid", "运动", 17, 1.0)
+        learner.update("kid", "学习", 17, 0.0)
+
+    w = learner.weights("kid", ["运动", "学习", "运动"], [17, 17, 8], sample=False)
+    assert w[0] > 0.9 and w[1] < 0.1
+    assert abs(w[2] - 0.5) < 1e-6          # 其他时段仍是先验 / other buckets keep the prior
+
+    learner.flush()
+    restored = BanditLearner(path=path, seed=1)
+    assert (restored.weights("kid", ["运动"], [17], sample=False) == w[:1]).all()
+    assert restored.weights("someone-else", ["运动"], [17], sample=False)[0] == 0.5
+
+
+def test_many_children_grow_arrays():
+    learner = BanditLearner(path="/nonexistent/bandit.npz", seed=0)
+    for i in range(100):
+        learner.update(f"kid-{i}", "学习", 9, 0.5)
+    assert learner.alpha.shape[0] >= 100
+    assert learner.weights("kid-99", ["学习"], [9]).shape == (1,)
+
+
+def test_sampling_holds_the_lock():
+    learner = BanditLearner(path="/nonexistent/bandit.npz", seed=0)
+    rng = learner._rng
+
+    class CheckedRng:
+        def beta(self, a, b):
+            assert learner._lock.locked()          # 共享 Generator 只在锁内使用 / shared Generator used under the lock
+            return rng.beta(a, b)
+
+    learner._rng = CheckedRng()
+    learner.update("kid", "学习", 9, 1.0)
+    assert learner.weights("kid", ["学习", "运动"], [9, 9]).shape == (2,)
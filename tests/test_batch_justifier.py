@@ -0,0 +1,90 @@
+# tests/test_batch_justifier.py
+# 整份计划一次 LLM 调用的理由生成 / One-call justification for a whole plan
+
+import asyncio
+
+from models.task_model import Task
+from models.user_profile import UserProfile
+from recommender import justifier, reason_pipeline
+from utils.prompt_builder import BATCH_REASON_TEMPLATE
+
+
+def _tasks():
+    return [
+        Task(task_id="1", title="篮球 Training - sport", description="篮球 · sport · Mon 19:00", duration=60),
+        Task(task_id="2", title="篮球 Training - sport", description="篮球 · sport · Wed 19:00", duration=60),
+        Task(task_id="3", title="阅读 Training - reading", description="阅读 · reading · Sat 10:00", duration=45),
+    ]
+
+
+def test_batch_prompt_dedupes_titles():
+    prompt, ids = justifier.build_batch_prompt(UserProfile(user_id="u1", name="Alice"), _tasks())
+    assert ids == {"t1": ["1", "2"], "t2": ["3"]}
+    assert prompt.startswith(BATCH_REASON_TEMPLATE.static)       # 静态前缀在前 / static prefix first
+    assert "Name: Alice" in prompt and prompt.endswith("t2: 阅读 Training - reading (45 min; 阅读 · reading · Sat 10:00)")
+
+
+def test_parse_batch_reasons_json_and_lines():
+    ids = {"t1": ["1", "2"], "t2": ["3"]}
+    text = 'Sure!\n```json\n{"t1": "Builds stamina.", "t2": "Feeds curiosity."}\n```'
+    assert justifier.parse_batch_reasons(text, ids) == {
+        "1": "Builds stamina.", "2": "Builds stamina.", "3": "Feeds curiosity."}
+    # 非 JSON 时按行解析；缺失的 id 不出现 / line fallback; unanswered ids are left out
+    assert justifier.parse_batch_reasons("t2: Feeds curiosity", ids) == {"3": "Feeds curiosity"}
+    assert justifier.parse_batch_reasons("no idea", ids) == {}
+
+
+def test_justify_plan_returns_rule_reasons_then_upgrades(monkeypatch):
+    calls = []
+
+    async def fake_batch(profile, tasks, provider, hedge):
+        calls.append(len(tasks))
+        return {"1": "LLM reason"}
+
+    monkeypatch.setattr(reason_pipeline, "llm_batch_reasons", fake_batch)
+
+    async def run():
+        plan = reason_pipeline.justify_plan(None, _tasks())
+        assert all(t.reason.startswith("The task") for t in plan["tasks"])
+        item = reason_pipeline.upgrades.get(plan["upgrade_id"])
+        await asyncio.wait_for(item.ready.wait(), 1)
+        return item.public()
+
+    assert asyncio.run(run()) == {"status": "done", "reasons": {"1": "LLM reason"}, "error": None}
+    assert calls == [3]
+
+
+def test_batch_calls_map_to_functions():
+    assert set(justifier.BATCH_CALLS) == set(justifier.PROVIDER_KEYS)
+    assert all(callable(fn) for fn in justifier.BATCH_CALLS.values())
+
+
+
+def test_llm_reason_job_records_the_plain_error(monkeypatch):
+    import sys
+    import types
+
+    from services.jobs import JobQueue
+
+    # routers/__init__ 会导入全部路由，这里只按路径加载 / skip routers/__init__, load the submodule by path
+    pkg = types.ModuleType("routers")
+    pkg.__path__ = ["routers"]
+    monkeypatch.setitem(sys.modules, "routers", pkg)
+    monkeypatch.delitem(sys.modules, "routers.llm_reason", raising=False)
+    import routers.llm_reason  # noqa: F401  登记 llm_reason 任务 / registers the llm_reason job kind
+
+    async def broken(*args, **kwargs):
+        raise RuntimeError("quota exceeded")
+
+    monkeypatch.setattr(justifier, "hedged_call", broken)
+    q = JobQueue(workers=1)
+
+    async def run():
+        job, _ = q.submit("llm_reason", {"user_profile": {"user_id": "u1"}})
+        while not job.terminal:
+            await job.wait_change(1)
+        await q.stop()
+        return job
+
+    job = asyncio.run(run())
+    assert job.status == "failed" and job.error == "quota exceeded"   # 不是 HTTPException 的 detail / not an HTTP detail
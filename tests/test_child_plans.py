@@ -0,0 +1,31 @@
+# tests/test_child_plans.py
+# 孩子计划物化视图 / Materialized child plans
+
+import json
+
+from services.child_plans import DEFAULT_PLAN, ChildPlans, RuleMatcher
+from services.child_tasks import ChildTaskStore
+
+
+def test_plan_recomputed_only_on_change(tmp_path):
+    path = tmp_path / "tasks.json"
+    path.write_text(json.dumps({"kid": [{"name": "Reading time"}, {"name": "Evening READING"}]}))
+    store = ChildTaskStore(str(path))
+    plans = ChildPlans(store)
+
+    plan = plans.get("kid")
+    assert plan["recommendations"] == ["Try writing a summary of what you read!"]
+    assert plans.get("kid") is plan and plans.rebuilds == 1      # 直接返回 / served as stored
+
+    store.update("kid", "Reading time", {"name": "Piano"})
+    assert plans.get("kid")["recommendations"] != DEFAULT_PLAN   # 还有一个阅读任务 / one reading task left
+    store.update("kid", "Evening READING", {"name": "Soccer"})
+    plan = plans.get("kid")
+    assert plan["recommendations"] == DEFAULT_PLAN and plan["version"] == store.version("kid") == 2
+    store.add("other", {"name": "reading"})                      # 别的孩子 / another child
+    assert plans.rebuilds == 3
+
+
+def test_matcher_reports_every_rule():
+    matcher = RuleMatcher([(("read",), "a"), (("math", "algebra"), "b")])
+    assert matcher.match("Read then Algebra") == {0, 1} and matcher.match("art") == set()
@@ -0,0 +1,74 @@
+# tests/test_child_summaries.py
+# 家长面板物化摘要 / Materialized parent-dashboard summaries
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from services.child_summaries import ChildSummaries, week_bounds, week_minutes
+from services.child_tasks import ChildTaskStore
+from services.suggestions import SuggestionStore
+
+
+def make(tmp_path, tasks=None, suggestions=None):
+    task_file, suggest_file = tmp_path / "tasks.json", tmp_path / "suggest.json"
+    task_file.write_text(json.dumps(tasks or {}))
+    suggest_file.write_text(json.dumps(suggestions or {}))
+    store = ChildTaskStore(str(task_file))
+    return store, ChildSummaries(store, SuggestionStore(str(suggest_file)))
+
+
+def test_built_once_then_incremental(tmp_path):
+    store, views = make(
+        tmp_path,
+        tasks={"kid": [{"name": "Reading", "duration": 20, "status": "pending"},
+                       {"name": "Piano", "duration": 30, "status": "done"}]},
+        suggestions={"kid": [{"from": "p1", "text": "old"}, {"from": "p1", "text": "new"}]},
+    )
+    first = asyncio.run(views.get("kid"))
+    assert (first["pending"], first["done"], first["planned_minutes_week"]) == (1, 1, 20)
+    assert first["latest_suggestion"]["text"] == "new"
+
+    store.all = lambda: (_ for _ in ()).throw(AssertionError("rebuilt"))   # 不再全量扫描 / no rescans
+    store.add("kid", {"name": "Math", "duration": 15, "status": "pending"})
+    store.update("kid", "Reading", {"status": "done"})
+    views.suggestions.append("kid", {"from": "p2", "text": "latest"})
+    now = asyncio.run(views.get("kid"))
+    assert (now["pending"], now["done"], now["planned_minutes_week"]) == (1, 2, 15)
+    assert now["latest_suggestion"]["text"] == "latest"
+    assert json.loads((tmp_path / "tasks.json").read_text())["kid"][0]["status"] == "done"
+
+
+def test_event_minutes_for_this_week(tmp_path):
+    _, views = make(tmp_path)
+    asyncio.run(views.get("kid"))                      # 非 UUID：无需查库 / not a user id: no DB seed
+    monday, _ = week_bounds()
+    views.apply_event("kid", None, (monday + timedelta(hours=9), monday + timedelta(hours=10)))
+    views.apply_event("kid", (monday + timedelta(hours=9), monday + timedelta(hours=10)),
+                      (monday + timedelta(hours=9), monday + timedelta(hours=9, minutes=45)))
+    assert asyncio.run(views.many(["kid"]))[0]["event_minutes_week"] == 45
+
+
+def test_week_minutes_splits_on_monday():
+    sunday = datetime(2026, 10, 18, 23, 0)
+    assert week_minutes(sunday, sunday + timedelta(hours=2)) == {"2026-W42": 60, "2026-W43": 60}
+
+
+def test_build_racing_a_write_counts_once(tmp_path, monkeypatch):
+    import threading
+    import services.child_tasks as child_tasks
+
+    store, views = make(tmp_path)
+    real_save = child_tasks.save_json
+    builder = threading.Thread(target=views._built)
+
+    def slow_save(path, data):
+        builder.start()                     # 视图在写入进行中构建 / view builds mid-write
+        builder.join(0.2)
+        real_save(path, data)
+
+    monkeypatch.setattr(child_tasks, "save_json", slow_save)
+    store.add("kid", {"name": "Reading", "duration": 30, "status": "pending"})
+    builder.join()
+    summary = asyncio.run(views.get("kid"))
+    assert (summary["pending"], summary["task_minutes"]) == (1, 30)
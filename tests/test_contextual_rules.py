@@ -0,0 +1,64 @@
+# tests/test_contextual_rules.py
+# 情境规则引擎测试 / Contextual rules engine tests
+
+import json
+import os
+
+from recommender.contextual_rules import DEFAULT_RULES, CompiledRules, RulesEngine, get_optimal_task_type_by_time
+
+
+def test_default_table_matches_original_hour_ranges():
+    expected = {"06": "灵活任务", "07": "学习", "10": "学习", "11": "灵活任务", "12": "午休或轻松阅读",
+                "14": "午休或轻松阅读", "15": "灵活任务", "16": "运动", "18": "运动", "19": "灵活任务"}
+    for hh, task_type in expected.items():
+        assert get_optimal_task_type_by_time(f"{hh}:30") == task_type
+    for bad in ("", "morning", "ab:cd", None):               # 旧版对非 HH:MM 返回默认 / baseline default
+        assert get_optimal_task_type_by_time(bad) == "灵活任务"
+
+
+def test_weekday_and_age_rules_override_hour_rules():
+    config = dict(DEFAULT_RULES,
+                  weekday_rules=[{"days": ["Sat"], "start": "09:00", "end": "11:00", "task_type": "运动"}],
+                  age_rules=[{"min_age": 6, "max_age": 10, "start": "20:30", "end": "07:30", "task_type": "休息"}])
+    c = CompiledRules(config)
+    week = c.tables[c.bucket(None)]
+    assert c.types[week[0 * 1440 + 9 * 60]] == "学习"
+    assert c.types[week[5 * 1440 + 9 * 60]] == "运动"
+
+    kid = c.tables[c.bucket(8)]
+    assert c.types[kid[2 * 1440 + 21 * 60]] == "休息"
+    assert c.types[kid[2 * 1440 + 7 * 60]] == "休息"      # 跨午夜 / wraps midnight
+    assert c.types[c.tables[c.bucket(14)][2 * 1440 + 21 * 60]] == "灵活任务"
+
+
+def test_engine_hot_reloads_on_file_change(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(DEFAULT_RULES), encoding="utf-8")
+    engine = RulesEngine(str(path), check_seconds=0)
+    assert engine.compiled.types[engine.compiled.day_tables[0][8 * 60]] == "学习"
+
+    changed = dict(DEFAULT_RULES, hour_rules=[{"start": "08:00", "end": "09:00", "task_type": "运动"}])
+    path.write_text(json.dumps(changed), encoding="utf-8")
+    os.utime(path, (1, 1))
+    assert engine.compiled.types[engine.compiled.day_tables[0][8 * 60]] == "运动"
+
+    # 坏配置保留旧快照 / a broken file keeps the last good snapshot
+    path.write_text("{not json", encoding="utf-8")
+    os.utime(path, (2, 2))
+    assert engine.compiled.types[engine.compiled.day_tables[0][8 * 60]] == "运动"
+
+
+def test_unreadable_file_keeps_the_last_good_snapshot(tmp_path, monkeypatch):
+    import builtins
+
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(DEFAULT_RULES), encoding="utf-8")
+    engine = RulesEngine(str(path), check_seconds=0)
+    before = engine.compiled
+
+    def denied(*args, **kwargs):
+        raise PermissionError("denied")
+
+    os.utime(path, (3, 3))
+    monkeypatch.setattr(builtins, "open", denied)              # stat 成功、打开失败 / stat works, open fails
+    assert engine.compiled is before
@@ -0,0 +1,22 @@
+# tests/test_embedding_index.py
+# 本地检索测试 / Local retrieval tests
+
+from recommender.embedding_index import EmbeddingIndex, match_interests
+
+
+def test_free_text_reaches_catalog_interests():
+    assert match_interests("I like drawing comics") == ["美术"]
+    assert match_interests("我喜欢弹钢琴和唱歌")[0] == "音乐"
+    assert match_interests("zzz") == []
+
+
+def test_incremental_add_makes_new_items_searchable():
+    index = EmbeddingIndex(capacity=2)
+    index.add([{"interest": "篮球", "name": "投篮训练", "keywords": "basketball shoot"},
+               {"interest": "美术", "name": "速写", "keywords": "drawing sketch"}])
+    assert all(item["interest"] != "航天" for item, _ in index.search("rocket launch"))
+
+    added = index.add([{"interest": "航天", "name": "水火箭制作", "keywords": "rocket space launch"},
+                       {"interest": "篮球", "name": "投篮训练", "keywords": "basketball shoot"}])
+    assert added == 1 and len(index) == 3
+    assert index.search("rocket launch", k=1)[0][0]["interest"] == "航天"
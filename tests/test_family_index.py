@@ -0,0 +1,22 @@
+# tests/test_family_index.py
+# 家长↔孩子索引 / Parent <-> child index
+
+import json
+
+from services.family_index import ParentChildIndex
+
+
+def test_bind_updates_both_directions_and_persists(tmp_path):
+    path = tmp_path / "map.json"
+    path.write_text(json.dumps({"p1": ["k1"]}))
+    index = ParentChildIndex(str(path))
+    assert index.linked("p1", "k1") and not index.linked("p2", "k1")
+
+    assert index.bind("p2", "k1") is True
+    assert index.bind("p2", "k1") is False
+    assert index.bind("p1", "k2") is True
+    assert index.parents("k1") == ["p1", "p2"] and index.children("p1") == ["k1", "k2"]
+    assert json.loads(path.read_text()) == {"p1": ["k1", "k2"], "p2": ["k1"]}
+
+    reloaded = ParentChildIndex(str(path))
+    assert reloaded.linked("p2", "k1") and reloaded.parents("k2") == ["p1"]
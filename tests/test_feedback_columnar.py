@@ -0,0 +1,124 @@
+# tests/test_feedback_columnar.py
+# 列式反馈分析测试 / Columnar feedback analytics tests
+
+import numpy as np
+
+from feedback.columnar import FeedbackColumns, rollup
+from feedback.evaluator import evaluate_feedback
+from models.task_model import TaskFeedback
+
+
+def test_rollup_matches_scalar_evaluator(tmp_path):
+    cols = FeedbackColumns(str(tmp_path))
+    rows = [("kid1", "阅读", 1.0, 0.2, 0.8, 9), ("kid2", "阅读", 0.5, 0.6, 0.4, 9),
+            ("kid1", "跑步", 0.75, None, None, 17)]
+    for child, task, rating, diff, eff, hour in rows:
+        cols.append(child, task, rating, diff, eff, hour, ts=0)
+
+    by_task = {r["task"]: r for r in cols.rollup(by="task", percentiles=(50,))}
+    expected = [evaluate_feedback(TaskFeedback(task_id="阅读", rating=r, difficulty=d, time_efficiency=e))
+                for _, _, r, d, e, _ in rows[:2]]
+    assert by_task["阅读"]["count"] == 2
+    assert abs(by_task["阅读"]["mean"] - np.mean(expected)) < 1e-3
+    assert by_task["跑步"]["mean"] == 0.75   # 缺少难度/效率时只看评分 / rating-only fallback
+
+    # 重新打开后字典与列仍一致 / dictionaries and columns survive a reopen
+    hours = {r["hour"]: r["count"] for r in FeedbackColumns(str(tmp_path)).rollup(by="hour", metric="rating")}
+    assert hours == {9: 2, 17: 1}
+
+
+def test_percentiles_match_numpy(tmp_path):
+    cols = FeedbackColumns(str(tmp_path))
+    rng = np.random.default_rng(0)
+    n = 5000
+    tasks = rng.integers(0, 7, n)
+    ratings = rng.random(n)
+    cols.append_many([{"child": "c", "task": f"t{t}", "rating": r, "ts": i}
+                      for i, (t, r) in enumerate(zip(tasks, ratings))])
+    view = cols.view()
+    stats = {r["task"]: r for r in rollup(view, by="task", metric="rating", percentiles=(10, 50, 99))}
+    stored = np.asarray(view["rating"], dtype=np.float64)
+    for t in range(7):
+        vals = stored[np.asarray(view["task"]) == view.tasks.index(f"t{t}")]
+        for q in (10, 50, 99):
+            assert abs(stats[f"t{t}"][f"p{q}"] - np.percentile(vals, q)) < 1e-3
+    assert len(cols.view(since=1000, until=2000)) == 1000
+
+
+def test_column_sync_tails_the_feedback_table(tmp_path):
+    import asyncio
+
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from sqlmodel import SQLModel
+
+    from feedback import store
+    from feedback.column_sync import ColumnSync
+
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+        sync = ColumnSync(FeedbackColumns(str(tmp_path)))
+
+        async def add(task, rating):
+            async with maker() as session:
+                await store.add_feedback(session, {"user_id": "kid1", "task_name": task, "rating": rating})
+
+        await add("阅读", 5)
+        await add("跑步", 3)
+        first = await sync.sync_once(maker)
+        again = await sync.sync_once(maker)
+        await add("阅读", 1)
+        # 新实例从水位文件续读 / a fresh instance resumes from the watermark file
+        resumed = await ColumnSync(FeedbackColumns(str(tmp_path))).sync_once(maker)
+        await engine.dispose()
+        return first, again, resumed
+
+    first, again, resumed = asyncio.run(run())
+    assert (first, again, resumed) == (2, 0, 1)
+    by_task = {r["task"]: r["count"] for r in FeedbackColumns(str(tmp_path)).rollup(by="task", metric="rating")}
+    assert by_task == {"阅读": 2, "跑步": 1}
+
+
+def test_reader_instance_picks_up_new_dictionary_entries(tmp_path):
+    writer, reader = FeedbackColumns(str(tmp_path)), FeedbackColumns(str(tmp_path))
+    writer.append("kid1", "阅读", 1.0, ts=0)
+    assert {r["task"] for r in reader.rollup(by="task", metric="rating")} == {"阅读"}
+    writer.append("kid2", "跑步", 0.5, ts=0)                 # 新任务与新孩子 / a new task and child
+    assert {r["task"] for r in reader.rollup(by="task", metric="rating")} == {"阅读", "跑步"}
+    assert {r["child"] for r in reader.rollup(by="child", metric="rating")} == {"kid1", "kid2"}
+
+
+def test_column_sync_picks_up_a_late_commit_behind_the_watermark(tmp_path):
+    import asyncio
+    from datetime import timedelta
+
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from sqlmodel import SQLModel
+
+    from feedback import store
+    from feedback.column_sync import ColumnSync
+    from models.feedback_model import FeedbackRecord
+
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+        sync = ColumnSync(FeedbackColumns(str(tmp_path)))
+        async with maker() as session:
+            first = await store.add_feedback(session, {"user_id": "kid1", "task_name": "阅读", "rating": 5})
+        synced = await sync.sync_once(maker)
+        # 早于水位取 created_at、晚于同步才提交的事务 / stamped before the watermark, committed after the sync
+        async with maker() as session:
+            session.add(FeedbackRecord(user_id="kid2", task_name="跑步", rating=3,
+                                       created_at=first.created_at - timedelta(seconds=1)))
+            await session.commit()
+        late = await sync.sync_once(maker)
+        again = await sync.sync_once(maker)
+        await engine.dispose()
+        return synced, late, again
+
+    assert asyncio.run(run()) == (1, 1, 0)
+    assert {r["task"] for r in FeedbackColumns(str(tmp_path)).rollup(by="task", metric="rating")} == {"阅读", "跑步"}
@@ -0,0 +1,61 @@
+# tests/test_feedback_store.py
+# 反馈存储：写入即更新聚合，汇总为主键查找 / Feedback store: aggregates updated on write
+
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+
+import models.feedback_model  # noqa: F401
+from feedback import store
+
+
+async def _run():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    rows = [("阅读", 5, 0.1), ("阅读", 3, 0.9), ("跑步", 4, None)]
+    for task, rating, difficulty in rows:
+        async with maker() as session:
+            await store.add_feedback(session, {"user_id": "kid1", "task_name": task,
+                                               "rating": rating, "difficulty": difficulty})
+
+    async with maker() as session:
+        total = await store.get_summary(session, "kid1")
+        reading = await store.get_summary(session, "kid1", "阅读")
+        missing = await store.get_summary(session, "kid2")
+        listed = await store.list_feedback(session, "kid1", limit=2)
+    await engine.dispose()
+    return total, reading, missing, listed
+
+
+def test_aggregates_follow_writes():
+    total, reading, missing, listed = asyncio.run(_run())
+    assert total["count"] == 3 and total["mean_rating"] == 4.0
+    assert total["difficulty_histogram"] == [1, 0, 0, 0, 1]
+    assert reading["count"] == 2 and reading["mean_rating"] == 4.0
+    assert missing is None
+    assert len(listed) == 2
+
+
+def test_reserved_total_task_name_is_rejected():
+    import pytest
+
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+        async with maker() as session:
+            await store.add_feedback(session, {"user_id": "kid1", "task_name": "阅读", "rating": 4})
+            with pytest.raises(ValueError):
+                await store.add_feedback(session, {"user_id": "kid1", "task_name": "*", "rating": 1})
+            with pytest.raises(ValueError):
+                await store.get_summary(session, "kid1", "*")    # 总计不按任务名暴露 / the total is not a task
+            total = await store.get_summary(session, "kid1")
+        await engine.dispose()
+        return total
+
+    assert asyncio.run(run())["count"] == 1
@@ -0,0 +1,137 @@
+# tests/test_jobs.py
+# 后台任务队列：优先级、去重、失败、持久化恢复 / Job queue: priority, dedup, failures, durable recovery
+
+import asyncio
+
+import pytest
+from pydantic import BaseModel, ValidationError
+
+import services.jobs
+from services.jobs import Job, JobQueue, JobStore, register_job
+
+order = []
+
+
+@register_job("test_echo")
+async def _echo(payload):
+    await asyncio.sleep(0.01)
+    order.append(payload["n"])
+    return {"n": payload["n"]}
+
+
+class _Typed(BaseModel):
+    n: int
+
+
+@register_job("test_typed", _Typed)
+async def _typed(payload):
+    return payload
+
+
+@register_job("test_fail")
+async def _fail(payload):
+    raise ValueError("boom")
+
+
+async def _wait(job, timeout=2.0):
+    while not job.terminal:
+        await job.wait_change(timeout)
+    return job
+
+
+def test_priority_dedup_and_failure():
+    order.clear()
+    q = JobQueue(workers=1)
+
+    async def run():
+        first, _ = q.submit("test_echo", {"n": 0})
+        await asyncio.sleep(0)                        # worker 先拿走第一个 / the worker picks up the first job
+        low, _ = q.submit("test_echo", {"n": 1}, priority=0)
+        high, _ = q.submit("test_echo", {"n": 2}, priority=5)
+        same, deduped = q.submit("test_echo", {"n": 2}, priority=5)
+        failed, _ = q.submit("test_fail", {})
+        for job in (first, low, high, failed):
+            await _wait(job)
+        await q.stop()
+        return high, same, deduped, failed
+
+    high, same, deduped, failed = asyncio.run(run())
+    assert order == [0, 2, 1]
+    assert deduped and same is high and high.result == {"n": 2}
+    assert failed.status == "failed" and failed.error == "boom"
+    assert q.stats()["deduplicated"] == 1
+
+
+def test_durable_queue_recovers_unfinished_jobs(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    order.clear()
+
+    async def crash():
+        q = JobQueue(workers=1, store=JobStore(path))
+        q.workers = 0                                 # 不启动 worker，模拟进程在执行前退出 / no workers: "crash" before running
+        job, _ = q.submit("test_echo", {"n": 7})
+        return job.id
+
+    job_id = asyncio.run(crash())
+
+    async def restart():
+        q = JobQueue(workers=1, store=JobStore(path))
+        q.submit("test_echo", {"n": 8})               # 启动 worker，同时恢复旧任务 / starts workers and recovers
+        job = q.get(job_id)
+        await _wait(job)
+        await q.stop()
+        return job, q.stats()["recovered"]
+
+    job, recovered = asyncio.run(restart())
+    assert job.status == "done" and job.result == {"n": 7} and recovered == 1
+    assert JobStore(path).load(job_id).result == {"n": 7}
+
+
+def test_start_recovers_without_a_submit(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    store = JobStore(path)
+    store.save(Job(id="left-over", kind="test_echo", payload={"n": 9}, priority=0, hash="h", status="running"))
+
+    async def restart():
+        q = JobQueue(workers=1, store=JobStore(path))
+        q.start()                                     # main.py 启动钩子 / the main.py startup hook
+        job = q.get("left-over")
+        await _wait(job)
+        await q.stop()
+        return job
+
+    assert asyncio.run(restart()).result == {"n": 9}
+
+
+def test_foreign_job_is_registered_and_re_polled(tmp_path, monkeypatch):
+    monkeypatch.setattr(services.jobs, "POLL_SECONDS", 0.01)
+    path = str(tmp_path / "jobs.sqlite")
+    owner, other = JobStore(path), JobQueue(workers=0, store=JobStore(path))
+    job = Job(id="elsewhere", kind="test_echo", payload={"n": 1}, priority=0, hash="h2", status="running")
+    owner.save(job)
+
+    async def run():
+        seen = other.get("elsewhere")
+        assert other.get("elsewhere") is seen         # 只加载一次 / registered, not reloaded each time
+        await other.wait_change(seen, 0.05)           # 无变化：超时返回 / no change: times out
+        assert seen.status == "running"
+        job.status, job.result = "done", {"n": 1}
+        owner.save(job)                               # 另一个进程完成了任务 / another process finishes it
+        await other.wait_change(seen, 2.0)
+        return seen
+
+    seen = asyncio.run(run())
+    assert seen.terminal and seen.result == {"n": 1}
+
+
+def test_invalid_payload_is_rejected_at_submit():
+    q = JobQueue(workers=0)
+
+    async def run():
+        with pytest.raises(ValidationError):
+            q.submit("test_typed", {"n": "not a number"})
+        job, _ = q.submit("test_typed", {"n": 3})
+        return job
+
+    assert asyncio.run(run()).status == "queued"
+    assert q.stats()["submitted"] == 1
@@ -0,0 +1,23 @@
+# tests/test_json_stream.py
+# 增量 JSON 数组解析 / Incremental JSON-array parser
+
+from utils.json_stream import IncrementalArrayParser
+
+
+def test_cards_emitted_as_each_object_closes():
+    text = ('```json\n[{"title": "画画 {水彩}", "duration": 30, "tag": "art", "reason": "say \\"hi\\" ]"},'
+            ' {"title": "跑步", "duration": 20, "tag": "sport", "meta": {"a": [1, 2]}}]\n```')
+    parser = IncrementalArrayParser()
+    seen = []
+    for i in range(0, len(text), 3):               # 3 个字符一段模拟 token 流 / 3-char chunks
+        for obj in parser.feed(text[i:i + 3]):
+            seen.append((i, obj["title"]))
+    assert [t for _, t in seen] == ["画画 {水彩}", "跑步"]
+    assert seen[0][0] < text.index("跑步")          # 第一张卡在第二个对象之前产出 / first card before the second
+    assert parser.finished and parser.skipped == 0
+
+
+def test_broken_object_is_skipped():
+    parser = IncrementalArrayParser()
+    assert parser.feed('[{"a": 1,}, {"b": 2}]') == [{"b": 2}]
+    assert parser.skipped == 1
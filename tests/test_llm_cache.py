@@ -0,0 +1,94 @@
+# tests/test_llm_cache.py
+# LLM 响应缓存：命中、LRU 淘汰、过期后台刷新 / LLM cache: hits, LRU eviction, stale-while-revalidate
+
+import asyncio
+import time
+
+from utils.llm_cache import LLMCache, cache_key, cached_llm
+
+
+def test_normalized_prompt_hits_and_lru_eviction(tmp_path):
+    store = LLMCache(str(tmp_path / "c.sqlite"), max_entries=2)
+    calls = []
+
+    @cached_llm("openai", "m", {"t": 0.5}, store=store)
+    def suggest(prompt):
+        calls.append(prompt)
+        return [{"title": prompt}]
+
+    assert suggest("draw  a cat ") == suggest("draw a cat") == [{"title": "draw  a cat "}]
+    assert len(calls) == 1
+    assert cache_key("openai", "m", "x", {"t": 0.5}) != cache_key("openai", "m", "x", {"t": 0.6})
+
+    suggest("b")
+    suggest("draw a cat")     # 刷新访问时间 / touch
+    suggest("c")              # 淘汰最久未用的 "b" / evicts "b"
+    suggest("b")
+    assert calls == ["draw  a cat ", "b", "c", "b"]
+    stats = store.stats()
+    assert stats["entries"] == 2 and stats["evictions"] >= 1 and stats["hits"] == 2
+
+
+def test_stale_entry_served_while_refreshing(tmp_path):
+    store = LLMCache(str(tmp_path / "c.sqlite"), ttl=0.05, swr=60)
+    answers = iter(["old", "new"])
+
+    @cached_llm("cohere", "m", store=store)
+    async def reason(prompt):
+        return next(answers)
+
+    async def run():
+        first = await reason("why")
+        time.sleep(0.1)
+        stale = await reason("why")        # 过期但在窗口内：先给旧值 / stale: old value returned
+        await asyncio.sleep(0.01)          # 后台刷新完成 / background refresh lands
+        return first, stale, await reason("why")
+
+    assert asyncio.run(run()) == ("old", "old", "new")
+    assert store.stats()["stale_hits"] == 1 and store.stats()["refreshes"] == 1
+
+
+def test_byte_cap_evicts_oldest_and_touches_are_batched(tmp_path):
+    store = LLMCache(str(tmp_path / "c.sqlite"), max_bytes=30)
+    for k in ("a", "b", "c"):
+        store.set(k, "x" * 8)                 # 每条 10 字节（含引号）/ 10 bytes each, quotes included
+        time.sleep(0.01)
+    assert store.get("a")[0] == "x" * 8       # 只记在内存 / recorded in memory only
+    accessed = store._db().execute("SELECT key FROM llm_cache ORDER BY accessed").fetchall()
+    assert [k for (k,) in accessed] == ["a", "b", "c"]
+
+    store.set("d", "y" * 15)                  # 超出上限：淘汰前先写回访问时间 / flushed before evicting
+    assert store.get("b") is None and store.get("c") is None   # 淘汰到 27 字节（90%）/ down to 27 bytes (90%)
+    assert store.get("a") is not None
+    stats = store.stats()
+    assert stats["evictions"] == 2 and (stats["entries"], stats["bytes"]) == (2, 27)
+    assert (store._count, store._bytes) == (2, 27)
+
+
+def test_eviction_drains_to_the_low_water_mark(tmp_path):
+    store = LLMCache(str(tmp_path / "c.sqlite"), max_entries=10)
+    for i in range(11):
+        store.set(str(i), i)
+    assert store.stats()["entries"] == 9 and store.metrics["evictions"] == 2
+    store.set("x", 0)                         # 回到上限以内：不再逐条淘汰 / back under the cap: no per-insert eviction
+    assert store.stats()["entries"] == 10 and store.metrics["evictions"] == 2
+
+
+def test_async_wrapper_reads_in_a_thread(tmp_path, monkeypatch):
+    import threading
+
+    store = LLMCache(str(tmp_path / "c.sqlite"))
+    loop_thread, seen = threading.get_ident(), []
+    real_get = store.get
+    monkeypatch.setattr(store, "get", lambda key: seen.append(threading.get_ident()) or real_get(key))
+
+    @cached_llm("openai", "m", store=store)
+    async def suggest(prompt):
+        return [prompt]
+
+    async def run():
+        await suggest("a")
+        return await suggest("a")
+
+    assert asyncio.run(run()) == ["a"]
+    assert seen and loop_thread not in seen
@@ -0,0 +1,122 @@
+# tests/test_llm_dispatch.py
+# 对冲调度与熔断 / Hedged dispatch and circuit breakers
+
+import asyncio
+
+import pytest
+
+from utils.llm_dispatch import CircuitBreaker, HedgedDispatcher, NoProviderAvailable, stream_with_failover
+from utils.llm_limiter import ProviderBusy
+
+
+def test_hedge_to_faster_backup_and_cancel_loser():
+    d = HedgedDispatcher()
+    d._health("slow").latencies.extend([0.01] * 30)     # p95 ≈ 10 ms -> 按下限 MIN_DELAY 对冲
+    cancelled = []
+
+    async def call(provider):
+        if provider == "slow":
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(provider)
+                raise
+        await asyncio.sleep(0.01)
+        return [{"title": provider}]
+
+    async def run():
+        result = await d.dispatch(["slow", "fast"], call)
+        await asyncio.sleep(0)                           # 让取消生效 / let the cancellation land
+        return result
+
+    provider, data = asyncio.run(run())
+    assert provider == "fast" and data == [{"title": "fast"}]
+    assert cancelled == ["slow"]
+    assert d.stats()["hedges"] == 1 and d.stats()["backup_wins"] == 1
+
+
+def test_invalid_result_fails_over_and_breaker_trips():
+    d = HedgedDispatcher()
+
+    async def call(provider):
+        return [] if provider == "broken" else ["ok"]
+
+    for _ in range(10):
+        assert asyncio.run(d.dispatch(["broken", "good"], call, hedge=False)) == ("good", ["ok"])
+    assert d.health["broken"].breaker.state == "open"
+
+    async def never(provider):
+        raise RuntimeError("down")
+    with pytest.raises(NoProviderAvailable):
+        asyncio.run(d.dispatch(["broken"], never))
+
+
+def test_breaker_half_open_probe():
+    b = CircuitBreaker(error_rate=0.5, min_calls=2, window=60, cooldown=0)
+    b.record(False)
+    b.record(False)
+    assert b.state == "open"
+    assert b.allow() and not b.allow()      # 只放行一次试探 / a single probe
+    b.record(True)
+    assert b.state == "closed" and b.allow()
+
+
+def tripped_dispatcher():
+    d = HedgedDispatcher()
+    b = d._health("a").breaker
+    b.min_calls, b.cooldown = 1, 0
+    b.record(False)
+    assert b.state == "open"
+    return d, b
+
+
+async def ok(provider):
+    return "fine"
+
+
+def test_busy_probe_gives_the_slot_back():
+    d, b = tripped_dispatcher()
+
+    async def busy(provider):
+        raise ProviderBusy("queue full")
+
+    with pytest.raises(NoProviderAvailable):
+        asyncio.run(d.dispatch(["a"], busy))
+    assert b.state == "open" and not b.probing      # 名额已交还 / slot returned
+    assert asyncio.run(d.dispatch(["a"], ok)) == ("a", "fine")
+    assert b.state == "closed"
+
+
+def test_cancelled_probe_gives_the_slot_back():
+    d, b = tripped_dispatcher()
+
+    async def slow(provider):
+        await asyncio.sleep(10)
+
+    async def run():
+        task = asyncio.ensure_future(d.dispatch(["a"], slow))
+        await asyncio.sleep(0.01)
+        assert b.probing
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    assert not b.probing
+    assert asyncio.run(d.dispatch(["a"], ok)) == ("a", "fine")
+
+
+def test_stream_busy_probe_gives_the_slot_back(monkeypatch):
+    d, b = tripped_dispatcher()
+
+    async def busy_stream():
+        raise ProviderBusy("queue full")
+        yield  # pragma: no cover
+
+    async def run():
+        async for _ in stream_with_failover("a", {"a": busy_stream}, lambda p: True):
+            pass
+
+    monkeypatch.setattr("utils.llm_dispatch.dispatcher", d)
+    with pytest.raises(NoProviderAvailable):
+        asyncio.run(run())
+    assert not b.probing and b.allow()
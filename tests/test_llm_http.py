@@ -0,0 +1,60 @@
+# tests/test_llm_http.py
+# LLM 连接池：重试与连接复用 / LLM pools: retries and connection reuse
+
+import asyncio
+import dataclasses
+
+import httpx
+
+from utils import llm_http
+
+
+def test_retries_then_succeeds_on_shared_client(monkeypatch):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if len(calls) == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"text": "ok"})
+
+    cfg = dataclasses.replace(llm_http.PROVIDERS["cohere"], backoff_base=0.001, retries=2)
+    monkeypatch.setitem(llm_http.PROVIDERS, "cohere", cfg)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        llm_http._clients["cohere"] = httpx.AsyncClient(base_url=cfg.base_url,
+                                                        transport=httpx.MockTransport(handler))
+        llm_http._client_loops["cohere"] = loop
+        first = await llm_http.post_json("cohere", "/chat", {"message": "hi"})
+        client = llm_http.get_client("cohere")
+        second = await llm_http.post_json("cohere", "/chat", {"message": "hi"})
+        same = client is llm_http.get_client("cohere")
+        await llm_http.aclose_all()
+        return first, second, same
+
+    first, second, same = asyncio.run(run())
+    assert first == second == {"text": "ok"}
+    assert calls == ["/v1/chat"] * 3          # 503 一次 + 两次成功 / one 503 then two successes
+    assert same
+
+
+def test_client_errors_are_not_retried(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        return httpx.Response(400, json={"error": "bad"})
+
+    async def run():
+        llm_http._clients["openai"] = httpx.AsyncClient(base_url="http://mock/v1", transport=httpx.MockTransport(handler))
+        llm_http._client_loops["openai"] = asyncio.get_running_loop()
+        try:
+            await llm_http.post_json("openai", "/chat/completions", {})
+        except httpx.HTTPStatusError as e:
+            return e.response.status_code
+        finally:
+            await llm_http.aclose_all()
+
+    assert asyncio.run(run()) == 400
+    assert calls == [1]
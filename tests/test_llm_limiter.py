@@ -0,0 +1,72 @@
+# tests/test_llm_limiter.py
+# 服务商限流：在途上限、有界队列、令牌桶与截止时间 / Provider limiter: in-flight cap, bounded queue, buckets, deadlines
+
+import asyncio
+import time
+
+import pytest
+
+from utils.llm_limiter import ProviderBusy, ProviderLimiter, request_tokens
+
+
+def test_in_flight_cap_queues_fifo():
+    lim = ProviderLimiter("p", max_in_flight=2)
+    active, peak, order = 0, 0, []
+
+    async def call(i):
+        nonlocal active, peak
+        async with lim.slot():
+            active += 1
+            peak = max(peak, active)
+            order.append(i)
+            await asyncio.sleep(0.02)
+            active -= 1
+
+    async def run():
+        await asyncio.gather(*(call(i) for i in range(6)))
+
+    asyncio.run(run())
+    assert peak == 2 and order == list(range(6))
+    stats = lim.stats()
+    assert stats["immediate"] == 2 and stats["queued"] == 4 and stats["in_flight"] == 0
+    assert stats["max_queue_depth"] == 4
+
+
+def test_full_queue_is_rejected_at_once():
+    lim = ProviderLimiter("p", max_in_flight=1, max_queue=1)
+
+    async def run():
+        await lim.acquire()
+        waiter = asyncio.ensure_future(lim.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(ProviderBusy):
+            await lim.acquire()
+        lim.release()
+        await waiter
+        lim.release()
+
+    asyncio.run(run())
+    assert lim.stats()["rejected_full"] == 1 and lim.in_flight == 0
+
+
+def test_token_bucket_and_deadline():
+    lim = ProviderLimiter("p", tpm=600, max_wait=2.0)     # 10 tokens/s
+
+    async def run():
+        await lim.acquire(600)                            # 用光令牌 / drain the bucket
+        lim.release()
+        with pytest.raises(ProviderBusy):                 # 需 10 s > 2 s -> 立即拒绝 / rejected up front
+            await lim.acquire(100)
+        t0 = time.monotonic()
+        await lim.acquire(5)                              # 约 0.5 s 后放行 / granted after ~0.5 s
+        lim.release()
+        return time.monotonic() - t0
+
+    waited = asyncio.run(run())
+    assert 0.3 < waited < 1.5
+    assert lim.stats()["rejected_deadline"] == 1
+
+
+def test_request_tokens_counts_output_cap():
+    assert request_tokens({"messages": [{"role": "user", "content": "hi"}], "max_tokens": 100}) > 100
+    assert request_tokens({"inputs": "hi", "parameters": {"max_new_tokens": 50}}) == 51
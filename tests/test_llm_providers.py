@@ -0,0 +1,28 @@
+# tests/test_llm_providers.py
+# 服务商插件注册表：登记不导入，首次使用才加载 / Provider registry: register without importing, load on first use
+
+import pytest
+
+from utils import llm_providers
+
+
+def test_builtin_providers_are_registered_not_loaded():
+    assert llm_providers.providers("suggest") == ["openai", "cohere", "hf"]
+    assert "openai" not in llm_providers.loaded()
+
+
+def test_plugin_loads_on_first_use(monkeypatch):
+    monkeypatch.setattr(llm_providers, "_plugins", dict(llm_providers._plugins))
+    monkeypatch.setattr(llm_providers, "_loaded", {})
+    llm_providers.register_provider("echo", "utils.json_stream", suggest="IncrementalArrayParser")
+
+    assert "echo" in llm_providers.providers("suggest")
+    assert "echo" not in llm_providers.providers("reply")
+    assert llm_providers.loaded() == []
+    assert llm_providers.get("echo", "suggest").__name__ == "IncrementalArrayParser"
+    assert llm_providers.loaded() == ["echo"]
+
+    with pytest.raises(KeyError):
+        llm_providers.get("echo", "reply")
+    with pytest.raises(ValueError):
+        llm_providers.register_provider("bad", "utils.json_stream", translate="x")
@@ -0,0 +1,54 @@
+# tests/test_mock_llm_server.py
+# mock 服务商与真实客户端的协议兼容 / The mock providers speak the wire formats our clients parse
+
+import asyncio
+import dataclasses
+
+import httpx
+
+from benchmarks import mock_llm_server
+from utils import llm_http
+
+
+def _use_mock(monkeypatch, **cfg):
+    monkeypatch.setattr(mock_llm_server, "config", mock_llm_server.MockConfig(
+        latency_median=0.001, latency_sigma=0.0, token_delay=0.0, **cfg))
+    for name, base in (("openai", "http://mock/v1"), ("cohere", "http://mock/v1"), ("hf", "http://mock")):
+        monkeypatch.setitem(llm_http.PROVIDERS, name, dataclasses.replace(
+            llm_http.PROVIDERS[name], base_url=base, retries=0))
+        monkeypatch.setitem(llm_http.TRANSPORTS, name, httpx.ASGITransport(app=mock_llm_server.app))
+
+
+def test_json_and_streaming_formats(monkeypatch):
+    _use_mock(monkeypatch)
+
+    async def run():
+        out = {}
+        for name in ("openai", "cohere", "hf"):
+            path = {"openai": "/chat/completions", "cohere": "/chat", "hf": "/models/m"}[name]
+            payload = {"messages": [{"role": "user", "content": "hi"}], "message": "hi", "inputs": "hi", "stream": True}
+            out[name] = "".join([c async for c in llm_http.stream_text(name, path, payload)])
+        body = await llm_http.post_json("openai", "/chat/completions",
+                                        {"messages": [{"role": "user", "content": "Return a JSON array"}]})
+        await llm_http.aclose_all()
+        return out, body
+
+    streamed, body = asyncio.run(run())
+    expected = mock_llm_server.answer_for("hi", mock_llm_server.config)
+    assert streamed["openai"] == expected and streamed["hf"] == expected
+    assert streamed["cohere"] == mock_llm_server.answer_for("\nhi", mock_llm_server.config)
+    assert body["choices"][0]["message"]["content"].startswith("[{")
+
+
+def test_error_injection(monkeypatch):
+    _use_mock(monkeypatch, error_rate=1.0, error_status=503)
+
+    async def run():
+        try:
+            await llm_http.post_json("cohere", "/chat", {"message": "hi"})
+        except httpx.HTTPStatusError as e:
+            return e.response.status_code
+        finally:
+            await llm_http.aclose_all()
+
+    assert asyncio.run(run()) == 503
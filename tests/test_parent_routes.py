@@ -0,0 +1,75 @@
+# tests/test_parent_routes.py
+# 家长接口的身份与绑定校验：身份取自登录用户，未绑定的家长一律 403
+# Parent routes take identity from the signed-in user and refuse unlinked parents
+
+import importlib.util
+import json
+import types
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import parent.permissions
+from services.auth import current_active_user, current_websocket_user
+from services.family_index import ParentChildIndex
+
+# routers 包会导入全部路由，这里只加载家长路由 / load just this router, not the whole package
+_spec = importlib.util.spec_from_file_location("parent_routes", "routers/parent.py")
+parent_routes = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(parent_routes)
+
+
+@pytest.fixture
+def login():
+    return {"id": "p1"}                                     # 当前登录用户，测试里可改 / the signed-in user
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, login):
+    path = tmp_path / "map.json"
+    path.write_text(json.dumps({"p1": ["k1"]}))
+    index = ParentChildIndex(str(path))
+    monkeypatch.setattr(parent.permissions, "family", index)
+    monkeypatch.setattr(parent_routes, "family", index)
+    monkeypatch.setattr(parent_routes.plans, "get", lambda child_id: {"child_id": child_id})
+    monkeypatch.setattr(parent_routes.suggestion_store, "entries", lambda child_id, after=0: [])
+    app = FastAPI()
+    app.include_router(parent_routes.router)
+    user = lambda: types.SimpleNamespace(id=login["id"])
+    app.dependency_overrides[current_active_user] = user
+    app.dependency_overrides[current_websocket_user] = user
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("path", ["/parent/k1/view_child_plan", "/parent/k1/suggestions",
+                                  "/parent/k1/suggestions/stream"])
+def test_unlinked_parent_gets_403(client, login, path):
+    login["id"] = "p2"
+    assert client.get(path).status_code == 403
+    # 请求里的 parent_id 不再被采信 / a parent_id in the request is no longer trusted
+    assert client.get(path, params={"parent_id": "p1"}).status_code == 403
+
+
+def test_linked_parent_and_the_child_can_read(client, login):
+    assert client.get("/parent/k1/view_child_plan").json() == {"child_id": "k1"}
+    assert client.get("/parent/k1/suggestions").json() == []
+    login["id"] = "k1"                                       # 孩子本人 / the child themselves
+    assert client.get("/parent/k1/suggestions").json() == []
+
+
+def test_bind_and_suggest_use_the_signed_in_parent(client, login):
+    login["id"] = "p2"
+    assert client.post("/parent/bind", json={"parent_id": "p1", "child_id": "k2"}).status_code == 403
+    assert client.post("/parent/bind", json={"child_id": "k1"}).status_code == 200
+    assert client.get("/parent/k1/suggestions").status_code == 200
+    assert client.get("/parent/p1/dashboard").status_code == 403
+
+
+def test_unlinked_parent_refused_on_websocket(client, login):
+    login["id"] = "p2"
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/parent/k1/suggestions/ws"):
+            pass
+    assert exc.value.code == 1008
@@ -0,0 +1,35 @@
+# tests/test_prompt_builder.py
+# 提示词模板：静态前缀、按预算裁剪 / Prompt templates: static prefix and token budget
+
+from models.user_profile import UserProfile
+from utils.prompt_builder import (REASON_TEMPLATE, PromptTemplate, build_prompt, estimate_tokens,
+                                  fit_profile)
+
+
+def test_template_static_prefix_is_stable():
+    t = PromptTemplate("Fixed instructions.", "Hello {name}, you like {thing}.")
+    assert t.fields == ["name", "thing"]
+    a, b = t.render(name="A", thing="chess"), t.render(name="B", thing="art")
+    assert a.startswith("Fixed instructions.\n\n") and b.startswith("Fixed instructions.\n\n")
+    assert a.endswith("Hello A, you like chess.")
+
+
+def test_budget_trims_lowest_value_fields_first():
+    fields = [("Interests", "美术, 编程"), ("Available time", "Mon 19:00-20:00"),
+              ("Name", "Alice"), ("Survey", "I really like drawing comics. " * 50)]
+    full = fit_profile(fields, budget=10_000)
+    assert full.count("\n") == 3
+
+    trimmed = fit_profile(fields, budget=40)
+    assert estimate_tokens(trimmed) <= 44
+    assert trimmed.startswith("Interests: 美术, 编程\nAvailable time: Mon 19:00-20:00\nName: Alice")
+    assert trimmed.endswith("…")                                   # 调查原文被截短 / survey shortened
+
+    tiny = fit_profile(fields, budget=12)
+    assert tiny.startswith("Interests: 美术, 编程") and "Survey" not in tiny
+
+
+def test_build_prompt_works_with_current_profile():
+    prompt = build_prompt(UserProfile(user_id="u1", name="Bob", survey="I like drawing comics"))
+    assert prompt.startswith(REASON_TEMPLATE.static)
+    assert "Name: Bob" in prompt and "Survey: I like drawing comics" in prompt
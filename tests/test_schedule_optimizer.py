@@ -0,0 +1,110 @@
+# tests/test_schedule_optimizer.py
+# 排程器单元测试 / Scheduler unit tests
+
+from datetime import date, datetime
+
+from models.user_profile import Availability, TimeBlock, WeeklyTemplate
+from utils.schedule_optimizer import build_plan, generate_schedule
+
+MONDAY = date(2024, 1, 1)
+
+
+def _availability(blocks):
+    return Availability(template=WeeklyTemplate(weekly={wd: blocks for wd in ["Mon", "Tue", "Wed"]}))
+
+
+def test_tasks_fit_inside_availability_and_around_events():
+    avail = _availability([TimeBlock(start="16:00", end="18:00")])
+    events = [{"start": "2024-01-01T16:30:00", "end": "2024-01-01T17:00:00"}]
+    tasks = [{"name": "A", "duration": 30}, {"name": "B", "duration": 60}]
+    out = generate_schedule(tasks, availability=avail, events=events, start_day=MONDAY, days=1)
+    slots = {x["name"]: (x["start_time"], x["end_time"]) for x in out}
+    assert slots["B"] == ("17:00", "18:00")
+    assert slots["A"] == ("16:00", "16:30")
+
+
+def test_max_minutes_per_day_spills_to_next_day():
+    avail = _availability([TimeBlock(start="09:00", end="12:00")])
+    tasks = [{"name": f"T{i}", "duration": 60} for i in range(3)]
+    out = generate_schedule(tasks, availability=avail, start_day=MONDAY, days=3, max_minutes_per_day=120)
+    per_day = {}
+    for x in out:
+        per_day[x["date"]] = per_day.get(x["date"], 0) + x["duration"]
+    assert per_day == {"2024-01-01": 120, "2024-01-02": 60}
+
+
+def test_priority_wins_scarce_time_and_overflow_is_reported():
+    avail = _availability([TimeBlock(start="09:00", end="10:00")])
+    tasks = [{"name": "low", "duration": 60, "priority": 0}, {"name": "high", "duration": 60, "priority": 5}]
+    out = generate_schedule(tasks, availability=avail, start_day=MONDAY, days=1)
+    by_name = {x["name"]: x for x in out}
+    assert by_name["high"]["start_time"] == "09:00"
+    assert by_name["low"]["date"] is None
+
+
+def test_sport_prefers_afternoon_slot():
+    avail = _availability([TimeBlock(start="08:00", end="09:00"), TimeBlock(start="16:00", end="17:00")])
+    out = generate_schedule([{"name": "run", "duration": 60, "tag": "sport"}],
+                            availability=avail, start_day=MONDAY, days=1)
+    assert out[0]["start_time"] == "16:00"
+
+
+def test_all_day_event_blocks_the_day():
+    avail = _availability([TimeBlock(start="09:00", end="10:00")])
+    events = [{"start": datetime(2024, 1, 1), "end": datetime(2024, 1, 2), "allDay": True}]
+    out = generate_schedule([{"name": "A", "duration": 30}], availability=avail, events=events,
+                            start_day=MONDAY, days=2)
+    assert out[0]["date"] == "2024-01-02"
+
+
+def test_moving_an_event_repairs_only_the_touched_day():
+    avail = _availability([TimeBlock(start="16:00", end="18:00")])
+    tasks = [{"name": "mon", "duration": 60}, {"name": "x", "duration": 60},
+             {"name": "y", "duration": 60}, {"name": "z", "duration": 60}]
+    plan = build_plan(tasks, availability=avail, start_day=MONDAY, days=3, max_minutes_per_day=120)
+    before = {x["name"]: (x["date"], x["start_time"]) for x in plan.to_list()}
+
+    # 把一个事件拖到周二 16:00 / drag an event onto Tuesday 16:00
+    tuesday_task = next(n for n, (d, t) in before.items() if d == "2024-01-02" and t == "16:00")
+    report = plan.upsert_event("ev1", {"start": "2024-01-02T16:00:00", "end": "2024-01-02T17:00:00"})
+
+    assert report["affected_days"] == ["2024-01-02"]
+    assert [m["name"] for m in report["moved"]] == [tuesday_task]
+    after = {x["name"]: (x["date"], x["start_time"]) for x in plan.to_list()}
+    for name, slot in before.items():
+        if name != tuesday_task:
+            assert after[name] == slot
+    assert after[tuesday_task] != ("2024-01-02", "16:00")
+
+
+def test_deleting_an_event_places_previously_unplaced_task():
+    avail = _availability([TimeBlock(start="09:00", end="10:00")])
+    events = [{"id": "busy", "start": "2024-01-01T09:00:00", "end": "2024-01-01T10:00:00"}]
+    plan = build_plan([{"name": "A", "duration": 60}], availability=avail, events=events,
+                      start_day=MONDAY, days=1)
+    assert plan.to_list()[0]["date"] is None
+
+    report = plan.remove_event("busy")
+    assert report["moved"] == [{"name": "A", "from": None,
+                                "to": {"date": "2024-01-01", "start_time": "09:00", "end_time": "10:00"}}]
+
+
+def test_event_routes_repair_the_stored_plan(monkeypatch):
+    import asyncio
+
+    from services import schedule_plans
+
+    avail = _availability([TimeBlock(start="09:00", end="10:00")])
+    monkeypatch.setattr(schedule_plans, "plans", {"u1": build_plan([{"name": "A", "duration": 60}],
+                                                                   availability=avail, start_day=MONDAY, days=1)})
+    event = {"id": "ev", "start": "2024-01-01T09:00:00", "end": "2024-01-01T10:00:00"}
+
+    async def run():
+        created = await schedule_plans.repair_for_event("u1", "ev", event)     # 新建事件挤走任务 / create
+        deleted = await schedule_plans.repair_for_event("u1", "ev", None)      # 删除后放回 / delete
+        missing = await schedule_plans.repair_for_event("nobody", "ev", event)
+        return created, deleted, missing
+
+    created, deleted, missing = asyncio.run(run())
+    assert created["moved"][0]["to"] is None and deleted["moved"][0]["from"] is None
+    assert missing is None
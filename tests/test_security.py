@@ -0,0 +1,101 @@
+# tests/test_security.py
+# token 声明缓存与 bcrypt 线程池 / Verified-claims cache and the bcrypt thread pool
+
+import asyncio
+import time
+
+from services import security
+
+
+def test_claims_cache_skips_verification_until_exp(monkeypatch):
+    security.claims_cache.clear()
+    token = security.create_access_token("user-1")
+    assert security.decode_token(token) == "user-1"
+
+    calls = []
+    real_decode = security.jwt.decode
+    monkeypatch.setattr(security.jwt, "decode", lambda *a, **k: calls.append(1) or real_decode(*a, **k))
+    assert security.decode_token(token) == "user-1" and calls == []      # 命中缓存 / cache hit
+
+    claims, _ = security.claims_cache._items[token]
+    security.claims_cache._items[token] = (claims, time.time() - 1)      # 到 exp / past exp
+    security.decode_token(token)
+    assert calls == [1]
+    assert security.decode_token("not-a-token") is None
+
+
+def test_claims_cache_is_bounded():
+    cache = security.ClaimsCache(max_size=2)
+    for i in range(3):
+        cache.put(f"t{i}", {"sub": str(i), "exp": time.time() + 60})
+    assert cache.get("t0") is None and cache.get("t2")["sub"] == "2"
+    cache.put("no-exp", {"sub": "x"})
+    assert cache.get("no-exp") is None
+
+
+def test_verify_runs_off_the_event_loop(monkeypatch):
+    def slow_verify(raw, hashed):
+        time.sleep(0.1)                                   # 模拟 bcrypt / stands in for bcrypt
+        return raw == hashed
+
+    monkeypatch.setattr(security, "verify_password", slow_verify)
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        t = asyncio.ensure_future(ticker())
+        ok = await asyncio.gather(*(security.verify_password_async("pw", "pw") for _ in range(2)))
+        t.cancel()
+        return ok, ticks
+
+    ok, ticks = asyncio.run(run())
+    assert ok == [True, True] and ticks >= 5              # 循环在 bcrypt 期间仍在跑 / loop kept ticking
+
+
+def test_login_checks_run_in_the_pool():
+    import threading
+    from types import SimpleNamespace
+
+    from fastapi_users import BaseUserManager
+    from services.auth_real import PooledPasswordMixin
+
+    threads, updates = [], []
+
+    class Helper:
+        def hash(self, password):
+            threads.append(threading.get_ident())
+            return "h:" + password
+
+        def verify_and_update(self, password, hashed):
+            threads.append(threading.get_ident())
+            return hashed == "old:" + password, "h:" + password
+
+    user = SimpleNamespace(email="kid@example.com", hashed_password="old:pw")
+
+    class UserDB:
+        async def get_by_email(self, email):
+            return user if email == user.email else None
+
+        async def update(self, u, changes):
+            updates.append(changes)
+
+    class Manager(PooledPasswordMixin, BaseUserManager):
+        pass
+
+    manager = Manager(UserDB(), Helper())
+
+    async def run():
+        login = lambda email, pw: manager.authenticate(SimpleNamespace(username=email, password=pw))
+        return await login("kid@example.com", "pw"), await login("kid@example.com", "bad"), \
+            await login("nobody@example.com", "pw")
+
+    ok, wrong, unknown = asyncio.run(run())
+    assert ok is user and wrong is None and unknown is None
+    assert updates == [{"hashed_password": "h:pw"}]                      # 哈希升级 / hash upgraded
+    assert len(threads) == 3 and threading.get_ident() not in threads    # 全在线程池 / all in the pool
@@ -0,0 +1,66 @@
+# tests/test_single_flight.py
+# 相同请求合并：并发共享一次调用、错误传播、超时 / Single-flight: shared call, errors, timeouts
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_threads_share_one_call_and_errors_propagate():
+    group = SingleFlight(timeout=5)
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.05)
+        return "result"
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: group.do("k", slow), range(8)))
+    assert results == ["result"] * 8 and len(calls) == 1
+
+    def boom():
+        time.sleep(0.05)
+        raise ValueError("upstream down")
+
+    errors = []
+    def call():
+        try:
+            group.do("bad", boom)
+        except ValueError as e:
+            errors.append(str(e))
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == ["upstream down"] * 4
+    assert group.stats()["in_flight"] == 0
+
+
+def test_async_callers_share_one_task_and_time_out():
+    group = SingleFlight(timeout=5)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"title": "x"}
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    async def run():
+        results = await asyncio.gather(*(group.do_async("k", fetch) for _ in range(20)))
+        with pytest.raises(TimeoutError):
+            await group.do_async("slow", hang, timeout=0.05)
+        return results
+
+    results = asyncio.run(run())
+    assert len(calls) == 1 and all(r == {"title": "x"} for r in results)
+    assert group.stats()["coalesced"] == 19 and group.stats()["timeouts"] == 1
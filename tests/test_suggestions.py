@@ -0,0 +1,168 @@
+# tests/test_suggestions.py
+# 家长建议的存储与推送 / Suggestion store and push delivery
+
+import asyncio
+import json
+
+from services.suggestions import SuggestionBroker, SuggestionStore
+
+
+def make_store(tmp_path, data=None):
+    path = tmp_path / "suggest.json"
+    path.write_text(json.dumps(data or {}))
+    return SuggestionStore(str(path)), path
+
+
+def test_cursor_over_legacy_and_new_entries(tmp_path):
+    store, path = make_store(tmp_path, {"kid": [{"from": "p", "text": "a"}, {"from": "p", "text": "b"}]})
+    assert [e["id"] for e in store.entries("kid")] == [1, 2]
+    entry = store.append("kid", {"from": "p", "text": "c"})
+    assert entry["id"] > 2 and [e["text"] for e in store.entries("kid", after=1)] == ["b", "c"]
+    assert json.loads(path.read_text())["kid"][-1]["id"] == entry["id"]
+
+    assert store.merge("kid", entry) is False                       # 已有 / already known
+    remote = {"from": "p", "text": "d", "id": entry["id"] + 5}
+    assert store.merge("kid", remote) is True and store.entries("kid", entry["id"]) == [remote]
+
+
+def test_follow_catches_up_then_pushes(tmp_path):
+    store, _ = make_store(tmp_path)
+    broker = SuggestionBroker(store)
+
+    async def run():
+        first = await broker.publish("kid", {"from": "p", "text": "before connect"})
+        seen = []
+
+        async def client():
+            async for entry in broker.follow("kid", after=0, heartbeat=1):
+                seen.append(entry["text"])
+                if len(seen) == 2:
+                    return
+
+        task = asyncio.ensure_future(client())
+        await asyncio.sleep(0.01)
+        assert seen == ["before connect"] and broker.stats()["subscribers"] == 1
+        await broker.publish("kid", {"from": "p", "text": "live"})
+        await asyncio.wait_for(task, 1)
+        return first, seen
+
+    first, seen = asyncio.run(run())
+    assert seen == ["before connect", "live"] and broker.stats()["subscribers"] == 0
+
+
+class FakeRedis:
+    """CN: 只实现脚本、日志与订阅，语义同 PUBLISH_SCRIPT；EN: eval + log + pubsub, mirroring PUBLISH_SCRIPT"""
+
+    def __init__(self):
+        self.seq, self.queues, self.log = 0, [], []
+
+    def pubsub(self):
+        queue = asyncio.Queue()
+        self.queues.append(queue)
+
+        class PubSub:
+            async def psubscribe(self, pattern):
+                pass
+
+            async def listen(self):
+                while True:
+                    message = await queue.get()
+                    if message is None:                  # 断线 / connection dropped
+                        raise ConnectionError("connection lost")
+                    yield message
+
+        return PubSub()
+
+    def drop(self):
+        """CN: 断开所有订阅；EN: disconnect every subscriber"""
+        for queue in self.queues:
+            queue.put_nowait(None)
+        self.queues = []
+
+    async def zrangebyscore(self, key, low, high):
+        return [m for i, m in self.log if i > int(low.lstrip("("))]
+
+    async def eval(self, script, numkeys, seq_key, channel, log_key, data, floor, log_max):
+        self.seq = max(self.seq + 1, int(floor) + 1)
+        message = '{"id":%d,%s' % (self.seq, data[1:])
+        self.log = (self.log + [(self.seq, message)])[-log_max:]
+        for queue in self.queues:
+            queue.put_nowait({"type": "pmessage", "channel": channel.encode(), "data": message})
+        return self.seq
+
+
+def test_workers_share_one_ordered_id_sequence(tmp_path):
+    from services.suggestions import RedisBackend
+
+    redis = FakeRedis()
+    legacy = {"kid": [{"from": "p", "text": "old", "id": 5}]}
+    (tmp_path / "a").mkdir(), (tmp_path / "b").mkdir()
+    store_a, path_a = make_store(tmp_path / "a", legacy)
+    store_b, _ = make_store(tmp_path / "b", legacy)
+    worker_a = SuggestionBroker(store_a, RedisBackend("redis://fake", redis))
+    worker_b = SuggestionBroker(store_b, RedisBackend("redis://fake", redis))
+
+    async def run():
+        seen = []
+
+        async def client():                            # 连在 A 上，游标从旧数据开始 / connected to worker A
+            async for entry in worker_a.follow("kid", after=5, heartbeat=1):
+                seen.append(entry["id"])
+                if len(seen) == 4:
+                    return
+
+        await worker_a._ensure_started(), await worker_b._ensure_started()
+        task = asyncio.ensure_future(client())
+        ids = []
+        for broker in (worker_b, worker_a, worker_b, worker_a):
+            ids.append((await broker.publish("kid", {"from": "p", "text": "x"}))["id"])
+        await asyncio.wait_for(task, 1)
+        for _ in range(200):                          # B 的投递与写盘在后台 / B's delivery and flushes lag
+            if len(store_b.entries("kid", 5)) == 4 and len(json.loads(path_a.read_text()).get("kid", [])) == 5:
+                break
+            await asyncio.sleep(0.01)
+        return ids, seen
+
+    ids, seen = asyncio.run(run())
+    assert ids == [6, 7, 8, 9] and seen == ids                # 高于旧 id，且按序送达 / above the floor, in order
+    assert [e["id"] for e in store_b.entries("kid", 5)] == ids
+    assert [e["id"] for e in json.loads(path_a.read_text())["kid"]] == [5] + ids[:4]
+    assert all("origin" not in e for e in store_a.entries("kid"))
+    assert all("child_id" not in e for e in store_a.entries("kid"))
+
+
+def test_subscriber_reconnects_and_backfills_missed_entries(tmp_path, monkeypatch):
+    import services.suggestions
+    from services.suggestions import RedisBackend
+
+    monkeypatch.setattr(services.suggestions, "RECONNECT_MIN_SECONDS", 0.01)
+    redis = FakeRedis()
+    (tmp_path / "a").mkdir(), (tmp_path / "b").mkdir()
+    store_a, _ = make_store(tmp_path / "a")
+    worker_a = SuggestionBroker(store_a, RedisBackend("redis://fake", redis))
+
+    async def run():
+        await worker_a.publish("kid", {"from": "p", "text": "before b started"})
+        store_b, path_b = make_store(tmp_path / "b")
+        backend_b = RedisBackend("redis://fake", redis)
+        worker_b = SuggestionBroker(store_b, backend_b)
+        await worker_b._ensure_started()                   # 启动时补发 / backfilled on start
+        assert [e["text"] for e in store_b.entries("kid")] == ["before b started"]
+
+        redis.drop()                                       # 断线期间的发布不会推送给 B / missed while down
+        await worker_a.publish("kid", {"from": "p", "text": "while down"})
+        for _ in range(200):
+            if len(store_b.entries("kid")) == 2:
+                break
+            await asyncio.sleep(0.01)
+        await worker_a.publish("kid", {"from": "p", "text": "after"})
+        for _ in range(200):
+            if len(store_b.entries("kid")) == 3:
+                break
+            await asyncio.sleep(0.01)
+        return store_b, path_b, backend_b.reconnects
+
+    store_b, path_b, reconnects = asyncio.run(run())
+    assert [e["text"] for e in store_b.entries("kid")] == ["before b started", "while down", "after"]
+    # 补发的一批写盘；实时收到的由发布方写盘 / backfills are persisted; live entries by their publisher
+    assert reconnects >= 1 and len(json.loads(path_b.read_text())["kid"]) == 2
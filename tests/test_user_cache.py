@@ -0,0 +1,77 @@
+# tests/test_user_cache.py
+# 已登录用户缓存 / Authenticated-user cache
+
+import time
+import uuid
+
+from services.user_cache import UserCache
+
+
+def test_hit_until_ttl_then_reload():
+    cache = UserCache(ttl=60, max_size=10)
+    cache.put("u1", {"id": "u1"})
+    assert cache.get("u1") == {"id": "u1"}
+    user, _ = cache._items["u1"]
+    cache._items["u1"] = (user, time.monotonic() - 1)      # 过期 / expired
+    assert cache.get("u1") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_invalidate_on_update_hook():
+    user_id = uuid.uuid4()
+    cache = UserCache(ttl=60, max_size=10)
+    cache.put(str(user_id), {"is_active": True})        # 键是 token 的 sub 字符串 / keyed by the sub string
+    cache.invalidate(user_id)                            # 钩子传的是 user.id / hooks pass user.id
+    assert cache.get(str(user_id)) is None and cache.stats()["invalidations"] == 1
+
+
+def test_size_bound_and_disabled():
+    cache = UserCache(ttl=60, max_size=2)
+    for sub in ("a", "b", "c"):
+        cache.put(sub, sub)
+    assert cache.get("a") is None and cache.get("c") == "c"
+    off = UserCache(ttl=0)
+    off.put("a", "a")
+    assert off.get("a") is None
+
+
+def test_cached_jwt_strategy_read_token(monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+
+    from fastapi_users import exceptions
+    from services import auth_real
+    from services.auth_real import CachedJWTStrategy, UserCacheHooks
+
+    cache = UserCache(ttl=60, max_size=10)
+    monkeypatch.setattr(auth_real, "user_cache", cache)
+    alice = SimpleNamespace(id=uuid.uuid4(), is_active=True)
+    users, loads = {alice.id: alice}, []
+
+    class FakeUserManager(UserCacheHooks):
+        def parse_id(self, value):
+            return uuid.UUID(value)
+
+        async def get(self, user_id):
+            loads.append(user_id)
+            if user_id not in users:
+                raise exceptions.UserNotExists()
+            return users[user_id]
+
+    strategy, manager = CachedJWTStrategy(secret="s", lifetime_seconds=60), FakeUserManager()
+
+    async def run():
+        token = await strategy.write_token(alice)
+        first = await strategy.read_token(token, manager)               # 未命中：读库 / miss: loads the row
+        second = await strategy.read_token(token, manager)              # 命中 / hit
+        await manager.on_after_update(alice, {"is_active": False})      # 钩子失效 / hook invalidates
+        third = await strategy.read_token(token, manager)
+        ghost = await strategy.write_token(SimpleNamespace(id=uuid.uuid4()))
+        return first, second, third, await strategy.read_token(ghost, manager), \
+            await strategy.read_token("garbage", manager)
+
+    first, second, third, missing, bad = asyncio.run(run())
+    assert first is second is third is alice
+    assert loads[:2] == [alice.id, alice.id]                             # 失效后重新读库 / reloaded after invalidation
+    assert missing is None and bad is None and len(loads) == 3          # UserNotExists -> None
+    assert cache.stats()["hits"] == 1 and cache.stats()["invalidations"] == 1
@@ -1,47 +1,62 @@
 # utils/cohere_client.py
-# Cohere 客户端。不同版本的 SDK 有 chat / generate 差异，这里做双分支兜底。
+# Cohere 客户端（v1 /chat 接口，异步 + 共享连接池）
+# Cohere client (v1 /chat over the shared async pool in utils/llm_http.py)
 
-import os
-from typing import List
-import cohere
+import json
+from typing import AsyncIterator, List, Optional
 
-api_key = os.getenv("COHERE_API_KEY")
-co = cohere.Client(api_key) if api_key else None
+from utils import prompt_builder
+from utils.llm_cache import cached_llm, cacheable_suggestions
+from utils.llm_http import PROVIDERS, post_json, stream_text
 
-def generate_cohere_reply(prompt: str) -> str:
-    if not co:
+MODEL = "command-r"
+
+def configured() -> bool:
+    return bool(PROVIDERS["cohere"].api_key)
+
+def _configured_reply(text: str) -> bool:
+    """未配置时的提示不进缓存 / don't cache the "not configured" notice"""
+    return bool(text) and not text.startswith("Cohere not configured")
+
+async def _chat(message: str, preamble: Optional[str] = None, temperature: float = 0.6) -> str:
+    payload = {"model": MODEL, "message": message, "temperature": temperature}
+    if preamble:
+        payload["preamble"] = preamble
+    result = await post_json("cohere", "/chat", payload)
+    return (result.get("text") or "").strip()
+
+@cached_llm("cohere", MODEL, {"kind": "reply"}, cacheable=_configured_reply)
+async def generate_cohere_reply(prompt: str) -> str:
+    if not configured():
         return "Cohere not configured: missing COHERE_API_KEY"
-    # 优先尝试 chat（新版本）
-    try:
-        r = co.chat(model="command-r", messages=[{"role":"user","content":prompt}])
-        return (r.output_text or "").strip()
-    except TypeError:
-        # 旧版本只支持 generate
-        r = co.generate(prompt=prompt, max_tokens=200, temperature=0.6, model="command")
-        return r.generations[0].text.strip()
-
-def suggest_activities_with_cohere(prompt: str) -> List[dict]:
-    if not co:
+    return await _chat(prompt)
+
+SUGGEST_SYSTEM = prompt_builder.SUGGEST_SYSTEM  # 共享静态前缀 / shared static prefix
+
+@cached_llm("cohere", MODEL, {"kind": "suggest", "temperature": 0.6},
+            cacheable=cacheable_suggestions)
+async def suggest_activities_with_cohere(prompt: str) -> List[dict]:
+    if not configured():
         return []
-    sys = (
-        "You output a JSON array of 3 concise activity ideas for kids. "
-        "Fields: title (string), duration (int minutes), tag (skill|reading|sport|social|art), reason (string)."
-    )
-    try:
-        r = co.chat(
-            model="command-r",
-            messages=[{"role":"system","content":sys},{"role":"user","content":prompt}],
-            temperature=0.6
-        )
-        text = (r.output_text or "").strip()
-    except TypeError:
-        # 旧 SDK 走 generate
-        r = co.generate(prompt=sys + "\nUser:" + prompt, max_tokens=300, temperature=0.6, model="command")
-        text = r.generations[0].text.strip()
-
-    import json
+    text = await _chat(prompt, preamble=SUGGEST_SYSTEM, temperature=0.6)
+
     try:
         data = json.loads(text)
         return data if isinstance(data, list) else []
     except Exception:
         return [{"title": text[:40], "duration": 45, "tag": "skill", "reason": "AI free-form response"}]
+
+# ---------- 流式（SSE 接口用）/ Streaming (for the SSE endpoints) ----------
+def _stream_chat(message: str, preamble: Optional[str] = None, temperature: float = 0.6) -> AsyncIterator[str]:
+    payload = {"model": MODEL, "message": message, "temperature": temperature, "stream": True}
+    if preamble:
+        payload["preamble"] = preamble
+    return stream_text("cohere", "/chat", payload)
+
+def stream_cohere_reply(prompt: str) -> AsyncIterator[str]:
+    """逐段产出回复文本 / Yield the reply text chunk by chunk"""
+    return _stream_chat(prompt)
+
+def stream_cohere_suggestions(prompt: str) -> AsyncIterator[str]:
+    """逐段产出建议 JSON 数组的原文 / Yield the raw suggestion JSON array chunk by chunk"""
+    return _stream_chat(prompt, preamble=SUGGEST_SYSTEM, temperature=0.6)
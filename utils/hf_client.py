@@ -1,35 +1,65 @@
 # utils/hf_client.py
-# Hugging Face Inference API。请选择一个可用的公开模型（这里用 mistralai/Mistral-7B-Instruct-v0.2）
-
-import os, json, requests
-from typing import List
-
-API_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2"
-HEADERS = {"Authorization": f"Bearer {os.getenv('HUGGINGFACE_API_KEY')}"}
-
-def generate_reply(prompt: str) -> str:
-    if not HEADERS["Authorization"].endswith(("None", "", " ")):
-        payload = {"inputs": prompt, "parameters": {"max_new_tokens": 200, "temperature": 0.7}}
-        r = requests.post(API_URL, headers=HEADERS, json=payload, timeout=60)
-        if r.status_code == 200:
-            out = r.json()
-            # 兼容多种返回结构
-            if isinstance(out, list) and len(out) and "generated_text" in out[0]:
-                return out[0]["generated_text"]
-            if isinstance(out, dict) and "generated_text" in out:
-                return out["generated_text"]
-            return str(out)[:500]
-        return f"Hugging Face error: {r.status_code} {r.text}"
-    return "Hugging Face not configured: missing HUGGINGFACE_API_KEY"
-
-def suggest_activities_with_hf(prompt: str) -> List[dict]:
-    sys = (
-        "Return 3-5 kid-friendly activity suggestions as a JSON array. "
-        "Each item: {\"title\": str, \"duration\": int minutes, \"tag\": \"skill|reading|sport|social|art\", \"reason\": str}."
-    )
-    text = generate_reply(sys + "\nUser: " + prompt)
+# Hugging Face Inference API（异步 + 共享连接池）。请选择一个可用的公开模型（这里用 mistralai/Mistral-7B-Instruct-v0.2）
+# Hugging Face Inference API over the shared async pool in utils/llm_http.py
+
+import json
+from typing import AsyncIterator, List
+
+import httpx
+
+from utils import prompt_builder
+from utils.llm_cache import cached_llm, cacheable_suggestions
+from utils.llm_http import PROVIDERS, post_json, stream_text
+
+MODEL = "mistralai/Mistral-7B-Instruct-v0.2"
+
+def configured() -> bool:
+    return bool(PROVIDERS["hf"].api_key)
+
+def _configured_reply(text: str) -> bool:
+    """未配置/出错时的提示不进缓存 / don't cache "not configured" or error notices"""
+    return bool(text) and not text.startswith(("Hugging Face not configured", "Hugging Face error"))
+
+@cached_llm("hf", MODEL, {"kind": "reply", "max_new_tokens": 200, "temperature": 0.7},
+            cacheable=_configured_reply)
+async def generate_reply(prompt: str) -> str:
+    if not configured():
+        return "Hugging Face not configured: missing HF_API_KEY (or HUGGINGFACE_API_KEY)"
+    payload = {"inputs": prompt, "parameters": {"max_new_tokens": 200, "temperature": 0.7}}
+    try:
+        out = await post_json("hf", f"/models/{MODEL}", payload)
+    except httpx.HTTPStatusError as e:
+        return f"Hugging Face error: {e.response.status_code} {e.response.text}"
+    # 兼容多种返回结构
+    if isinstance(out, list) and len(out) and "generated_text" in out[0]:
+        return out[0]["generated_text"]
+    if isinstance(out, dict) and "generated_text" in out:
+        return out["generated_text"]
+    return str(out)[:500]
+
+SUGGEST_SYSTEM = prompt_builder.SUGGEST_SYSTEM  # 共享静态前缀 / shared static prefix
+_SUGGEST_PREFIX = SUGGEST_SYSTEM + "\nUser: "
+
+@cached_llm("hf", MODEL, {"kind": "suggest"}, cacheable=cacheable_suggestions)
+async def suggest_activities_with_hf(prompt: str) -> List[dict]:
+    if not configured():
+        return []
+    text = await generate_reply.uncached(_SUGGEST_PREFIX + prompt)  # 外层已缓存 / cached one level up
     try:
         data = json.loads(text)
         return data if isinstance(data, list) else []
     except Exception:
         return [{"title": text[:40], "duration": 45, "tag": "skill", "reason": "AI free-form response"}]
+
+# ---------- 流式（SSE 接口用，TGI token 流）/ Streaming (for the SSE endpoints, TGI token stream) ----------
+def stream_reply(prompt: str) -> AsyncIterator[str]:
+    """逐段产出回复文本 / Yield the reply text chunk by chunk"""
+    return stream_text("hf", f"/models/{MODEL}", {
+        "inputs": prompt,
+        "parameters": {"max_new_tokens": 200, "temperature": 0.7},
+        "stream": True,
+    })
+
+def stream_hf_suggestions(prompt: str) -> AsyncIterator[str]:
+    """逐段产出建议 JSON 数组的原文 / Yield the raw suggestion JSON array chunk by chunk"""
+    return stream_reply(_SUGGEST_PREFIX + prompt)
@@ -0,0 +1,68 @@
+# utils/hot_reload.py
+# 作用：从文件构建只读快照，文件变化时重新构建并原子替换（无需重启）
+# Purpose: build an immutable snapshot from a file; rebuild and swap it atomically
+#          when the file changes (no restart needed)
+
+from __future__ import annotations
+import json, os, threading, time
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class HotReloadFile(Generic[T]):
+    """
+    读路径只做一次时间比较；至多每 check_seconds 秒 stat 一次文件。
+    坏文件不影响线上：保留上一个可用快照。
+
+    The read path is one clock comparison; the file is stat'ed at most every
+    check_seconds. A broken file keeps the last good snapshot in service.
+    """
+
+    def __init__(self, path: str, build: Callable[[Any], T], default: Any = None, check_seconds: float = 1.0):
+        self.path = path
+        self.build = build              # 解析后的 JSON -> 快照 / parsed JSON -> snapshot
+        self.default = default          # 文件不存在时使用 / used when the file is missing
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._checked_at = time.monotonic()
+        self._snapshot: T = self._load()
+
+    def _load(self) -> T:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._mtime = None
+            return self.build(self.default)
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        snapshot = self.build(data)
+        self._mtime = mtime
+        return snapshot
+
+    def reload(self) -> T:
+        """强制重新构建并原子替换 / Force a rebuild and swap the snapshot atomically"""
+        with self._lock:
+            self._snapshot = self._load()
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def get(self) -> T:
+        """当前快照；文件变化时自动重新加载 / Current snapshot, reloaded when the file changes"""
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_seconds:
+            self._checked_at = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                mtime = None
+            if mtime != self._mtime:
+                try:
+                    return self.reload()
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    # json.JSONDecodeError 是 ValueError 的子类；OSError：读取时文件被替换/删除或无权限
+                    # JSONDecodeError subclasses ValueError; OSError: replaced/removed mid-read or unreadable
+                    self._mtime = mtime
+                    print(f"hot reload of {self.path} skipped:", e)
+        return self._snapshot
@@ -1,19 +1,24 @@
 # utils/interest_extractor.py
 # 用户兴趣提取器 / Interest Extractor
 
-def extract_interest_from_survey(survey_data: dict) -> list:
+def extract_interest_from_survey(survey_data) -> list:
     """
     模拟函数：根据用户的兴趣调查问卷，提取兴趣关键词。
     Simulated function to extract interest keywords from survey data.
 
     参数 / Params:
-        survey_data (dict): 用户问卷数据 / User's survey input
+        survey_data (dict | str): 用户问卷数据或自由文本 / User's survey input or free text
 
     返回 / Returns:
         list: 兴趣关键词列表 / List of interest keywords
     """
     interests = []
 
+    # 自由文本问卷：同时当作爱好和科目 / free-text survey: treat as hobbies and subjects
+    free_text = survey_data if isinstance(survey_data, str) else ""
+    if isinstance(survey_data, str):
+        survey_data = {"hobbies": survey_data, "favorite_subjects": survey_data}
+
     # 模拟提取逻辑 / Mock rule-based extraction
     if "sports" in survey_data.get("hobbies", "").lower():
         interests.append("exercise")
@@ -24,6 +29,11 @@ def extract_interest_from_survey(survey_data: dict) -> list:
     if "art" in survey_data.get("favorite_subjects", "").lower():
         interests.append("creativity")
 
+    # 关键词没命中时，自由文本走本地检索匹配目录兴趣 / free text falls back to local retrieval
+    if not interests and free_text:
+        from recommender.embedding_index import match_interests
+        interests.extend(match_interests(free_text))
+
     if not interests:
         interests.append("general learning")  # 默认兴趣 / Default fallback
 
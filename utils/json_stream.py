@@ -0,0 +1,71 @@
+# utils/json_stream.py
+# 增量 JSON 数组解析：模型逐 token 输出 "[{...}, {...}]" 时，每个对象一闭合就立即产出
+# Incremental JSON-array parser: as a model streams "[{...}, {...}]" token by token, each
+# object is yielded as soon as its closing brace arrives.
+#
+# - 数组前的杂文本（如 ```json 代码块标记）会被跳过 / text before the array (e.g. ```json fences) is skipped
+# - 只产出顶层数组里的对象；嵌套对象随其父对象一起产出 / only top-level array items are yielded
+# - 字符串里的括号与转义字符不影响计数 / brackets and escapes inside strings are ignored
+# - 每个字符只扫描一次（摊还 O(n)）/ each character is scanned once (amortized O(n))
+
+from __future__ import annotations
+
+import json
+from typing import Any, List
+
+
+class IncrementalArrayParser:
+    def __init__(self):
+        self._buf: List[str] = []      # 当前对象的字符 / characters of the current object
+        self._started = False          # 已看到顶层 "[" / saw the top-level "["
+        self._finished = False         # 已看到顶层 "]" / saw the top-level "]"
+        self._depth = 0                # 顶层数组内的嵌套深度 / nesting depth inside the array
+        self._in_string = False
+        self._escape = False
+        self.skipped = 0               # 无法解析而丢弃的对象数 / objects dropped as unparsable
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Any]:
+        """喂入一段文本，返回其中刚闭合的对象 / Feed a chunk; returns the objects it completed"""
+        out: List[Any] = []
+        for ch in chunk:
+            if self._finished:
+                break
+            if not self._started:
+                if ch == "[":
+                    self._started = True
+                continue
+            if self._depth == 0:
+                # 对象之间：只关心 "{" 和 "]" / between items: only "{" and "]" matter
+                if ch == "{":
+                    self._depth = 1
+                    self._buf = [ch]
+                elif ch == "]":
+                    self._finished = True
+                continue
+
+            self._buf.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        out.append(json.loads("".join(self._buf)))
+                    except ValueError:
+                        self.skipped += 1
+                    self._buf = []
+        return out
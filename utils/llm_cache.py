@@ -0,0 +1,340 @@
+# utils/llm_cache.py
+# LLM 响应缓存（本地 SQLite）：键 = 服务商 + 模型 + 规范化提示词 + 参数
+# LLM response cache (local SQLite), keyed by provider + model + normalized prompt + params.
+#
+# - 容量 / size cap: 条目数与字节数上限，超出按最近访问时间淘汰（LRU）
+#   entry and byte caps; the least recently accessed rows are evicted first
+#   条目数/字节数在进程内累计，超限时用一条 DELETE 淘汰到低水位（上限的 90%），
+#   因此淘汰是批量的、均摊 O(1)；COUNT/SUM 只按 RECOUNT 间隔定期校准（其他进程也会写）
+#   counts and bytes are tracked in-process; going over a cap evicts down to a low-water mark
+#   (90% of the cap) in a single DELETE, so evictions come in batches and cost amortized O(1);
+#   COUNT/SUM only re-syncs the estimate every RECOUNT seconds (other processes write too)
+# - 访问时间 / access times: 命中只记在内存，攒够 TOUCH_BATCH 条或淘汰前批量写回（LRU 近似，
+#   进程退出时最多丢失一批）/ hits are recorded in memory and written back in batches, or just
+#   before an eviction (approximate LRU; at most one batch is lost on exit)
+# - 异步 / async: async 调用通过 aget/aset 在线程中访问 SQLite，不阻塞事件循环
+#   async callers go through aget/aset, which run the SQLite work in a thread
+# - 过期 / TTL: 超过 ttl 的条目视为过期；开启 stale-while-revalidate 时，在 swr 窗口内先返回旧值、
+#   后台刷新 / entries older than ttl are stale; with stale-while-revalidate they are served
+#   for another `swr` seconds while a background refresh runs
+# - 合并 / coalescing: 未命中时相同 key 的并发调用只打一次上游（utils/single_flight.py）
+#   concurrent misses for one key share a single upstream call (utils/single_flight.py)
+# - 指标 / metrics: hits / stale_hits / misses / stores / evictions / errors（见 /metrics/llm-cache）
+#
+# 环境变量 / env: LLM_CACHE_ENABLED(1) LLM_CACHE_FILE LLM_CACHE_MAX_ENTRIES(5000)
+#                 LLM_CACHE_MAX_BYTES(50MB) LLM_CACHE_TTL(86400 s) LLM_CACHE_SWR(0 = off)
+#                 LLM_CACHE_LOW_WATER(0.9) LLM_CACHE_RECOUNT_SECONDS(60)
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils.single_flight import SingleFlight, flights
+
+CACHE_FILE = os.getenv("LLM_CACHE_FILE", os.path.join("data", "llm_cache.sqlite"))
+ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") not in ("0", "false", "False")
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL", "86400"))
+SWR_SECONDS = float(os.getenv("LLM_CACHE_SWR", "0"))
+LOW_WATER = float(os.getenv("LLM_CACHE_LOW_WATER", "0.9"))
+RECOUNT_SECONDS = float(os.getenv("LLM_CACHE_RECOUNT_SECONDS", "60"))
+TOUCH_BATCH = 64
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """NFKC + 去首尾空白 + 合并连续空白（不改大小写）/ NFKC, trimmed, whitespace collapsed (case kept)"""
+    return _WS.sub(" ", unicodedata.normalize("NFKC", prompt or "")).strip()
+
+
+def cache_key(provider: str, model: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+    raw = json.dumps({"p": provider, "m": model, "q": normalize_prompt(prompt), "o": params or {}},
+                     sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path: str = CACHE_FILE, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES,
+                 ttl: float = TTL_SECONDS, swr: float = SWR_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.swr = swr
+        self.metrics: Counter = Counter()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._touched: Dict[str, float] = {}      # 待写回的访问时间 / pending access-time updates
+        self._count = 0                           # 进程内估计 / in-process estimates
+        self._bytes = 0
+        self._counted = 0.0                       # 上次 COUNT/SUM 的时间 / time of the last recount
+
+    # ---------- 连接 / Connection ----------
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, provider TEXT, model TEXT, value TEXT NOT NULL,"
+                " size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed ON llm_cache(accessed)")
+            self._conn = conn
+            self._recount(conn)
+        return self._conn
+
+    def _recount(self, db: sqlite3.Connection) -> None:
+        self._count, self._bytes = db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        self._counted = time.time()
+
+    def _flush_touched(self, db: sqlite3.Connection) -> None:
+        if self._touched:
+            db.executemany("UPDATE llm_cache SET accessed = ? WHERE key = ?",
+                           [(t, k) for k, t in self._touched.items()])
+            self._touched.clear()
+
+    # ---------- 读写 / Get & set ----------
+    def get(self, key: str) -> Optional[Tuple[Any, bool]]:
+        """
+        命中返回 (值, 是否新鲜)；未命中或超出 swr 窗口返回 None
+        Returns (value, fresh) on a hit; None on a miss or past the swr window
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                db = self._db()
+                row = db.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.metrics["misses"] += 1
+                    return None
+                age = now - row[1]
+                if age > self.ttl + self.swr:
+                    if db.execute("DELETE FROM llm_cache WHERE key = ?", (key,)).rowcount:
+                        self._count -= 1
+                    self._touched.pop(key, None)
+                    self.metrics["misses"] += 1
+                    self.metrics["expired"] += 1
+                    return None
+                self._touched[key] = now
+                if len(self._touched) >= TOUCH_BATCH:
+                    self._flush_touched(db)
+        except sqlite3.Error as e:
+            self.metrics["errors"] += 1
+            print("llm cache read failed:", e)
+            return None
+        fresh = age <= self.ttl
+        self.metrics["hits" if fresh else "stale_hits"] += 1
+        return json.loads(row[0]), fresh
+
+    def set(self, key: str, value: Any, provider: str = "", model: str = "") -> None:
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        size = len(data.encode("utf-8"))
+        try:
+            with self._lock:
+                db = self._db()
+                old = db.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, provider, model, value, size, created, accessed)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, provider, model, data, size, now, now),
+                )
+                self._touched.pop(key, None)
+                self._count += 0 if old else 1
+                self._bytes += size - (old[0] if old else 0)
+                if now - self._counted >= RECOUNT_SECONDS:
+                    self._recount(db)      # 定期校准估计 / periodically re-sync the estimate
+                if self._count > self.max_entries or self._bytes > self.max_bytes:
+                    self._evict(db)
+            self.metrics["stores"] += 1
+        except sqlite3.Error as e:
+            self.metrics["errors"] += 1
+            print("llm cache write failed:", e)
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        """
+        超出上限时删掉最久未访问的若干行，直到低水位（一条 DELETE）
+        Drop the least recently used rows down to the low-water marks, in one DELETE
+        """
+        self._flush_touched(db)
+        count, total = self._count, self._bytes
+        max_entries, max_bytes = int(self.max_entries * LOW_WATER), self.max_bytes * LOW_WATER
+        n = 0
+        # 游标按需读取，只走到够删为止 / the cursor is read lazily, only as far as the victims go
+        for (size,) in db.execute("SELECT size FROM llm_cache ORDER BY accessed"):
+            if count - n <= max_entries and total <= max_bytes:
+                break
+            n, total = n + 1, total - size
+        if n:
+            db.execute("DELETE FROM llm_cache WHERE key IN"
+                       " (SELECT key FROM llm_cache ORDER BY accessed LIMIT ?)", (n,))
+            self._count, self._bytes = count - n, total
+            self.metrics["evictions"] += n
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db().execute("DELETE FROM llm_cache")
+            self._touched.clear()
+            self._count = self._bytes = 0
+
+    # ---------- 异步 / Async ----------
+    async def aget(self, key: str) -> Optional[Tuple[Any, bool]]:
+        """get 的线程版，供 async 调用 / get() in a worker thread, for async callers"""
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any, provider: str = "", model: str = "") -> None:
+        await asyncio.to_thread(self.set, key, value, provider, model)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total = self._db().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        lookups = self.metrics["hits"] + self.metrics["stale_hits"] + self.metrics["misses"]
+        return {
+            **{k: self.metrics[k] for k in ("hits", "stale_hits", "misses", "expired", "stores",
+                                             "evictions", "refreshes", "errors")},
+            "hit_rate": round((self.metrics["hits"] + self.metrics["stale_hits"]) / lookups, 4) if lookups else None,
+            "entries": count,
+            "bytes": total,
+            "enabled": ENABLED,
+        }
+
+
+cache = LLMCache()
+
+
+# 解析失败时客户端退化为单条“自由文本”建议，这类结果不缓存
+# Clients degrade to one free-form suggestion when the JSON does not parse; those are not cached
+FREE_FORM_REASON = "AI free-form response"
+
+
+def cacheable_suggestions(data) -> bool:
+    """只缓存模型真正给出的 JSON 列表 / Only cache real JSON lists from the model"""
+    return bool(data) and not (len(data) == 1 and data[0].get("reason") == FREE_FORM_REASON)
+
+
+# ========== 装饰器 / Decorator ==========
+def cached_llm(provider: str, model: str, params: Optional[Dict[str, Any]] = None,
+               prompt_of: Callable[..., str] = lambda prompt, *a, **k: prompt,
+               cacheable: Callable[[Any], bool] = bool, store: Optional[LLMCache] = None,
+               flight_timeout: Optional[float] = None, group: Optional[SingleFlight] = None):
+    """
+    给 LLM 调用函数（同步或 async）加缓存 + 相同请求合并 / Cache and coalesce an LLM call (sync or async).
+      prompt_of: 从调用参数取出提示词（默认第一个参数）/ extracts the prompt from the call args
+      cacheable: 结果是否值得缓存（默认非空）/ whether a result should be stored (default: truthy)
+      flight_timeout: 等待在途相同请求的最长秒数 / max wait on an identical in-flight call
+    未命中时同一 key 的并发调用只打一次上游（即使缓存关闭）；过期命中在 swr 窗口内直接返回，同时后台刷新
+    On a miss, concurrent calls with the same key share one upstream call (even with the cache
+    disabled); stale hits inside the swr window are returned at once while one refresh runs.
+    """
+    refreshing: set = set()
+
+    def decorate(fn):
+        def key_for(args, kwargs) -> str:
+            return cache_key(provider, model, prompt_of(*args, **kwargs), params)
+
+        def put(c: LLMCache, key: str, value: Any) -> Any:
+            if ENABLED and cacheable(value):
+                c.set(key, value, provider, model)
+            return value
+
+        async def aput(c: LLMCache, key: str, value: Any) -> Any:
+            if ENABLED and cacheable(value):
+                await c.aset(key, value, provider, model)
+            return value
+
+        if inspect.iscoroutinefunction(fn):
+            async def upstream(c: LLMCache, key: str, args, kwargs) -> Any:
+                async def call():
+                    return await aput(c, key, await fn(*args, **kwargs))
+                return await (group or flights).do_async(key, call, flight_timeout)
+
+            async def refresh(c: LLMCache, key: str, args, kwargs) -> None:
+                try:
+                    await upstream(c, key, args, kwargs)
+                    c.metrics["refreshes"] += 1
+                except Exception as e:  # 后台刷新失败只记录 / background refresh failures are only logged
+                    c.metrics["errors"] += 1
+                    print(f"llm cache refresh failed ({provider}):", e)
+                finally:
+                    refreshing.discard(key)
+
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                c = store or cache
+                key = key_for(args, kwargs)
+                hit = await c.aget(key) if ENABLED else None
+                if hit is not None:
+                    value, fresh = hit
+                    if not fresh and key not in refreshing:
+                        refreshing.add(key)
+                        asyncio.get_running_loop().create_task(refresh(c, key, args, kwargs))
+                    return value
+                return await upstream(c, key, args, kwargs)
+        else:
+            def upstream(c: LLMCache, key: str, args, kwargs) -> Any:
+                return (group or flights).do(key, lambda: put(c, key, fn(*args, **kwargs)), flight_timeout)
+
+            def refresh(c: LLMCache, key: str, args, kwargs) -> None:
+                try:
+                    upstream(c, key, args, kwargs)
+                    c.metrics["refreshes"] += 1
+                except Exception as e:
+                    c.metrics["errors"] += 1
+                    print(f"llm cache refresh failed ({provider}):", e)
+                finally:
+                    refreshing.discard(key)
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                c = store or cache
+                key = key_for(args, kwargs)
+                hit = c.get(key) if ENABLED else None
+                if hit is not None:
+                    value, fresh = hit
+                    if not fresh and key not in refreshing:
+                        refreshing.add(key)
+                        threading.Thread(target=refresh, args=(c, key, args, kwargs), daemon=True).start()
+                    return value
+                return upstream(c, key, args, kwargs)
+
+        def lookup(*args, **kwargs) -> Any:
+            """只查缓存（流式接口用）；过期或未命中返回 None / Cache-only read for streaming routes"""
+            hit = (store or cache).get(key_for(args, kwargs)) if ENABLED else None
+            return hit[0] if hit is not None and hit[1] else None
+
+        def remember(value: Any, *args, **kwargs) -> None:
+            """把流式拿到的完整结果写回缓存 / Store a result assembled from a stream"""
+            put(store or cache, key_for(args, kwargs), value)
+
+        async def alookup(*args, **kwargs) -> Any:
+            return await asyncio.to_thread(lookup, *args, **kwargs)
+
+        async def aremember(value: Any, *args, **kwargs) -> None:
+            await aput(store or cache, key_for(args, kwargs), value)
+
+        wrapper.uncached = fn
+        wrapper.lookup, wrapper.alookup = lookup, alookup
+        wrapper.remember, wrapper.aremember = remember, aremember
+        return wrapper
+
+    return decorate
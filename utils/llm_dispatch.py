@@ -0,0 +1,296 @@
+# utils/llm_dispatch.py
+# 多服务商对冲调度：先发给首选服务商，超过其 p95 延迟仍未返回就向备选服务商再发一次（hedge），
+# 先拿到有效结果的胜出，另一个请求被取消；每个服务商一个熔断器，错误率过高时暂时跳过。
+# Hedged multi-provider dispatch: send to the preferred provider; if it has not answered
+# after its p95 latency, fire the same request at a backup. The first valid result wins
+# and the loser is cancelled. A per-provider circuit breaker skips providers whose recent
+# error rate is too high.
+#
+# 环境变量 / env: LLM_HEDGE_DEFAULT_DELAY(2.0) LLM_HEDGE_MIN_DELAY(0.2) LLM_HEDGE_MAX_DELAY(10)
+#                 LLM_BREAKER_ERROR_RATE(0.5) LLM_BREAKER_MIN_CALLS(10) LLM_BREAKER_WINDOW(60) LLM_BREAKER_COOLDOWN(30)
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections import Counter, deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.llm_limiter import ProviderBusy
+
+DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "2.0"))  # 样本不足时 / until enough samples
+MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.2"))
+MAX_DELAY = float(os.getenv("LLM_HEDGE_MAX_DELAY", "10"))
+MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+BREAKER_WINDOW = float(os.getenv("LLM_BREAKER_WINDOW", "60"))
+BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+
+class NoProviderAvailable(RuntimeError):
+    """所有服务商都失败或处于熔断中 / Every provider failed or is tripped"""
+
+
+class CircuitBreaker:
+    """
+    closed -> open：窗口内调用数 >= min_calls 且错误率 >= error_rate
+    open -> half_open：冷却 cooldown 秒后放行一次试探；成功则 closed，失败则重新 open；
+    试探没有结果（被取消、本地限流、客户端断开）时由 release() 交还名额并重新 open
+    closed -> open when the window has >= min_calls and error rate >= error_rate;
+    open -> half_open after `cooldown`, letting one probe through; its outcome closes or re-opens.
+    A probe that ends without an outcome (cancelled, shed locally, client gone) must call
+    release(), which gives the slot back and re-opens the breaker for another cooldown.
+    """
+
+    def __init__(self, error_rate: float = BREAKER_ERROR_RATE, min_calls: int = BREAKER_MIN_CALLS,
+                 window: float = BREAKER_WINDOW, cooldown: float = BREAKER_COOLDOWN):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.opened_at = 0.0
+        self._probing = False
+        self._events: Deque[Tuple[float, bool]] = deque()
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    @property
+    def probing(self) -> bool:
+        return self.state == "half_open" and self._probing
+
+    def release(self) -> None:
+        """试探结束但没有 record() / the probe ended without record()"""
+        if self.probing:
+            self._probing = False
+            self.state, self.opened_at = "open", time.monotonic()
+
+    def record(self, ok: bool) -> None:
+        now = time.monotonic()
+        if self.state == "half_open":
+            self._probing = False
+            self._events.clear()
+            if ok:
+                self.state = "closed"
+            else:
+                self.state, self.opened_at = "open", now
+            return
+        self._events.append((now, ok))
+        while self._events and now - self._events[0][0] > self.window:
+            self._events.popleft()
+        errors = sum(1 for _, good in self._events if not good)
+        if len(self._events) >= self.min_calls and errors / len(self._events) >= self.error_rate:
+            self.state, self.opened_at = "open", now
+
+
+class ProviderHealth:
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.breaker = CircuitBreaker()
+
+    def hedge_delay(self) -> float:
+        """成功请求延迟的 p95（限制在 [MIN, MAX]）/ p95 of successful latencies, clamped"""
+        if len(self.latencies) < MIN_SAMPLES:
+            return DEFAULT_DELAY
+        return float(min(max(np.percentile(self.latencies, 95), MIN_DELAY), MAX_DELAY))
+
+
+class HedgedDispatcher:
+    def __init__(self):
+        self.health: Dict[str, ProviderHealth] = {}
+        self.metrics: Counter = Counter()
+
+    def _health(self, provider: str) -> ProviderHealth:
+        h = self.health.get(provider)
+        if h is None:
+            h = self.health[provider] = ProviderHealth()
+        return h
+
+    async def _attempt(self, provider: str, call: Callable[[str], Awaitable[Any]],
+                       valid: Callable[[Any], bool], probe: bool = False) -> Any:
+        """
+        单个服务商调用；无效结果视为失败。probe=True 时无论如何结束都交还 half-open 名额
+        One provider call; an invalid result counts as a failure. A half-open probe always gives
+        its slot back, however the call ends.
+        """
+        h = self._health(provider)
+        t0 = time.monotonic()
+        try:
+            try:
+                result = await call(provider)
+            except asyncio.CancelledError:
+                raise                  # 被对冲取消不计入健康度 / hedge cancellations don't count
+            except ProviderBusy:
+                self.metrics[f"{provider}.busy"] += 1
+                # 本地限流，不计入熔断，直接换下一个；试探名额由 finally 交还
+                # local shedding: fail over, breaker untouched; a probe slot is returned in finally
+                raise
+            except Exception:
+                h.breaker.record(False)
+                self.metrics[f"{provider}.errors"] += 1
+                raise
+            if not valid(result):
+                h.breaker.record(False)
+                self.metrics[f"{provider}.invalid"] += 1
+                raise ValueError(f"invalid response from {provider}")
+            h.latencies.append(time.monotonic() - t0)
+            h.breaker.record(True)
+            return result
+        finally:
+            if probe:
+                h.breaker.release()    # 已 record 时为空操作 / no-op once recorded
+
+    async def dispatch(self, providers: Sequence[str], call: Callable[[str], Awaitable[Any]],
+                       valid: Callable[[Any], bool] = bool, hedge: bool = True) -> Tuple[str, Any]:
+        """
+        按顺序尝试服务商（首选在前），返回 (胜出的服务商, 结果)
+        Try providers in order (preferred first); returns (winning provider, result).
+          - 首选超过 p95 未返回 -> 启动下一个（hedge）/ preferred slower than its p95 -> start the next one
+          - 某个失败 -> 立即启动下一个 / a failure starts the next one immediately
+          - 首个有效结果胜出，其余取消 / first valid result wins, the rest are cancelled
+        """
+        pending: Dict[asyncio.Task, str] = {}
+        queue: List[str] = list(providers)
+        last_error: Optional[BaseException] = None
+
+        def launch() -> bool:
+            # 熔断检查放在真正发送时，half-open 的试探名额不会被白占
+            # check breakers only when actually sending, so a half-open probe slot is never wasted
+            while queue:
+                p = queue.pop(0)
+                breaker = self._health(p).breaker
+                if breaker.allow():
+                    attempt = self._attempt(p, call, valid, probe=breaker.probing)
+                    pending[asyncio.ensure_future(attempt)] = p
+                    return True
+            return False
+
+        if not launch():
+            self.metrics["rejected"] += 1
+            raise NoProviderAvailable(f"all providers tripped: {', '.join(providers)}")
+        primary = next(iter(pending.values()))
+        try:
+            while pending:
+                # 还有备选且允许对冲时，最多等首个在途请求的 p95 / wait at most the in-flight p95 before hedging
+                timeout = None
+                if hedge and queue:
+                    first = next(iter(pending.values()))
+                    timeout = self._health(first).hedge_delay()
+                done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if launch():
+                        self.metrics["hedges"] += 1
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is None:
+                        if provider != primary:
+                            self.metrics["backup_wins"] += 1
+                        return provider, task.result()
+                    last_error = task.exception()
+                if queue:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()        # 取消落后的请求 / cancel the losers
+            if pending:
+                self.metrics["cancelled"] += len(pending)
+        raise NoProviderAvailable(f"all providers failed: {last_error}") from last_error
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hedges": self.metrics["hedges"],
+            "backup_wins": self.metrics["backup_wins"],
+            "cancelled": self.metrics["cancelled"],
+            "rejected": self.metrics["rejected"],
+            "providers": {
+                p: {
+                    "breaker": h.breaker.state,
+                    "hedge_delay": round(h.hedge_delay(), 3),
+                    "samples": len(h.latencies),
+                    "errors": self.metrics[f"{p}.errors"],
+                    "invalid": self.metrics[f"{p}.invalid"],
+                    "busy": self.metrics[f"{p}.busy"],
+                }
+                for p, h in self.health.items()
+            },
+        }
+
+
+dispatcher = HedgedDispatcher()
+
+
+def provider_order(preferred: str, providers: Sequence[str]) -> List[str]:
+    """首选在前，其余保持原顺序 / preferred first, the rest in their given order"""
+    return [preferred] + [p for p in providers if p != preferred]
+
+
+async def hedged_call(preferred: str, calls: Dict[str, Callable[[], Awaitable[Any]]],
+                      configured: Callable[[str], bool], valid: Callable[[Any], bool] = bool,
+                      hedge: bool = True) -> Tuple[str, Any]:
+    """
+    路由用的入口：只在已配置 key 的服务商之间对冲；一个都没配置时照旧调用首选（返回其“未配置”提示）
+    Route entry point: hedge across providers that have API keys; with none configured, call the
+    preferred one as before (which returns its "not configured" answer).
+    """
+    order = [p for p in provider_order(preferred, list(calls)) if configured(p)]
+    if not order:
+        return preferred, await calls[preferred]()
+    return await dispatcher.dispatch(order, lambda p: calls[p](), valid=valid, hedge=hedge)
+
+
+async def stream_with_failover(preferred: str, streams: Dict[str, Callable[[], AsyncIterator[str]]],
+                               configured: Callable[[str], bool]) -> AsyncIterator[Tuple[str, str]]:
+    """
+    流式版本：流无法对冲，改为“首个分片之前出错就换下一个服务商”；之后的错误直接抛出
+    Streaming variant. Streams cannot be hedged, so a provider that fails before its first
+    chunk is replaced by the next one (breakers apply); errors after that propagate.
+    产出 (服务商, 文本分片) / yields (provider, text chunk)
+    """
+    order = [p for p in provider_order(preferred, list(streams)) if configured(p)]
+    last_error: Optional[BaseException] = None
+    for provider in order:
+        health = dispatcher._health(provider)
+        if not health.breaker.allow():
+            continue
+        probe = health.breaker.probing
+        started = False
+        try:
+            async for chunk in streams[provider]():
+                if not started:
+                    started = True
+                    health.breaker.record(True)
+                yield provider, chunk
+            if not started:
+                health.breaker.record(False)    # 空流 / empty stream
+                dispatcher.metrics[f"{provider}.invalid"] += 1
+        except Exception as e:
+            if started:
+                raise
+            if isinstance(e, ProviderBusy):
+                dispatcher.metrics[f"{provider}.busy"] += 1    # 不计入熔断 / breaker untouched
+            else:
+                health.breaker.record(False)
+                dispatcher.metrics[f"{provider}.errors"] += 1
+            last_error = e
+            continue
+        finally:
+            if probe:
+                health.breaker.release()        # 忙、取消或客户端断开时交还试探名额 / busy, cancelled or disconnected
+        if started:
+            return
+    raise NoProviderAvailable(f"no provider streamed a response: {last_error}")
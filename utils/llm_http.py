@@ -0,0 +1,251 @@
+# utils/llm_http.py
+# LLM 服务商的异步 HTTP 连接池：每个服务商一个共享 httpx.AsyncClient（keep-alive），
+# 各自的超时与连接上限，可重试错误按“指数退避 + 全抖动”重试。
+# Async HTTP pools for LLM providers: one shared httpx.AsyncClient per provider (keep-alive),
+# per-provider timeouts and connection limits, retryable errors retried with exponential
+# backoff and full jitter.
+#
+# 环境变量 / env overrides (NAME = OPENAI | COHERE | HF):
+#   {NAME}_BASE_URL            服务地址（可指向本地 mock）/ base URL (may point at a local mock)
+#   {NAME}_TIMEOUT             读超时秒数 / read timeout in seconds
+#   {NAME}_MAX_CONNECTIONS     连接池上限 / pool size
+#   {NAME}_RETRIES             重试次数 / retry count
+#   {NAME}_MAX_IN_FLIGHT / _RPM / _TPM / _MAX_QUEUE / _MAX_WAIT
+#                              限流与排队（utils/llm_limiter.py）/ limiter and wait queue (utils/llm_limiter.py)
+#
+# httpx 在第一次发请求时才导入，读取配置（PROVIDERS / api_key）不付这个代价
+# httpx is imported on the first request; reading the config (PROVIDERS / api_key) stays cheap
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+from dataclasses import dataclass
+import json
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Optional
+
+if TYPE_CHECKING:
+    import httpx
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+@dataclass(frozen=True)
+class ProviderConfig:
+    name: str
+    base_url: str
+    key_env: str                 # API key 的环境变量名 / env var holding the API key
+    alt_key_env: Optional[str] = None  # 兼容的旧变量名 / legacy alias
+    timeout: float = 30.0        # 读超时 / read timeout (s)
+    connect_timeout: float = 5.0
+    max_connections: int = 50
+    max_keepalive: int = 20
+    retries: int = 2
+    backoff_base: float = 0.25   # 首次退避上限 / first backoff cap (s)
+    backoff_max: float = 4.0
+    max_in_flight: int = 16      # 同时在途的请求数 / concurrent outbound requests
+    rpm: float = 0               # 每分钟请求数，0 = 不限 / requests per minute, 0 = unlimited
+    tpm: float = 0               # 每分钟 token 数，0 = 不限 / tokens per minute, 0 = unlimited
+    max_queue: int = 100         # 等待队列上限 / wait queue bound
+    max_wait: float = 10.0       # 最长排队秒数 / longest wait in the queue (s)
+
+    @property
+    def api_key(self) -> Optional[str]:
+        return os.getenv(self.key_env) or (os.getenv(self.alt_key_env) if self.alt_key_env else None)
+
+
+def _config(name: str, env: str, base_url: str, key_env: str, timeout: float,
+            alt_key_env: Optional[str] = None) -> ProviderConfig:
+    return ProviderConfig(
+        name=name,
+        base_url=os.getenv(f"{env}_BASE_URL", base_url).rstrip("/"),
+        key_env=key_env,
+        alt_key_env=alt_key_env,
+        timeout=float(os.getenv(f"{env}_TIMEOUT", timeout)),
+        max_connections=int(os.getenv(f"{env}_MAX_CONNECTIONS", 50)),
+        retries=int(os.getenv(f"{env}_RETRIES", 2)),
+        max_in_flight=int(os.getenv(f"{env}_MAX_IN_FLIGHT", 16)),
+        rpm=float(os.getenv(f"{env}_RPM", 0)),
+        tpm=float(os.getenv(f"{env}_TPM", 0)),
+        max_queue=int(os.getenv(f"{env}_MAX_QUEUE", 100)),
+        max_wait=float(os.getenv(f"{env}_MAX_WAIT", 10.0)),
+    )
+
+
+PROVIDERS: Dict[str, ProviderConfig] = {
+    "openai": _config("openai", "OPENAI", "https://api.openai.com/v1", "OPENAI_API_KEY", 30.0),
+    "cohere": _config("cohere", "COHERE", "https://api.cohere.ai/v1", "COHERE_API_KEY", 30.0),
+    # HF 冷启动慢，超时放宽 / HF cold starts are slow, allow more time
+    "hf": _config("hf", "HF", "https://api-inference.huggingface.co", "HF_API_KEY", 60.0,
+                  alt_key_env="HUGGINGFACE_API_KEY"),
+}
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+_client_loops: Dict[str, asyncio.AbstractEventLoop] = {}
+
+# 可选的传输层覆盖（进程内 mock / 基准用），新建连接池时生效
+# Optional transport overrides (in-process mocks, benchmarks); applied when a pool is created
+TRANSPORTS: Dict[str, "httpx.AsyncBaseTransport"] = {}
+
+
+def get_client(provider: str) -> httpx.AsyncClient:
+    """
+    服务商共享的 AsyncClient（按事件循环懒创建）/ Shared AsyncClient for a provider, created lazily per event loop
+    """
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    client = _clients.get(provider)
+    if client is None or client.is_closed or _client_loops.get(provider) is not loop:
+        cfg = PROVIDERS[provider]
+        client = httpx.AsyncClient(
+            base_url=cfg.base_url,
+            timeout=httpx.Timeout(cfg.timeout, connect=cfg.connect_timeout),
+            limits=httpx.Limits(max_connections=cfg.max_connections,
+                                max_keepalive_connections=cfg.max_keepalive),
+            headers={"Content-Type": "application/json"},
+            transport=TRANSPORTS.get(provider),
+        )
+        _clients[provider] = client
+        _client_loops[provider] = loop
+    return client
+
+
+def backoff_delay(cfg: ProviderConfig, attempt: int, retry_after: Optional[str] = None) -> float:
+    """全抖动退避；服务端给了 Retry-After 就以它为下限 / Full-jitter backoff, floored by Retry-After"""
+    delay = random.uniform(0, min(cfg.backoff_max, cfg.backoff_base * (2 ** attempt)))
+    if retry_after:
+        try:
+            delay = max(delay, min(float(retry_after), cfg.backoff_max))
+        except ValueError:
+            pass
+    return delay
+
+
+async def post_json(provider: str, path: str, payload: Dict[str, Any],
+                    headers: Optional[Dict[str, str]] = None) -> Any:
+    """
+    POST JSON 并返回解析后的响应；网络错误、超时与 429/5xx 会重试，其余 HTTP 错误直接抛出
+    POST JSON and return the parsed body. Transport errors, timeouts and 429/5xx are retried;
+    other HTTP errors raise httpx.HTTPStatusError immediately.
+    每次尝试都要先拿到限流名额（退避等待时不占名额）；排不上队时抛 ProviderBusy
+    Every attempt takes a limiter slot (not held while backing off); raises ProviderBusy when shed.
+    """
+    import httpx
+
+    from utils.llm_limiter import get_limiter, request_tokens
+
+    cfg = PROVIDERS[provider]
+    client = get_client(provider)
+    limiter = get_limiter(provider)
+    tokens = request_tokens(payload)
+    hdrs = {"Authorization": f"Bearer {cfg.api_key}"} if cfg.api_key else {}
+    hdrs.update(headers or {})
+
+    attempt = 0
+    while True:
+        try:
+            async with limiter.slot(tokens):
+                resp = await client.post(path, json=payload, headers=hdrs)
+            if resp.status_code in RETRY_STATUS and attempt < cfg.retries:
+                await asyncio.sleep(backoff_delay(cfg, attempt, resp.headers.get("Retry-After")))
+                attempt += 1
+                continue
+            resp.raise_for_status()
+            return resp.json()
+        except httpx.TransportError:  # 含超时 / includes timeouts
+            if attempt >= cfg.retries:
+                raise
+            await asyncio.sleep(backoff_delay(cfg, attempt))
+            attempt += 1
+
+
+async def stream_lines(provider: str, path: str, payload: Dict[str, Any],
+                       headers: Optional[Dict[str, str]] = None) -> AsyncIterator[str]:
+    """
+    流式 POST，逐行产出响应体；只在收到响应之前重试连接错误
+    Streaming POST yielding response lines; connection errors are retried only before a response arrives.
+    流式请求在整个流期间占用一个限流名额 / a stream holds its limiter slot until it ends
+    """
+    import httpx
+
+    from utils.llm_limiter import get_limiter, request_tokens
+
+    cfg = PROVIDERS[provider]
+    client = get_client(provider)
+    limiter = get_limiter(provider)
+    tokens = request_tokens(payload)
+    hdrs = {"Authorization": f"Bearer {cfg.api_key}"} if cfg.api_key else {}
+    hdrs.update(headers or {})
+
+    attempt = 0
+    while True:
+        try:
+            async with limiter.slot(tokens), client.stream("POST", path, json=payload, headers=hdrs) as resp:
+                if resp.status_code >= 400:
+                    await resp.aread()
+                    resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if line:
+                        yield line
+            return
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            if attempt >= cfg.retries:
+                raise
+            await asyncio.sleep(backoff_delay(cfg, attempt))
+            attempt += 1
+
+
+def _openai_delta(line: str) -> Optional[str]:
+    # SSE: "data: {...choices[0].delta.content...}" / "data: [DONE]"
+    if not line.startswith("data:"):
+        return None
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return None
+    choices = json.loads(data).get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content")
+
+
+def _cohere_delta(line: str) -> Optional[str]:
+    # NDJSON: {"event_type": "text-generation", "text": "..."}
+    event = json.loads(line)
+    return event.get("text") if event.get("event_type") == "text-generation" else None
+
+
+def _hf_delta(line: str) -> Optional[str]:
+    # TGI SSE: "data:{"token": {"text": "...", "special": false}}"
+    if not line.startswith("data:"):
+        return None
+    token = json.loads(line[5:]).get("token") or {}
+    return None if token.get("special") else token.get("text")
+
+
+STREAM_DECODERS = {"openai": _openai_delta, "cohere": _cohere_delta, "hf": _hf_delta}
+
+
+async def stream_text(provider: str, path: str, payload: Dict[str, Any]) -> AsyncIterator[str]:
+    """
+    按服务商的流式格式解码，逐段产出生成的文本 / Decode the provider's stream format into text deltas
+      openai: SSE chat.completion.chunk；cohere: v1 /chat NDJSON；hf: TGI SSE tokens
+    调用方需在 payload 里打开流式开关 / the caller enables streaming in the payload
+    """
+    decode = STREAM_DECODERS[provider]
+    async for line in stream_lines(provider, path, payload):
+        try:
+            text = decode(line)
+        except ValueError:
+            continue                  # 心跳/注释行 / keep-alive or comment lines
+        if text:
+            yield text
+
+
+async def aclose_all() -> None:
+    """关闭所有连接池（应用关闭时调用）/ Close every pool (call on shutdown)"""
+    clients = list(_clients.values())
+    _clients.clear()
+    _client_loops.clear()
+    for client in clients:
+        if not client.is_closed:
+            await client.aclose()
@@ -0,0 +1,225 @@
+# utils/llm_limiter.py
+# 每个服务商一个异步限流器：在途请求上限 + RPM/TPM 令牌桶 + 有界等待队列（按截止时间提前拒绝）
+# One async limiter per provider: a max-in-flight cap, token buckets for RPM and TPM, and a
+# bounded FIFO wait queue that rejects up front when the wait would overrun the deadline.
+# 负载升高时请求排队或被快速拒绝（ProviderBusy），而不是撞上服务商 429 或拖垮线程池；
+# 对冲调度把 ProviderBusy 当作“换下一个服务商”，不计入熔断。
+# Under load, calls queue or are shed quickly (ProviderBusy) instead of hitting provider 429s;
+# the hedged dispatcher treats ProviderBusy as "try the next provider", not as a breaker failure.
+#
+# 环境变量 / env (NAME = OPENAI | COHERE | HF)，见 utils/llm_http.py:
+#   {NAME}_MAX_IN_FLIGHT(16)  {NAME}_RPM(0 = 不限 / unlimited)  {NAME}_TPM(0)
+#   {NAME}_MAX_QUEUE(100)     {NAME}_MAX_WAIT(10 s)
+
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+import numpy as np
+
+from utils.prompt_builder import estimate_tokens
+
+DEFAULT_OUTPUT_TOKENS = 256   # 请求里没写输出上限时的估计 / assumed output when the payload sets no limit
+
+
+class ProviderBusy(RuntimeError):
+    """队列已满或等待会超过截止时间 / Queue full, or the wait would overrun the deadline"""
+
+
+class TokenBucket:
+    """每分钟 per_minute 个令牌，容量同为 per_minute；<= 0 表示不限 / per_minute tokens per minute; <= 0 = unlimited"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.stamp = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """还需等多久才够 amount 个令牌 / Seconds until `amount` tokens are available"""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount: float) -> None:
+        if not self.unlimited:
+            self.level -= min(amount, self.capacity)
+
+
+class ProviderLimiter:
+    def __init__(self, name: str, max_in_flight: int = 16, rpm: float = 0, tpm: float = 0,
+                 max_queue: int = 100, max_wait: float = 10.0):
+        self.name = name
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.in_flight = 0
+        self.metrics: Counter = Counter()
+        self.waits: Deque[float] = deque(maxlen=500)
+        self.max_depth = 0
+        self._service = 1.0                    # 占用时长的滑动平均（秒）/ EWMA of slot hold time (s)
+        self._waiters: Deque[List[Any]] = deque()   # [future, tokens]
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    # ---------- 获取 / 释放 ----------
+    def _ready_in(self, tokens: float, now: float) -> Optional[float]:
+        """None = 在途已满（等释放）；否则为令牌桶还需等待的秒数 / None = slots full; else bucket wait (s)"""
+        if self.in_flight >= self.max_in_flight:
+            return None
+        return max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+
+    def _grant(self, tokens: float) -> None:
+        self.in_flight += 1
+        self.requests.take(1)
+        self.tokens.take(tokens)
+
+    def estimate_wait(self, tokens: float, now: float) -> float:
+        """排在队尾的粗略等待：并发轮次 × 平均占用，与令牌桶补足时间取大 / rough wait at the back of the queue"""
+        ahead = len(self._waiters) + max(0, self.in_flight - self.max_in_flight + 1)
+        slots = math.ceil(ahead / self.max_in_flight) * self._service if ahead else 0.0
+        queued = sum(w[1] for w in self._waiters) + tokens
+        bucket = max(self.requests.wait_time(len(self._waiters) + 1, now), self.tokens.wait_time(queued, now))
+        return max(slots, bucket)
+
+    async def acquire(self, tokens: float = 0, deadline: Optional[float] = None) -> None:
+        """
+        拿到一个名额才返回；deadline 为 time.monotonic() 时刻，默认 now + max_wait
+        Returns once a slot is granted; `deadline` is a time.monotonic() instant (default now + max_wait)
+        """
+        now = time.monotonic()
+        deadline = min(deadline if deadline is not None else math.inf, now + self.max_wait)
+        if not self._waiters and self._ready_in(tokens, now) == 0:
+            self._grant(tokens)
+            self.metrics["immediate"] += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.metrics["rejected_full"] += 1
+            raise ProviderBusy(f"{self.name}: wait queue full ({self.max_queue})")
+        if now + self.estimate_wait(tokens, now) > deadline:
+            self.metrics["rejected_deadline"] += 1
+            raise ProviderBusy(f"{self.name}: estimated wait exceeds deadline")
+
+        waiter = [asyncio.get_running_loop().create_future(), tokens]
+        self._waiters.append(waiter)
+        self.max_depth = max(self.max_depth, len(self._waiters))
+        self._wake()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter[0]), max(deadline - now, 0))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter[0].done() and not waiter[0].cancelled():
+                self.release()                 # 刚拿到名额就被取消 / granted just as we gave up
+            else:
+                waiter[0].cancel()
+                self._remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.metrics["rejected_timeout"] += 1
+                raise ProviderBusy(f"{self.name}: timed out waiting for a slot") from None
+            raise
+        self.metrics["queued"] += 1
+        self.waits.append(time.monotonic() - now)
+
+    def release(self, held: Optional[float] = None) -> None:
+        self.in_flight -= 1
+        if held is not None:
+            self._service = 0.8 * self._service + 0.2 * held
+        self._wake()
+
+    def _remove(self, waiter: List[Any]) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        self._wake()
+
+    def _wake(self) -> None:
+        """按 FIFO 放行队首；令牌不足时定时重试 / Grant the head of the queue in FIFO order; re-arm a timer for buckets"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        now = time.monotonic()
+        while self._waiters:
+            future, tokens = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            delay = self._ready_in(tokens, now)
+            if delay is None:
+                return                         # 等 release / wait for a release
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._wake)
+                return
+            self._waiters.popleft()
+            self._grant(tokens)
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, tokens: float = 0, deadline: Optional[float] = None) -> AsyncIterator[None]:
+        await self.acquire(tokens, deadline)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = list(self.waits)
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": len(self._waiters),
+            "max_queue_depth": self.max_depth,
+            "wait_p50_ms": round(float(np.percentile(waits, 50)) * 1000, 1) if waits else None,
+            "wait_p95_ms": round(float(np.percentile(waits, 95)) * 1000, 1) if waits else None,
+            **{k: self.metrics[k] for k in ("immediate", "queued", "rejected_full",
+                                             "rejected_deadline", "rejected_timeout")},
+        }
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_limiter_loops: Dict[str, asyncio.AbstractEventLoop] = {}
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    """按服务商配置懒创建（按事件循环区分，同 llm_http.get_client）/ Created lazily per provider and event loop"""
+    from utils.llm_http import PROVIDERS
+
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(provider)
+    if limiter is None or _limiter_loops.get(provider) is not loop:
+        cfg = PROVIDERS[provider]
+        limiter = _limiters[provider] = ProviderLimiter(
+            provider, cfg.max_in_flight, cfg.rpm, cfg.tpm, cfg.max_queue, cfg.max_wait)
+        _limiter_loops[provider] = loop
+    return limiter
+
+
+def request_tokens(payload: Dict[str, Any]) -> int:
+    """估算一次请求消耗的 token（输入 + 输出上限）/ Estimated tokens for one request (input + output cap)"""
+    text = payload.get("messages") or payload.get("message") or payload.get("inputs") or ""
+    if not isinstance(text, str):
+        text = json.dumps(text, ensure_ascii=False)
+    text += payload.get("preamble") or ""
+    params = payload.get("parameters") or {}
+    output = payload.get("max_tokens") or params.get("max_new_tokens") or DEFAULT_OUTPUT_TOKENS
+    return estimate_tokens(text) + int(output)
+
+
+def limiter_stats() -> Dict[str, Any]:
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
@@ -0,0 +1,101 @@
+# utils/llm_providers.py
+# LLM 服务商插件注册表：只登记“模块路径 + 能力 -> 函数名”，第一次用到时才导入模块
+# Registry of LLM provider plugins. Only the module path and a capability -> attribute map are
+# recorded; the module (and httpx, the cache, its pools) is imported on first use, so workers
+# that never call an LLM do not pay for it at boot.
+#
+# 能力 / capabilities: reply, reply_stream, suggest, suggest_stream
+# 第三方插件 / third-party plugins: register_provider(...) 或环境变量
+#   LLM_PROVIDER_PLUGINS="name=package.module,other=pkg.mod"
+#   模块需提供 configured() 以及与能力同名的函数 / the module exposes configured() and
+#   functions named after the capabilities it supports
+
+from __future__ import annotations
+
+import importlib
+import os
+import threading
+from dataclasses import dataclass, field
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Optional
+
+CAPABILITIES = ("reply", "reply_stream", "suggest", "suggest_stream")
+
+
+@dataclass(frozen=True)
+class ProviderPlugin:
+    name: str
+    module: str                                          # 惰性导入的模块 / imported lazily
+    attrs: Dict[str, str] = field(default_factory=dict)  # 能力 -> 函数名 / capability -> attribute
+
+
+_plugins: Dict[str, ProviderPlugin] = {}
+_loaded: Dict[str, ModuleType] = {}
+_lock = threading.Lock()
+
+
+def register_provider(name: str, module: str, **attrs: str) -> ProviderPlugin:
+    """登记一个服务商（不导入）/ Register a provider without importing it"""
+    unknown = set(attrs) - set(CAPABILITIES)
+    if unknown:
+        raise ValueError(f"unknown capabilities for {name}: {', '.join(sorted(unknown))}")
+    plugin = _plugins[name] = ProviderPlugin(name, module, attrs or {c: c for c in CAPABILITIES})
+    _loaded.pop(name, None)
+    return plugin
+
+
+def providers(capability: Optional[str] = None) -> List[str]:
+    """已登记的服务商（可按能力过滤），保持登记顺序 / Registered providers, in registration order"""
+    return [n for n, p in _plugins.items() if capability is None or capability in p.attrs]
+
+
+def load(name: str) -> ModuleType:
+    """第一次调用时导入服务商模块 / Import the provider module on first use"""
+    module = _loaded.get(name)
+    if module is None:
+        with _lock:
+            module = _loaded.get(name)
+            if module is None:
+                if name not in _plugins:
+                    raise KeyError(f"unknown LLM provider: {name}")
+                module = _loaded[name] = importlib.import_module(_plugins[name].module)
+    return module
+
+
+def get(name: str, capability: str) -> Callable[..., Any]:
+    """取服务商的某项能力（会触发导入）/ Resolve a provider capability (imports the module)"""
+    plugin = _plugins.get(name)
+    if plugin is None or capability not in plugin.attrs:
+        raise KeyError(f"provider {name} does not support {capability}")
+    return getattr(load(name), plugin.attrs[capability])
+
+
+def configured(name: str) -> bool:
+    """是否配置了 API key；只读 llm_http 的配置，不导入服务商模块 / API key present? (does not import the plugin)"""
+    from utils.llm_http import PROVIDERS
+    cfg = PROVIDERS.get(name)
+    if cfg is not None:
+        return bool(cfg.api_key)
+    return bool(load(name).configured())
+
+
+def loaded() -> List[str]:
+    """已导入的服务商（/metrics 与启动基准用）/ Providers imported so far"""
+    return list(_loaded)
+
+
+# ---------- 内置服务商 / Built-in providers ----------
+register_provider("openai", "utils.openai_client",
+                  reply="generate_openai_reply", reply_stream="stream_openai_reply",
+                  suggest="suggest_activities_with_openai", suggest_stream="stream_openai_suggestions")
+register_provider("cohere", "utils.cohere_client",
+                  reply="generate_cohere_reply", reply_stream="stream_cohere_reply",
+                  suggest="suggest_activities_with_cohere", suggest_stream="stream_cohere_suggestions")
+register_provider("hf", "utils.hf_client",
+                  reply="generate_reply", reply_stream="stream_reply",
+                  suggest="suggest_activities_with_hf", suggest_stream="stream_hf_suggestions")
+
+for _entry in filter(None, os.getenv("LLM_PROVIDER_PLUGINS", "").split(",")):
+    _name, _, _module = _entry.partition("=")
+    if _name.strip() and _module.strip():
+        register_provider(_name.strip(), _module.strip())
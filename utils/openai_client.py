@@ -1,51 +1,62 @@
 # utils/openai_client.py
-# OpenAI 客户端（SDK v1 写法），统一输出短文本建议列表
+# OpenAI 客户端（chat/completions 接口，异步 + 共享连接池），统一输出短文本建议列表
+# OpenAI client (chat/completions over the shared async pool in utils/llm_http.py)
 
-import os
-from typing import List
-from openai import OpenAI
+import json
+from typing import AsyncIterator, List
 
-api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=api_key) if api_key else None
+from utils import prompt_builder
+from utils.llm_cache import cached_llm, cacheable_suggestions
+from utils.llm_http import PROVIDERS, post_json, stream_text
 
-def generate_openai_reply(prompt: str) -> str:
+MODEL = "gpt-4o-mini"
+
+def configured() -> bool:
+    return bool(PROVIDERS["openai"].api_key)
+
+def _configured_reply(text: str) -> bool:
+    """未配置时的提示不进缓存 / don't cache the "not configured" notice"""
+    return bool(text) and not text.startswith("OpenAI not configured")
+
+async def _chat(messages: List[dict], temperature: float, max_tokens: int) -> str:
+    result = await post_json("openai", "/chat/completions", {
+        "model": MODEL,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    })
+    return (result["choices"][0]["message"]["content"] or "").strip()
+
+@cached_llm("openai", MODEL, {"kind": "reply", "temperature": 0.7, "max_tokens": 300},
+            cacheable=_configured_reply)
+async def generate_openai_reply(prompt: str) -> str:
     """
     返回一段纯文本（用于展示/调试）
     """
-    if not client:
+    if not configured():
         return "OpenAI not configured: missing OPENAI_API_KEY"
 
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role":"user","content":prompt}],
-        temperature=0.7,
-        max_tokens=300
-    )
-    return resp.choices[0].message.content.strip()
+    return await _chat([{"role": "user", "content": prompt}], temperature=0.7, max_tokens=300)
 
-def suggest_activities_with_openai(prompt: str) -> List[dict]:
+SUGGEST_SYSTEM = prompt_builder.SUGGEST_SYSTEM  # 共享静态前缀 / shared static prefix
+_SUGGEST_MESSAGE = {"role": "system", "content": SUGGEST_SYSTEM}
+
+@cached_llm("openai", MODEL, {"kind": "suggest", "temperature": 0.6, "max_tokens": 400},
+            cacheable=cacheable_suggestions)
+async def suggest_activities_with_openai(prompt: str) -> List[dict]:
     """
     让模型输出 JSON 风格的活动建议（title/duration/tag）
     返回：[{title, duration, tag, reason}, ...]
     """
-    if not client:
+    if not configured():
         return []
 
-    sys = (
-        "You are an assistant that outputs kid-friendly activity suggestions. "
-        "Return 3-5 items as JSON array with fields: title (string), duration (int, minutes), "
-        "tag (one of skill, reading, sport, social, art), reason (string). No extra text."
-    )
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role":"system","content":sys},{"role":"user","content":prompt}],
-        temperature=0.6,
-        max_tokens=400
+    text = await _chat(
+        [_SUGGEST_MESSAGE, {"role": "user", "content": prompt}],
+        temperature=0.6, max_tokens=400,
     )
-    text = resp.choices[0].message.content.strip()
 
     # 简单兜底解析：如果不是严格 JSON，就包一层
-    import json
     try:
         data = json.loads(text)
         if isinstance(data, list):
@@ -54,3 +65,24 @@ def suggest_activities_with_openai(prompt: str) -> List[dict]:
     except Exception:
         # 解析失败时，退化为单条建议
         return [{"title": text[:40], "duration": 45, "tag": "skill", "reason": "AI free-form response"}]
+
+# ---------- 流式（SSE 接口用）/ Streaming (for the SSE endpoints) ----------
+def stream_openai_reply(prompt: str) -> AsyncIterator[str]:
+    """逐段产出回复文本 / Yield the reply text chunk by chunk"""
+    return stream_text("openai", "/chat/completions", {
+        "model": MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.7,
+        "max_tokens": 300,
+        "stream": True,
+    })
+
+def stream_openai_suggestions(prompt: str) -> AsyncIterator[str]:
+    """逐段产出建议 JSON 数组的原文 / Yield the raw suggestion JSON array chunk by chunk"""
+    return stream_text("openai", "/chat/completions", {
+        "model": MODEL,
+        "messages": [_SUGGEST_MESSAGE, {"role": "user", "content": prompt}],
+        "temperature": 0.6,
+        "max_tokens": 400,
+        "stream": True,
+    })
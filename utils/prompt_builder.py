@@ -1,27 +1,154 @@
 # utils/prompt_builder.py
+# 提示词模板：模板在导入时编译一次；静态说明放在最前面（服务商可复用缓存的前缀），
+# 动态的用户画像放在后面，并按 token 预算裁掉低价值字段。
+# Prompt templates, compiled once at import. Static instructions come first so providers can
+# reuse a cached prefix; the dynamic profile goes last and is trimmed to a token budget by
+# dropping low-value fields first.
+#
+# 环境变量 / env: PROMPT_PROFILE_TOKENS(300)  用户画像部分的 token 上限 / token budget for the profile section
 
-def build_prompt(user_profile):
+import os
+import string
+from typing import List, Optional, Sequence, Tuple
+
+PROFILE_TOKEN_BUDGET = int(os.getenv("PROMPT_PROFILE_TOKENS", "300"))
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算：ASCII 约 4 字符 1 token，其余（中文等）每字 1 token / ~4 ASCII chars per token, 1 per CJK char"""
+    ascii_chars = sum(1 for ch in text if ch < "\x80")
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+class PromptTemplate:
     """
-    Construct a natural language prompt from the user profile
-    to send to an LLM (OpenAI, Cohere, etc.) for recommendation explanation.
+    static: 不含占位符的说明文字（前缀，逐字不变）/ instructions without placeholders (a byte-stable prefix)
+    body:   含 {field} 占位符的动态部分，编译成 (文字, 字段) 片段 / dynamic part, compiled to (literal, field) pieces
     """
 
-    name = user_profile.name
-    age = user_profile.age
-    goals = ", ".join(user_profile.goals)
-    interests = ", ".join(user_profile.survey.get("interests", []))
-    availability = ", ".join(user_profile.availability)
+    def __init__(self, static: str, body: str):
+        self.static = static.strip() + "\n\n"
+        self._pieces: List[Tuple[str, Optional[str]]] = [
+            (literal, field) for literal, field, _, _ in string.Formatter().parse(body)
+        ]
+        self.fields = [f for _, f in self._pieces if f]
+
+    def render(self, **values: str) -> str:
+        out = [self.static]
+        for literal, field in self._pieces:
+            out.append(literal)
+            if field:
+                out.append(values.get(field, ""))
+        return "".join(out)
+
+
+# ---------- 模板 / Templates ----------
+REASON_TEMPLATE = PromptTemplate(
+    static="""
+You are a personalized growth planner AI.
+Explain in natural English why the recommended tasks suit this user, based on their interests,
+goals and available time. Keep it short, concrete and encouraging.
+""",
+    body="User profile:\n{profile}",
+)
+
+BATCH_REASON_TEMPLATE = PromptTemplate(
+    static="""
+You are a personalized growth planner AI.
+For EACH task id listed below, write one short, encouraging sentence explaining why it fits this user.
+Return only a JSON object mapping id to sentence, e.g. {"t1": "...", "t2": "..."}.
+""",
+    body="User profile:\n{profile}\n\nRecommended tasks:\n{tasks}",
+)
+
+# 活动建议的系统提示词（三个服务商共用同一前缀）/ suggestion system prompt, one shared prefix for every provider
+SUGGEST_SYSTEM = (
+    "You are an assistant that outputs kid-friendly activity suggestions. "
+    "Return 3-5 items as JSON array with fields: title (string), duration (int, minutes), "
+    "tag (one of skill, reading, sport, social, art), reason (string). No extra text."
+)
+
+
+# ---------- 用户画像 / Profile section ----------
+def _availability_text(availability) -> str:
+    """Availability 模型 / 旧的字符串列表 -> "Mon 19:00-20:00; Sat 10:00-12:00" """
+    if isinstance(availability, (list, tuple)):
+        return ", ".join(str(a) for a in availability)
+    weekly = getattr(getattr(availability, "template", None), "weekly", None) or {}
+    parts = []
+    for wd in sorted(weekly, key=lambda d: WEEKDAYS.index(d) if d in WEEKDAYS else 7):
+        blocks = ", ".join(f"{b.start}-{b.end}" for b in weekly[wd])
+        if blocks:
+            parts.append(f"{wd} {blocks}")
+    return "; ".join(parts)
 
-    prompt = f"""
-You are a personalized growth planner AI. Here is a user profile:
 
-Name: {name}
-Age: {age}
-Goals: {goals}
-Interests: {interests}
-Available Time: {availability}
+def profile_fields(user_profile) -> List[Tuple[str, str]]:
+    """
+    (标签, 值)，按价值从高到低；空字段省略 / (label, value) pairs, most valuable first; empty fields omitted
+    兼容旧画像里的 age / goals / survey 字典 / also reads age, goals and a survey dict from older profiles
+    """
+    from utils.interest_extractor import extract_interest_from_survey
+
+    survey = getattr(user_profile, "survey", "") or ""
+    if isinstance(survey, dict):
+        interests = survey.get("interests") or extract_interest_from_survey(survey)
+        survey_text = ""
+    else:
+        interests = extract_interest_from_survey(survey) if survey else []
+        survey_text = survey
+    goals = getattr(user_profile, "goals", None) or []
+
+    fields = [
+        ("Interests", ", ".join(interests)),
+        ("Goals", ", ".join(goals)),
+        ("Available time", _availability_text(getattr(user_profile, "availability", None))),
+        ("Age", str(getattr(user_profile, "age", "") or "")),
+        ("Name", getattr(user_profile, "name", "") or ""),
+        ("Survey", " ".join(survey_text.split())),
+    ]
+    return [(label, value) for label, value in fields if value]
+
+
+def fit_profile(fields: Sequence[Tuple[str, str]], budget: int = PROFILE_TOKEN_BUDGET) -> str:
+    """
+    按预算裁剪：从最低价值的字段开始，先截短再整体去掉；最高价值字段只截短
+    Trim to the budget from the least valuable field up: shorten it, or drop it entirely;
+    the most valuable field is only ever shortened.
+    """
+    lines = [f"{label}: {value}" for label, value in fields]
+    total = sum(estimate_tokens(line) + 1 for line in lines)
+    i = len(lines) - 1
+    while total > budget and i >= 0:
+        cost = estimate_tokens(lines[i]) + 1
+        room = cost - (total - budget)            # 这一行最多还能占的 token / tokens this line may still use
+        if room < 8 and i > 0:                    # 剩不下几个 token 就整行去掉 / too little would remain: drop it
+            lines.pop(i)
+            total -= cost
+        else:
+            line, keep = lines[i], len(lines[i]) * max(room, 1) // cost
+            while keep > 0 and estimate_tokens(line[:keep].rstrip() + "…") + 1 > max(room, 2):
+                keep -= max(keep // 16, 1)
+            lines[i] = line[:keep].rstrip() + "…"
+            total += estimate_tokens(lines[i]) + 1 - cost
+        i -= 1
+    return "\n".join(lines)
+
+
+def build_prompt(user_profile, budget: int = PROFILE_TOKEN_BUDGET):
+    """
+    Construct a natural language prompt from the user profile
+    to send to an LLM (OpenAI, Cohere, etc.) for recommendation explanation.
+    The static instructions come first; the profile is trimmed to `budget` tokens.
+    """
+    return REASON_TEMPLATE.render(profile=fit_profile(profile_fields(user_profile), budget))
 
-Please explain in natural English why the following task was recommended to this user based on their goals, interests, and available time.
-    """.strip()
 
-    return prompt
+def build_batch_reason_prompt(user_profile, task_lines: Sequence[str], budget: int = PROFILE_TOKEN_BUDGET):
+    """整份计划一次调用的提示词 / Prompt explaining a whole plan in one call"""
+    return BATCH_REASON_TEMPLATE.render(
+        profile=fit_profile(profile_fields(user_profile), budget),
+        tasks="\n".join(task_lines),
+    )
@@ -1,40 +1,518 @@
 # utils/schedule_optimizer.py
 # 任务安排优化器 / Task Scheduling Optimizer
+#
+# 把任务装进用户“可用时间段 − 已有事件”的空闲区间里：
+#   - 按优先级（高→低）、时长（长→短）贪心放置
+#   - 每天不超过 max_minutes_per_day 分钟的任务量
+#   - 结合 contextual_rules 的时段类型，优先放在合适的时段
+#   - 可选：有上限的局部搜索（同时长任务互换）提高整体匹配度
+#
+# Packs tasks into free intervals = resolved availability blocks minus existing events:
+#   - greedy by priority (desc) then duration (desc)
+#   - at most max_minutes_per_day of task time per day
+#   - prefers time-of-day slots suited to the task tag (contextual_rules)
+#   - optional bounded local search (swap equal-duration tasks) to raise total suitability
+#
+# 复杂度 / Complexity (n = tasks, F = free intervals over the horizon, H = 24):
+#   - 构建空闲区间 / building free intervals:  O(D·(B log B + E log E))  (D days, B blocks, E events)
+#   - 排序 / sorting:                           O(n log n)
+#   - 贪心放置 / greedy placement:               O(n · F · H) worst case; a task stops scanning at
+#     the first fully suitable slot, so the typical cost is far below the bound
+#   - 局部搜索 / local search:                   O(max_improve_steps)
+#   - 增量修复 / incremental repair:             proportional to the affected days, see SchedulePlan.repair
 
-from typing import List, Dict
+from __future__ import annotations
 
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-def generate_schedule(task_list: List[Dict]) -> List[Dict]:
+from recommender.contextual_rules import hour_types, time_suitability
+
+# 未提供可用时间时的默认每日窗口 / Default daily window when no availability is given
+DEFAULT_DAY_WINDOW = ("09:00", "21:00")
+# 每天任务总时长上限（分钟）/ Default cap of task minutes per day
+DEFAULT_MAX_MINUTES_PER_DAY = 180
+DEFAULT_DURATION = 30
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+# ========== 时间工具 / Time helpers ==========
+def hhmm_to_minutes(value: str) -> int:
+    h, m = value.split(":")
+    return int(h) * 60 + int(m)
+
+
+def minutes_to_hhmm(value: int) -> str:
+    return f"{value // 60:02d}:{value % 60:02d}"
+
+
+def _merge(intervals: Iterable[Tuple[int, int]]) -> List[List[int]]:
+    """合并重叠区间 / Merge overlapping [start, end) intervals. O(k log k)"""
+    out: List[List[int]] = []
+    for s, e in sorted(intervals):
+        if e <= s:
+            continue
+        if out and s <= out[-1][1]:
+            out[-1][1] = max(out[-1][1], e)
+        else:
+            out.append([s, e])
+    return out
+
+
+def _subtract(blocks: List[List[int]], busy: List[List[int]]) -> List[List[int]]:
+    """可用区间减去忙碌区间（两者均已排序合并）/ blocks − busy, both sorted & merged. O(b + e)"""
+    free: List[List[int]] = []
+    j = 0
+    for s, e in blocks:
+        cur = s
+        while j < len(busy) and busy[j][1] <= cur:
+            j += 1
+        k = j
+        while k < len(busy) and busy[k][0] < e:
+            if busy[k][0] > cur:
+                free.append([cur, busy[k][0]])
+            cur = max(cur, busy[k][1])
+            k += 1
+        if cur < e:
+            free.append([cur, e])
+    return free
+
+
+def _slot_types(day: date, age: Optional[int] = None) -> List[str]:
+    """当天每小时的时段类型（编译好的规则表，O(1)）/ Time-slot type for each hour (compiled rules, O(1))"""
+    return hour_types(day.weekday(), age)
+
+
+def _to_local(dt: datetime, tz_name: str) -> datetime:
+    """带时区的事件时间转为可用时间所在的本地时间 / Convert aware datetimes to the availability's wall clock"""
+    if dt.tzinfo is None:
+        return dt
+    if tz_name and tz_name != "local":
+        try:
+            from zoneinfo import ZoneInfo
+            return dt.astimezone(ZoneInfo(tz_name)).replace(tzinfo=None)
+        except Exception:
+            pass
+    return dt.astimezone().replace(tzinfo=None)
+
+
+def _event_span(ev: Any) -> Tuple[Optional[datetime], Optional[datetime], bool]:
+    """兼容 Event ORM 对象与前端 dict / Accept Event ORM objects or FullCalendar-style dicts"""
+    if isinstance(ev, dict):
+        start, end = ev.get("start"), ev.get("end")
+        all_day = bool(ev.get("allDay", ev.get("all_day", False)))
+    else:
+        start, end = getattr(ev, "start", None), getattr(ev, "end", None)
+        all_day = bool(getattr(ev, "all_day", False))
+    if isinstance(start, str):
+        start = datetime.fromisoformat(start.replace("Z", "+00:00"))
+    if isinstance(end, str):
+        end = datetime.fromisoformat(end.replace("Z", "+00:00"))
+    if start is not None and end is None:
+        end = start + timedelta(hours=1)
+    return start, end, all_day
+
+
+def event_spans(ev: Any, tz_name: str = "local") -> Dict[date, List[Tuple[int, int]]]:
+    """单个事件按天拆成忙碌区间 / Split one event into per-day busy spans (minutes of day)"""
+    out: Dict[date, List[Tuple[int, int]]] = {}
+    start, end, all_day = _event_span(ev)
+    if start is None or end is None:
+        return out
+    start, end = _to_local(start, tz_name), _to_local(end, tz_name)
+    if all_day:
+        start = datetime.combine(start.date(), datetime.min.time())
+        end = max(end, start + timedelta(days=1))
+    d = start.date()
+    while datetime.combine(d, datetime.min.time()) < end:
+        day_start = datetime.combine(d, datetime.min.time())
+        s = max(start, day_start)
+        e = min(end, day_start + timedelta(days=1))
+        out.setdefault(d, []).append((int((s - day_start).total_seconds() // 60),
+                                      int(-(-(e - day_start).total_seconds() // 60))))
+        d += timedelta(days=1)
+    return out
+
+
+def busy_by_day(events: Iterable[Any], tz_name: str = "local") -> Dict[date, List[List[int]]]:
+    """把事件拆成按天的忙碌区间 / Split events into per-day busy intervals (minutes of day)"""
+    raw: Dict[date, List[Tuple[int, int]]] = {}
+    for ev in events or []:
+        for d, spans in event_spans(ev, tz_name).items():
+            raw.setdefault(d, []).extend(spans)
+    return {d: _merge(v) for d, v in raw.items()}
+
+
+def _event_id(ev: Any, fallback: int) -> str:
+    ev_id = ev.get("id") if isinstance(ev, dict) else getattr(ev, "id", None)
+    return str(ev_id) if ev_id is not None else f"_event_{fallback}"
+
+
+def _resolve_blocks(availability: Any, day: date) -> List[List[int]]:
+    """展开某天的可用时间段 / Resolved availability blocks for one day, in minutes"""
+    if availability is None:
+        s, e = DEFAULT_DAY_WINDOW
+        return [[hhmm_to_minutes(s), hhmm_to_minutes(e)]]
+    blocks = availability.resolve_for(day)
+    return _merge((hhmm_to_minutes(b.start), hhmm_to_minutes(b.end)) for b in blocks)
+
+
+class _TagScores(dict):
+    """按需计算并缓存某标签在各时段类型的匹配度 / Lazily cached suitability of one tag per task type"""
+
+    def __init__(self, tag: str):
+        super().__init__()
+        self.tag = tag
+
+    def __missing__(self, task_type: str) -> float:
+        score = self[task_type] = time_suitability(self.tag, task_type)
+        return score
+
+
+# ========== 排程状态 / Plan state ==========
+@dataclass
+class Placement:
+    task_index: int
+    day: date
+    start: int      # 当天分钟数 / minute of day
+    end: int
+    task_type: str
+    score: float
+
+
+@dataclass
+class DayPlan:
+    day: date
+    blocks: List[List[int]]                        # 当天可用时间段 / availability blocks
+    busy: List[List[int]] = field(default_factory=list)
+    free: List[List[int]] = field(default_factory=list)
+    used: int = 0                                  # 已安排任务分钟数 / task minutes placed
+    hour_types: List[str] = field(default_factory=list)
+
+    def rebuild_free(self) -> None:
+        self.free = _subtract(self.blocks, self.busy)
+        self.used = 0
+
+    def best_start(self, duration: int, scores: "_TagScores", budget: int) -> Optional[Tuple[float, int, int]]:
+        """
+        当天最佳开始时间：匹配度最高、其次最早 / Best start on this day: highest suitability, then earliest.
+        返回 (score, start, free_index) / returns (score, start, free_index); O(F_day · H)
+        """
+        if self.used + duration > budget:
+            return None
+        best: Optional[Tuple[float, int, int]] = None
+        for idx, (s, e) in enumerate(self.free):
+            latest = e - duration
+            if latest < s:
+                continue
+            score = scores[self.hour_types[(s // 60) % 24]]
+            if best is None or score > best[0]:
+                best = (score, s, idx)
+            h = s // 60 + 1
+            while score < 1.0 and h * 60 <= latest:
+                cand = scores[self.hour_types[h % 24]]
+                if cand > best[0]:
+                    best = (cand, h * 60, idx)
+                    score = cand
+                h += 1
+            if best[0] >= 1.0:
+                break
+        return best
+
+    def find_free(self, start: int, end: int) -> Optional[int]:
+        """包含 [start, end) 的空闲区间下标 / Index of the free interval containing [start, end)"""
+        for idx, (s, e) in enumerate(self.free):
+            if s <= start and end <= e:
+                return idx
+            if s > start:
+                break
+        return None
+
+    def occupy(self, free_index: int, start: int, duration: int) -> None:
+        s, e = self.free[free_index]
+        parts = [p for p in ([s, start], [start + duration, e]) if p[1] > p[0]]
+        self.free[free_index:free_index + 1] = parts
+        self.used += duration
+
+
+class SchedulePlan:
+    """
+    排程结果 + 放置状态（供增量修复复用）
+    Schedule result plus placement state (kept for incremental repair).
     """
-    模拟任务时间安排生成器。
-    Simulated scheduler that returns tasks with mock start/end times.
 
-    参数 / Params:
-        task_list (List[Dict]): 原始任务列表，如 [{'name': 'Read', 'duration': 30}]
+    def __init__(self, tasks: List[Dict], days: Dict[date, DayPlan], max_minutes_per_day: int,
+                 tz_name: str = "local"):
+        self.tasks = tasks
+        self.days = days
+        self.max_minutes_per_day = max_minutes_per_day
+        self.tz_name = tz_name
+        self.placements: Dict[int, Placement] = {}
+        self.unplaced: set = set()
+        # 事件 ID -> 按天的忙碌区间 / event id -> per-day busy spans
+        self.event_spans: Dict[str, Dict[date, List[Tuple[int, int]]]] = {}
+        # 天 -> 当天的事件 ID / day -> ids of events touching that day
+        self._day_events: Dict[date, set] = {}
+        # 天 -> 当天已放置的任务下标 / day -> indices of tasks placed on that day
+        self._day_tasks: Dict[date, set] = {}
+        self._tag_scores: Dict[str, _TagScores] = {}
 
-    返回 / Returns:
-        List[Dict]: 增加了开始和结束时间的任务列表
+    def _scores(self, tag: str) -> "_TagScores":
+        """标签 -> {时段类型: 匹配度} 的缓存 / memoized {task type: suitability} per tag"""
+        scores = self._tag_scores.get(tag)
+        if scores is None:
+            scores = self._tag_scores[tag] = _TagScores(tag)
+        return scores
+
+    def _assign(self, p: Placement) -> None:
+        self.placements[p.task_index] = p
+        self._day_tasks.setdefault(p.day, set()).add(p.task_index)
+
+    def _unassign(self, task_index: int) -> Placement:
+        p = self.placements.pop(task_index)
+        self._day_tasks[p.day].discard(task_index)
+        return p
+
+    def set_event_spans(self, event_id: str, spans: Dict[date, List[Tuple[int, int]]]) -> List[date]:
+        """
+        记录/替换/删除（spans 为空）一个事件；返回受影响的天（新旧并集，限排程范围内）
+        Record, replace or drop (empty spans) one event; returns affected days within the horizon.
+        """
+        old = self.event_spans.pop(event_id, {})
+        for d in old:
+            self._day_events.get(d, set()).discard(event_id)
+        if spans:
+            self.event_spans[event_id] = spans
+            for d in spans:
+                self._day_events.setdefault(d, set()).add(event_id)
+        return sorted(d for d in set(old) | set(spans) if d in self.days)
+
+    def busy_for(self, day: date) -> List[List[int]]:
+        """当天忙碌区间（只看当天的事件）/ Busy intervals of one day, from that day's events only"""
+        ids = self._day_events.get(day, ())
+        return _merge(span for ev_id in ids for span in self.event_spans[ev_id].get(day, ()))
+
+    # ---------- 贪心放置 / Greedy placement ----------
+    def _order(self, indices: Iterable[int]) -> List[int]:
+        """优先级降序、时长降序 / priority desc, duration desc. O(n log n)"""
+        return sorted(indices, key=lambda i: (-_priority(self.tasks[i]), -_duration(self.tasks[i]), i))
+
+    def place(self, indices: Iterable[int], days: Optional[List[date]] = None) -> List[int]:
+        """
+        把任务放进指定天（默认全部）；返回放不下的任务下标
+        Place tasks into the given days (all by default); returns indices that did not fit.
+        """
+        candidates = [self.days[d] for d in (days if days is not None else sorted(self.days))]
+        unplaced: List[int] = []
+        for i in self._order(indices):
+            task = self.tasks[i]
+            duration, scores = _duration(task), self._scores(_tag(task))
+            best: Optional[Tuple[float, int, int, DayPlan]] = None
+            for dp in candidates:
+                found = dp.best_start(duration, scores, self.max_minutes_per_day)
+                if found and (best is None or found[0] > best[0]):
+                    best = (found[0], found[1], found[2], dp)
+                    if found[0] >= 1.0:
+                        break
+            if best is None:
+                unplaced.append(i)
+                continue
+            score, start, free_index, dp = best
+            dp.occupy(free_index, start, duration)
+            self._assign(Placement(i, dp.day, start, start + duration,
+                                   dp.hour_types[(start // 60) % 24], score))
+        return unplaced
+
+    # ---------- 局部搜索 / Local search ----------
+    def improve(self, max_steps: int = 200) -> int:
+        """
+        同时长任务互换位置，若总匹配度提升则接受；最多检查 max_steps 对
+        Swap equal-duration tasks when it raises total suitability; checks at most max_steps pairs.
+        互换不改变空闲区间与每日用量，因此始终可行 / Swaps keep free intervals and daily usage unchanged.
+        """
+        groups: Dict[int, List[int]] = {}
+        for i in self.placements:
+            groups.setdefault(_duration(self.tasks[i]), []).append(i)
+        steps = swaps = 0
+        for members in groups.values():
+            for a_pos in range(len(members)):
+                for b_pos in range(a_pos + 1, len(members)):
+                    if steps >= max_steps:
+                        return swaps
+                    steps += 1
+                    pa, pb = self.placements[members[a_pos]], self.placements[members[b_pos]]
+                    ta, tb = _tag(self.tasks[pa.task_index]), _tag(self.tasks[pb.task_index])
+                    if ta == tb:
+                        continue
+                    na, nb = self._scores(ta)[pb.task_type], self._scores(tb)[pa.task_type]
+                    if na + nb > pa.score + pb.score:
+                        self._unassign(pa.task_index)
+                        self._unassign(pb.task_index)
+                        pa.day, pb.day = pb.day, pa.day
+                        pa.start, pb.start = pb.start, pa.start
+                        pa.end, pb.end = pb.end, pa.end
+                        pa.task_type, pb.task_type = pb.task_type, pa.task_type
+                        pa.score, pb.score = na, nb
+                        self._assign(pa)
+                        self._assign(pb)
+                        swaps += 1
+        return swaps
+
+    # ---------- 增量修复 / Incremental repair ----------
+    def upsert_event(self, event_id: str, event: Any) -> Dict[str, Any]:
+        """新增或移动一个事件后修复排程 / Repair the plan after an event is inserted or moved"""
+        days = self.set_event_spans(str(event_id), event_spans(event, self.tz_name))
+        return self.repair(days)
+
+    def remove_event(self, event_id: str) -> Dict[str, Any]:
+        """删除一个事件后修复排程 / Repair the plan after an event is deleted"""
+        days = self.set_event_spans(str(event_id), {})
+        return self.repair(days)
+
+    def repair(self, days: List[date]) -> Dict[str, Any]:
+        """
+        只重建受影响天的空闲区间：仍可行的放置原地保留，冲突的任务重新放置，
+        之前放不下的任务尝试填入这些天新空出的时间。
+
+        Rebuild free intervals of the affected days only: placements that still fit stay put,
+        conflicting tasks are re-placed (nearest days first), and previously unplaced tasks
+        may take newly freed time on those days.
+
+        复杂度 / Complexity: O(k log k + m·D·F_day·H + u·A·F_day·H), where k = tasks on the
+        affected days, m = displaced tasks, u = unplaced tasks, A = affected days —
+        independent of the total number of placed tasks.
+        """
+        before: Dict[int, Optional[Placement]] = {}
+        displaced: List[int] = []
+        for d in days:
+            dp = self.days[d]
+            dp.busy = self.busy_for(d)
+            dp.rebuild_free()
+            keep = sorted(self._day_tasks.get(d, ()),
+                          key=lambda i: (-_priority(self.tasks[i]), self.placements[i].start))
+            for i in keep:
+                p = self.placements[i]
+                idx = dp.find_free(p.start, p.end)
+                if idx is not None and dp.used + (p.end - p.start) <= self.max_minutes_per_day:
+                    dp.occupy(idx, p.start, p.end - p.start)
+                else:
+                    before[i] = self._unassign(i)
+                    displaced.append(i)
+
+        if displaced:
+            nearest = sorted(self.days, key=lambda x: (min(abs((x - a).days) for a in days), x))
+            self.unplaced.update(self.place(displaced, days=nearest))
+        retry = [i for i in self.unplaced if i not in before]
+        if retry and days:
+            for i in retry:
+                before[i] = None
+            self.unplaced.difference_update(retry)
+            self.unplaced.update(self.place(retry, days=days))
+
+        moved = []
+        for i, old in before.items():
+            new = self.placements.get(i)
+            if old is None and new is None:
+                continue
+            moved.append({
+                "name": self.tasks[i].get("name", "Unnamed Task"),
+                "from": _slot_dict(old),
+                "to": _slot_dict(new),
+            })
+        return {"affected_days": [d.isoformat() for d in days], "moved": moved}
+
+    # ---------- 输出 / Output ----------
+    def to_list(self) -> List[Dict]:
+        out: List[Dict] = []
+        for i, task in enumerate(self.tasks):
+            p = self.placements.get(i)
+            out.append({
+                "name": task.get("name", "Unnamed Task"),
+                "duration": _duration(task),
+                "tag": _tag(task),
+                "priority": _priority(task),
+                "date": p.day.isoformat() if p else None,
+                "start_time": minutes_to_hhmm(p.start) if p else None,
+                "end_time": minutes_to_hhmm(p.end) if p else None,
+                "task_type": p.task_type if p else None,
+            })
+        # 已安排的按时间排序，未安排的放在最后 / scheduled first by time, unscheduled last
+        out.sort(key=lambda x: (x["date"] is None, x["date"] or "", x["start_time"] or ""))
+        return out
+
+
+def _slot_dict(p: Optional[Placement]) -> Optional[Dict[str, str]]:
+    if p is None:
+        return None
+    return {"date": p.day.isoformat(), "start_time": minutes_to_hhmm(p.start), "end_time": minutes_to_hhmm(p.end)}
+
+
+def _duration(task: Dict) -> int:
+    return int(task.get("duration", DEFAULT_DURATION))
+
+
+def _priority(task: Dict) -> int:
+    return int(task.get("priority", 0) or 0)
+
+
+def _tag(task: Dict) -> str:
+    return task.get("tag", "") or ""
+
+
+def build_plan(
+    task_list: List[Dict],
+    availability: Any = None,
+    events: Optional[Iterable[Any]] = None,
+    start_day: Optional[date] = None,
+    days: int = 7,
+    max_minutes_per_day: int = DEFAULT_MAX_MINUTES_PER_DAY,
+    improve: bool = False,
+    max_improve_steps: int = 200,
+    age: Optional[int] = None,
+) -> SchedulePlan:
     """
-    scheduled_tasks = []
-    current_start = 9 * 60  # 从早上9:00开始，以分钟计 / Start at 9:00 AM
+    构建排程状态 / Build the schedule plan state.
 
-    for task in task_list:
-        name = task.get("name", "Unnamed Task")
-        duration = task.get("duration", 30)  # 默认为30分钟
+    参数 / Params:
+        task_list: [{'name': 'Read', 'duration': 30, 'priority': 1, 'tag': 'reading'}, ...]
+        availability: models.user_profile.Availability（None = 每天 09:00-21:00）
+        events: 已有事件（Event 对象或 {start, end, allDay} dict）/ existing events
+        start_day / days: 排程范围 / planning horizon
+        max_minutes_per_day: 每天任务总时长上限 / daily cap of task minutes
+        improve: 是否执行局部搜索 / run the bounded local search
+        age: 孩子年龄，用于年龄相关的时段规则 / child age for age-specific time rules
+    """
+    start_day = start_day or date.today()
+    tz_name = getattr(availability, "timezone", "local") if availability is not None else "local"
 
-        start_hour = current_start // 60
-        start_min = current_start % 60
-        end_time = current_start + duration
-        end_hour = end_time // 60
-        end_min = end_time % 60
+    plan_days: Dict[date, DayPlan] = {}
+    for offset in range(days):
+        d = start_day + timedelta(days=offset)
+        plan_days[d] = DayPlan(day=d, blocks=_resolve_blocks(availability, d),
+                               hour_types=_slot_types(d, age))
 
-        scheduled_tasks.append({
-            "name": name,
-            "duration": duration,
-            "start_time": f"{start_hour:02d}:{start_min:02d}",
-            "end_time": f"{end_hour:02d}:{end_min:02d}"
-        })
+    plan = SchedulePlan(list(task_list), plan_days, max_minutes_per_day, tz_name)
+    for n, ev in enumerate(events or []):
+        plan.set_event_spans(_event_id(ev, n), event_spans(ev, tz_name))
+    for dp in plan_days.values():
+        dp.busy = plan.busy_for(dp.day)
+        dp.rebuild_free()
+    plan.unplaced = set(plan.place(range(len(plan.tasks))))
+    if improve:
+        plan.improve(max_improve_steps)
+    return plan
 
-        current_start = end_time  # 下一个任务的开始时间 / Update current_start
 
-    return scheduled_tasks
+def generate_schedule(task_list: List[Dict], **kwargs) -> List[Dict]:
+    """
+    任务时间安排生成器 / Constraint-aware task scheduler.
+
+    参数 / Params:
+        task_list (List[Dict]): 原始任务列表，如 [{'name': 'Read', 'duration': 30}]
+        **kwargs: 见 build_plan（availability, events, start_day, days, max_minutes_per_day, improve, age）
+
+    返回 / Returns:
+        List[Dict]: 增加了 date/start_time/end_time/task_type 的任务列表；放不下的任务这些字段为 None
+    """
+    return build_plan(task_list, **kwargs).to_list()
@@ -0,0 +1,130 @@
+# utils/single_flight.py
+# 相同请求合并（single-flight）：同一 key 同时只有一个上游调用，其余调用者等待并共享结果
+# Single-flight: at most one upstream call per key at a time; concurrent callers with the
+# same key wait for it and share its result (or its exception).
+#
+# - 超时 / per-key timeout: 每个在途调用有截止时间；等待者最多等到截止时间，过期后新调用者会发起新的请求
+#   each flight has a deadline; waiters give up at the deadline, and later callers start a fresh call
+# - 错误 / errors: 上游异常原样抛给所有等待者 / the upstream exception is raised in every waiter
+# - async: 上游调用在独立 Task 中运行，单个调用者取消不会中断其他人；所有调用者都离开时才取消上游
+#   the upstream call runs in its own Task, so one cancelled caller does not cancel the others;
+#   it is cancelled only once every caller has left
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+DEFAULT_TIMEOUT = float(os.getenv("LLM_COALESCE_TIMEOUT", "60"))
+
+
+@dataclass
+class _Flight:
+    deadline: float
+    future: Any                                   # concurrent.futures.Future | asyncio.Task
+    waiters: int = field(default=1)               # 含发起者 / includes the caller that started it
+
+
+class SingleFlight:
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self.metrics: Counter = Counter()
+        self._lock = threading.Lock()
+        self._sync: Dict[str, _Flight] = {}
+        self._async: Dict[tuple, _Flight] = {}
+
+    # ---------- 同步（线程）/ Sync (threads) ----------
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """同 key 的并发调用只执行一次 fn / Run fn once for all concurrent callers with this key"""
+        now = time.monotonic()
+        with self._lock:
+            flight = self._sync.get(key)
+            if flight is not None and flight.deadline <= now:
+                self._sync.pop(key)      # 超时的调用不再被复用 / expired flights are not joined
+                flight = None
+            leader = flight is None
+            if leader:
+                flight = self._sync[key] = _Flight(now + (timeout or self.timeout), concurrent.futures.Future())
+                self.metrics["calls"] += 1
+            else:
+                flight.waiters += 1
+                self.metrics["coalesced"] += 1
+
+        if not leader:
+            try:
+                return flight.future.result(timeout=max(flight.deadline - time.monotonic(), 0))
+            except concurrent.futures.TimeoutError:
+                self.metrics["timeouts"] += 1
+                raise TimeoutError(f"single-flight wait timed out for key {key[:16]}")
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self.metrics["errors"] += 1
+            flight.future.set_exception(e)
+            raise
+        else:
+            flight.future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                if self._sync.get(key) is flight:
+                    del self._sync[key]
+
+    # ---------- 异步 / Async ----------
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """async 版本；按事件循环区分 / Async variant, keyed per event loop"""
+        loop = asyncio.get_running_loop()
+        full_key = (id(loop), key)
+        now = time.monotonic()
+        flight = self._async.get(full_key)
+        if flight is not None and (flight.deadline <= now or flight.future.done()):
+            self._async.pop(full_key)
+            flight = None
+        if flight is None:
+            task = loop.create_task(fn())
+            flight = self._async[full_key] = _Flight(now + (timeout or self.timeout), task)
+            self.metrics["calls"] += 1
+            task.add_done_callback(lambda t, f=flight: self._finish(full_key, f, t))
+        else:
+            flight.waiters += 1
+            self.metrics["coalesced"] += 1
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight.future),
+                                          max(flight.deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            self.metrics["timeouts"] += 1
+            self._leave(flight)
+            raise TimeoutError(f"single-flight wait timed out for key {key[:16]}")
+        except asyncio.CancelledError:
+            self._leave(flight)
+            raise
+
+    def _leave(self, flight: _Flight) -> None:
+        """调用者放弃等待；最后一个离开时取消上游 / A caller stopped waiting; the last one cancels upstream"""
+        flight.waiters -= 1
+        if flight.waiters <= 0 and not flight.future.done():
+            flight.future.cancel()
+            self.metrics["cancelled"] += 1
+
+    def _finish(self, full_key: tuple, flight: _Flight, task: asyncio.Task) -> None:
+        if self._async.get(full_key) is flight:
+            del self._async[full_key]
+        if not task.cancelled() and task.exception() is not None:
+            self.metrics["errors"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **{k: self.metrics[k] for k in ("calls", "coalesced", "timeouts", "errors", "cancelled")},
+            "in_flight": len(self._sync) + len(self._async),
+        }
+
+
+flights = SingleFlight()